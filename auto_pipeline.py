@@ -1,27 +1,77 @@
-from src.ingestion.fetch_stock import fetch_stock_data
-import time
-from datetime import datetime
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
 
-def auto_pipeline():
-    print(f"Starting automation...")
-    print("Press Ctrl+c to stop")
+# same module names as the src/ scripts use, so the pooled engine is shared
+from ingestion.fetch_stock import fetch_stock_data
+from ingestion.work_queue import run_cycle, INGEST_PROCESSES
+from storage.mirror import sync_columnar, COLUMNAR_MIRROR
+from storage.columnar import ColumnarStore
+from analysis.indicators import update_technical_indicators
+from analysis.filtering import update_filter_states
+from analysis.rollups import update_rollups
+from analysis.materialize import materialize_dsp, MODEL_VERSION
+from analysis.spectra import update_spectra
+from analysis.screener import update_screener
+from analysis.sentiment import update_sentiment
+from ingestion.news import ingest_news
+from database.partitions import ensure_partitions, apply_retention
+from database.connection import session_scope
+from database.write import delete_stale_dsp_snapshots
+from scheduler.scheduler import Scheduler, Job
+from monitoring.metrics import start_metrics_server
+
+# stage intervals in seconds, overridable from .env
+INGEST_INTERVAL = float(os.getenv('SCHEDULE_INGEST_SECONDS', '300'))
+INDICATORS_INTERVAL = float(os.getenv('SCHEDULE_INDICATORS_SECONDS', '300'))
+ANALYTICS_INTERVAL = float(os.getenv('SCHEDULE_ANALYTICS_SECONDS', '900'))
+NEWS_INTERVAL = float(os.getenv('SCHEDULE_NEWS_SECONDS', '900'))
+SENTIMENT_INTERVAL = float(os.getenv('SCHEDULE_SENTIMENT_SECONDS', '900'))
+MAINTENANCE_INTERVAL = float(os.getenv('SCHEDULE_MAINTENANCE_SECONDS', '86400'))
+
+def ingest():
+    stats = run_cycle() if INGEST_PROCESSES else fetch_stock_data()
+    if COLUMNAR_MIRROR:
+        sync_columnar()
+    return stats
 
-    try:
-        while True:
-            print(f"\n {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+def indicators():
+    update_technical_indicators()
+    update_filter_states()
+    return update_rollups()
 
-            try: 
-                fetch_stock_data()
-                print("Success! Next run in 5 minutes...")
-            except Exception as e:
-                print(f"Pipeline error: {e}")
-                print("Retrying in 5 minutes...")
+def analytics():
+    snapshots = materialize_dsp()
+    update_spectra()
+    update_screener()
+    return snapshots
 
-            #timer to wait 5 minutes
-            time.sleep(300)
+def maintenance():
+    created = ensure_partitions()
+    detached = apply_retention()
+    compacted = ColumnarStore().compact(min_files=2) if COLUMNAR_MIRROR else 0
+    with session_scope() as session:
+        stale = delete_stale_dsp_snapshots(session, MODEL_VERSION)
+    return {'partitions_created': len(created), 'partitions_detached': len(detached), 'compacted': compacted,
+            'stale_snapshots': stale}
+
+def build_jobs():
+    """Ingestion on the clock during market hours, downstream stages as soon as new bars land"""
+    return [
+        Job('ingest', ingest, INGEST_INTERVAL, changed=lambda stats: stats['inserted'] > 0),
+        Job('indicators', indicators, INDICATORS_INTERVAL, after='ingest'),
+        Job('analytics', analytics, ANALYTICS_INTERVAL, after='indicators'),
+        Job('news', ingest_news, NEWS_INTERVAL, market_hours=False, changed=lambda stats: stats['inserted'] > 0),
+        Job('sentiment', update_sentiment, SENTIMENT_INTERVAL, after='news', market_hours=False),
+        Job('maintenance', maintenance, MAINTENANCE_INTERVAL, market_hours=False),
+    ]
+
+def auto_pipeline():
+    print(f"Starting automation...")
+    print("Press Ctrl+c to stop")
 
-    except KeyboardInterrupt:
-        print("\n Pipeline stopped by user")
+    start_metrics_server()
+    Scheduler(build_jobs()).run_forever()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+"""
+Batch ARIMA throughput: serial vs. process pool, cold vs. warm-started fits.
+
+    python benchmarks/bench_forecasting.py --tickers 100 --workers 1 4 8
+"""
+import sys
+import os
+import argparse
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from ingestion.fetchers import synthetic_history
+from analysis.dsp import butterworth_filter, SAMPLE_MINUTES
+from analysis.forecasting import BatchForecaster
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=100)
+    parser.add_argument('--bars', type=int, default=500)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    args = parser.parse_args()
+
+    series = {}
+    for i in range(args.tickers):
+        close = synthetic_history(f"T{i:04d}", period='1y')['Close'].to_numpy()[-args.bars:]
+        series[f"T{i:04d}"] = butterworth_filter(close, sample_minutes=SAMPLE_MINUTES)
+
+    print(f"{'workers':>8} {'run':>5} {'fits/s':>8} {'converged':>10} {'fallbacks':>10} {'mean_fit_s':>11}")
+    for workers in args.workers:
+        forecaster = BatchForecaster(workers=workers)
+        for run in ('cold', 'warm'):
+            _, stats = forecaster.fit_all(series)
+            print(f"{workers:>8} {run:>5} {stats['fits_per_second']:>8.1f} {stats['converged']:>10} "
+                  f"{stats['fallbacks']:>10} {stats['mean_fit_seconds']:>11.3f}")
+
+
+if __name__ == "__main__":
+    main()
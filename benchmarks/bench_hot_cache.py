@@ -0,0 +1,166 @@
+"""
+Latest-bars read latency: HotBarCache views vs. the database reads behind the
+dashboard's get_stock_data.
+
+Offline, the cache is filled from synthetic bars and only in-memory reads are timed.
+With --db, the same bars are loaded into a scratch schema (bench_hot_cache) on the
+local PostgreSQL (DB_* settings from .env) and every ticker is also read through an
+ORM query, load_latest_data and a warm BarCache; the NOTIFY round trip from a
+committed write to the bar being visible in the cache is timed too.
+
+    python benchmarks/bench_hot_cache.py --tickers 500 --bars 100
+    python benchmarks/bench_hot_cache.py --tickers 500 --db
+"""
+import sys
+import os
+import time
+import argparse
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from ingestion.fetchers import synthetic_history
+from database.read import BAR_COLUMNS
+from storage.hot_cache import HotBarCache
+
+SCHEMA = 'bench_hot_cache'
+CHANNEL = 'bench_hot_cache'
+
+
+def tickers_for(n):
+    return [f"T{i:04d}" for i in range(n)]
+
+
+def synthetic_arrays(ticker, period):
+    history = synthetic_history(ticker, period=period)
+    return {
+        'timestamp': history.index.tz_convert('UTC').tz_localize(None).to_numpy(dtype='datetime64[us]'),
+        'open': history['Open'].to_numpy(), 'high': history['High'].to_numpy(),
+        'low': history['Low'].to_numpy(), 'close': history['Close'].to_numpy(),
+        'volume': history['Volume'].to_numpy(dtype=np.int64),
+    }
+
+
+def per_read(func, tickers, repeat):
+    """Median and p95 milliseconds of func(ticker) over every ticker, `repeat` passes"""
+    samples = []
+    for _ in range(repeat):
+        for ticker in tickers:
+            started = time.perf_counter()
+            func(ticker)
+            samples.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': float(np.median(samples)), 'p95_ms': float(np.percentile(samples, 95))}
+
+
+def report(name, result):
+    print(f"  {name:<28} median {result['median_ms']:9.4f} ms   p95 {result['p95_ms']:9.4f} ms")
+
+
+def bench_memory(args, tickers):
+    cache = HotBarCache(capacity=args.capacity)
+    started = time.perf_counter()
+    for i in range(0, len(tickers), 100):
+        cache.extend({t: synthetic_arrays(t, args.period) for t in tickers[i:i + 100]})
+    print(f"Filled {len(tickers)} tickers in {time.perf_counter() - started:.2f}s: {cache.memory()}")
+
+    report('hot view (zero-copy)', per_read(lambda t: cache.view(t, args.bars), tickers, args.repeat))
+    report('hot frame (DataFrame)', per_read(lambda t: cache.frame(t, args.bars), tickers, args.repeat))
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        cache.snapshot(n=args.bars)
+    print(f"  snapshot of all {len(tickers):<12} {(time.perf_counter() - started) / args.repeat * 1000:9.4f} ms")
+    return cache
+
+
+def bench_database(args, tickers, cache):
+    from sqlalchemy import create_engine, text
+    from sqlalchemy.orm import Session
+    from database.connection import get_db_url
+    from database.models import StockPrice, Ticker
+    from database.read import load_latest_data
+    from database.write import frame_to_rows, write_price_rows, notify_bars
+    from dashboard.bar_cache import BarCache
+    from storage.hot_cache import HotCacheListener
+
+    admin = create_engine(get_db_url())
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    engine = create_engine(get_db_url(), connect_args={'options': f"-csearch_path={SCHEMA}"})
+    try:
+        StockPrice.__table__.create(engine)
+        Ticker.__table__.create(engine)
+        with Session(engine) as session:
+            for ticker in tickers:
+                write_price_rows(session, frame_to_rows(ticker, synthetic_history(ticker, period=args.period)),
+                                 method='copy')
+            session.commit()
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+
+        def orm(ticker):
+            with Session(engine) as session:
+                rows = (session.query(StockPrice).filter(StockPrice.ticker == ticker)
+                        .order_by(StockPrice.timestamp.desc()).limit(args.bars).all())
+                return pd.DataFrame([{name: getattr(r, name) for name in BAR_COLUMNS} for r in reversed(rows)])
+
+        bar_cache = BarCache(engine=engine, refresh_seconds=3600)
+        for ticker in tickers:
+            bar_cache.get(ticker)
+
+        report('ORM query', per_read(orm, tickers, 1))
+        report('load_latest_data (Core)', per_read(lambda t: load_latest_data(args.bars, t, engine), tickers, 1))
+        report('BarCache warm', per_read(lambda t: bar_cache.get(t, args.bars), tickers, args.repeat))
+        report('hot frame', per_read(lambda t: cache.frame(t, args.bars), tickers, args.repeat))
+
+        # commit -> NOTIFY -> listener refresh -> visible in a fresh cache
+        fresh = HotBarCache(capacity=args.capacity)
+        listener = HotCacheListener(fresh, engine=engine, channel=CHANNEL, poll_seconds=0.1).start()
+        listener.ready.wait()
+        latencies = []
+        try:
+            for i in range(args.notify_rounds):
+                ticker = tickers[i % len(tickers)]
+                last = pd.Timestamp(fresh.last_timestamps([ticker])[ticker])
+                row = {'ticker': ticker, 'timestamp': (last + timedelta(hours=1)).to_pydatetime(), 'open': 1.0,
+                       'high': 1.0, 'low': 1.0, 'close': 1.0, 'volume': 1}
+                started = time.perf_counter()
+                with Session(engine) as session:
+                    write_price_rows(session, [row], method='insert')
+                    notify_bars(session, [row], channel=CHANNEL)
+                    session.commit()
+                while fresh.last_timestamps([ticker])[ticker] <= last.to_pydatetime():
+                    time.sleep(0.0005)
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            listener.stop()
+        print(f"  commit -> visible in cache     median {np.median(latencies):9.4f} ms   "
+              f"p95 {np.percentile(latencies, 95):9.4f} ms ({args.notify_rounds} writes)")
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        admin.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=500)
+    parser.add_argument('--bars', type=int, default=100, help='bars per read, as get_stock_data')
+    parser.add_argument('--capacity', type=int, default=1000)
+    parser.add_argument('--period', default='1y', help='synthetic history per ticker')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', action='store_true', help='also time the PostgreSQL reads and NOTIFY latency')
+    parser.add_argument('--notify-rounds', type=int, default=50)
+    args = parser.parse_args()
+
+    tickers = tickers_for(args.tickers)
+    print(f"{args.tickers} tickers, {args.bars} bars per read")
+    cache = bench_memory(args, tickers)
+    if args.db:
+        bench_database(args, tickers, cache)
+
+
+if __name__ == "__main__":
+    main()
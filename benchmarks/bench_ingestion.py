@@ -0,0 +1,79 @@
+"""
+Ingestion cycle wall time vs. fetch worker count, fully offline.
+
+Uses FakeFetcher (latency-injected synthetic bars) and a writer that sleeps per
+batch to stand in for the database.
+
+    python benchmarks/bench_ingestion.py --tickers 500 --latency 0.3
+    python benchmarks/bench_ingestion.py --tickers 500 --chunk-size 50 --missing-rate 0.02
+    python benchmarks/bench_ingestion.py --tickers 500 --incremental
+"""
+import sys
+import os
+import time
+import argparse
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from ingestion.fetchers import FakeFetcher, FakeBatchFetcher
+from ingestion.engine import IngestionEngine
+
+
+def sleeping_writer(seconds_per_1k_rows):
+    """Writer that pretends to insert, costing time proportional to batch size"""
+    def write(rows):
+        time.sleep(len(rows) / 1000 * seconds_per_1k_rows)
+        return len(rows), 0
+    return write
+
+
+def run(tickers, workers, latency, write_cost, rate, chunk_size=1, missing_rate=0.0, starts=None):
+    if chunk_size > 1:
+        fetcher = FakeBatchFetcher(chunk_size=chunk_size, missing_rate=missing_rate,
+                                   latency=latency, jitter=latency / 4)
+    else:
+        fetcher = FakeFetcher(latency=latency, jitter=latency / 4)
+    engine = IngestionEngine(
+        fetcher,
+        writer=sleeping_writer(write_cost),
+        workers=workers,
+        rate=rate,
+        timeout=latency * 10
+    )
+    return engine.run(tickers, starts=starts)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per fake request')
+    parser.add_argument('--write-cost', type=float, default=0.05, help='seconds per 1k rows written')
+    parser.add_argument('--rate', type=float, default=None, help='requests per second limit')
+    parser.add_argument('--chunk-size', type=int, default=1, help='>1 uses chunked multi-symbol downloads')
+    parser.add_argument('--missing-rate', type=float, default=0.0, help='share of symbols dropped per chunk')
+    parser.add_argument('--incremental', action='store_true',
+                        help='steady state: every ticker has a watermark one bar behind')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+    starts = None
+    if args.incremental:
+        # last full trading day's final bars, like a watermark minus the overlap
+        today = pd.Timestamp.now(tz='America/New_York').normalize()
+        last_bar = pd.bdate_range(end=today, periods=1)[0] + pd.Timedelta(hours=15.5)
+        starts = {t: last_bar - pd.Timedelta(hours=2) for t in tickers}
+
+    print(f"{'workers':>8} {'wall_s':>8} {'requests':>9} {'rows':>8} {'rows/s':>10} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        stats = run(tickers, workers, args.latency, args.write_cost, args.rate,
+                    args.chunk_size, args.missing_rate, starts)
+        wall = stats['wall_seconds']
+        baseline = baseline or wall
+        print(f"{workers:>8} {wall:>8.2f} {stats['requests']:>9} {stats['inserted']:>8} "
+              f"{stats['inserted'] / wall:>10.0f} {baseline / wall:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Insert rate and last-N-days query latency: plain stock_prices vs. the monthly
+partitioned layout, on a local PostgreSQL (DB_* settings from .env).
+
+Each layout is built in its own scratch schema (bench_heap, bench_partitioned) from
+synthetic bars, so the real tables are never touched. Schemas are dropped afterwards
+unless --keep is given.
+
+    python benchmarks/bench_partitioning.py --tickers 100 --period 1y --days 5
+"""
+import sys
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from database.connection import get_db_url
+from database.models import StockPrice
+from database.partitions import create_partitioned_prices, ensure_partitions
+from database.write import frame_to_rows, insert_price_rows, copy_price_rows
+from ingestion.fetchers import synthetic_history
+
+LAYOUTS = ('heap', 'partitioned')
+
+
+def schema_engine(layout):
+    """Engine whose connections resolve stock_prices inside the layout's scratch schema"""
+    return create_engine(get_db_url(), connect_args={'options': f"-csearch_path=bench_{layout}"})
+
+
+def build_rows(n_tickers, period):
+    rows = []
+    for i in range(n_tickers):
+        ticker = f"T{i:04d}"
+        rows.extend(frame_to_rows(ticker, synthetic_history(ticker, period=period)))
+    return rows
+
+
+def create_layout(layout, first_bar):
+    admin = create_engine(get_db_url())
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS bench_{layout} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA bench_{layout}"))
+    admin.dispose()
+
+    engine = schema_engine(layout)
+    with engine.begin() as conn:
+        if layout == 'heap':
+            StockPrice.__table__.create(conn)
+        else:
+            create_partitioned_prices(conn)
+    if layout == 'partitioned':
+        ensure_partitions(start=first_bar, engine=engine)
+    return engine
+
+
+def load(engine, rows, method, batch_rows):
+    """Insert in ingestion-sized batches; returns rows/s"""
+    write = copy_price_rows if method == 'copy' else insert_price_rows
+    started = time.perf_counter()
+    for i in range(0, len(rows), batch_rows):
+        with Session(engine) as session:
+            write(session, rows[i:i + batch_rows])
+            session.commit()
+    elapsed = time.perf_counter() - started
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE stock_prices"))
+    return len(rows) / elapsed
+
+
+def query_latency(engine, sql, params, repeat):
+    times = []
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(text(sql), params).fetchall()
+            times.append(time.perf_counter() - started)
+    return float(np.median(times)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=100)
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--days', type=int, default=5, help="window for the last-N-days queries")
+    parser.add_argument('--method', choices=['insert', 'copy'], default='copy')
+    parser.add_argument('--batch-rows', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--keep', action='store_true', help="keep the scratch schemas")
+    args = parser.parse_args()
+
+    rows = build_rows(args.tickers, args.period)
+    first_bar = min(row['timestamp'] for row in rows).tz_convert('UTC').tz_localize(None)
+    last_bar = max(row['timestamp'] for row in rows).tz_convert('UTC').tz_localize(None)
+    since = last_bar - pd.Timedelta(days=args.days)
+    print(f"{len(rows)} bars for {args.tickers} tickers, {first_bar:%Y-%m-%d} to {last_bar:%Y-%m-%d}")
+
+    queries = {
+        'universe_last_days': ("SELECT ticker, timestamp, close FROM stock_prices WHERE timestamp >= :since",
+                               {'since': since.to_pydatetime()}),
+        'ticker_last_days': ("SELECT timestamp, close FROM stock_prices WHERE ticker = :ticker AND timestamp >= :since",
+                             {'ticker': 'T0000', 'since': since.to_pydatetime()}),
+        'ticker_last_500': ("SELECT timestamp, close FROM stock_prices WHERE ticker = :ticker "
+                            "ORDER BY timestamp DESC LIMIT 500", {'ticker': 'T0000'}),
+    }
+
+    print(f"\n{'layout':>12} {'rows/s':>10} " + " ".join(f"{name + ' ms':>22}" for name in queries))
+    for layout in LAYOUTS:
+        engine = create_layout(layout, first_bar)
+        try:
+            rate = load(engine, rows, args.method, args.batch_rows)
+            latencies = [query_latency(engine, sql, params, args.repeat) for sql, params in queries.values()]
+            print(f"{layout:>12} {rate:>10.0f} " + " ".join(f"{ms:>22.2f}" for ms in latencies))
+        finally:
+            engine.dispose()
+            if not args.keep:
+                admin = create_engine(get_db_url())
+                with admin.begin() as conn:
+                    conn.execute(text(f"DROP SCHEMA IF EXISTS bench_{layout} CASCADE"))
+                admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
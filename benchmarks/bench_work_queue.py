@@ -0,0 +1,144 @@
+"""
+Ingestion cycle time against the number of queue worker processes, on a local
+PostgreSQL (DB_* settings from .env).
+
+Each run enqueues the same synthetic ticker universe in a scratch schema
+(bench_queue) and drains it with 1, 2, 4, ... spawned workers fetching from
+FakeFetcher, so Yahoo is never called and the real tables are never touched.
+--crash adds a run where one worker claims a batch and dies without completing it;
+the others must pick its tickers up once the lease expires.
+
+    python benchmarks/bench_work_queue.py --tickers 200 --processes 1 2 4 8 --latency 0.2
+"""
+import sys
+import os
+import time
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import create_engine, text
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from database.connection import get_db_url
+from database.models import StockPrice, Ticker, IngestJob
+from ingestion.fetchers import FakeFetcher
+from ingestion.work_queue import enqueue, claim, queue_status, run_worker
+
+SCHEMA = 'bench_queue'
+
+
+def schema_engine():
+    return create_engine(get_db_url(), connect_args={'options': f"-csearch_path={SCHEMA}"})
+
+
+def create_schema():
+    admin = create_engine(get_db_url())
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    admin.dispose()
+    engine = schema_engine()
+    for table in (StockPrice, Ticker, IngestJob):
+        table.__table__.create(engine)
+    engine.dispose()
+
+
+def reset(tickers):
+    """Empty prices so every run fetches the full window, then queue a fresh cycle"""
+    engine = schema_engine()
+    with engine.begin() as conn:
+        conn.execute(text("TRUNCATE stock_prices, tickers"))
+    enqueue(tickers, engine=engine)
+    engine.dispose()
+
+
+def worker_process(index, args):
+    engine = schema_engine()
+    try:
+        fetcher = FakeFetcher(latency=args.latency, jitter=args.latency / 4, error_rate=args.error_rate, seed=index)
+        return run_worker(worker=f"bench-{index}", batch_size=args.batch_size, lease_seconds=args.lease_seconds,
+                          fetcher=fetcher, workers=args.threads, rate=None, idle_seconds=0.2, engine=engine)
+    finally:
+        engine.dispose()
+
+
+def crashing_process(args):
+    """Claim one batch and exit without completing or releasing it"""
+    engine = schema_engine()
+    lease, tickers = claim('bench-crash', args.batch_size, args.lease_seconds, engine=engine)
+    os._exit(1)
+
+
+def drain(args, processes, crash=False):
+    context = multiprocessing.get_context('spawn')
+    if crash:
+        process = context.Process(target=crashing_process, args=(args,))
+        process.start()
+        process.join()
+
+    started = time.time()
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        results = list(pool.map(worker_process, range(processes), [args] * processes))
+    wall = time.time() - started
+
+    # cycle time from the first claim to the last completion, leaving out process start-up
+    first = min((r['started_at'] for r in results if r['started_at']), default=started)
+    last = max((r['finished_at'] for r in results if r['finished_at']), default=started)
+    engine = schema_engine()
+    status = queue_status(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT count(*) FROM stock_prices")).scalar()
+    engine.dispose()
+    return {
+        'processes': processes,
+        'cycle_seconds': last - first,
+        'wall_seconds': wall,
+        'rows': rows,
+        'batches': sum(r['batches'] for r in results),
+        'lost_completions': sum(r['lost'] for r in results),
+        'status': status,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--threads', type=int, default=4, help='fetch threads per worker')
+    parser.add_argument('--batch-size', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds per fake request')
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--lease-seconds', type=float, default=10)
+    parser.add_argument('--crash', action='store_true', help='add a run with a worker that dies holding a lease')
+    parser.add_argument('--keep', action='store_true', help='keep the scratch schema')
+    args = parser.parse_args()
+
+    tickers = [f"T{i:04d}" for i in range(args.tickers)]
+    create_schema()
+    try:
+        baseline = None
+        print(f"{'processes':>9} {'cycle s':>9} {'speedup':>8} {'efficiency':>10} {'rows':>9}  status")
+        for processes in args.processes:
+            reset(tickers)
+            result = drain(args, processes)
+            baseline = baseline or result['cycle_seconds'] * result['processes']
+            speedup = baseline / result['cycle_seconds'] if result['cycle_seconds'] else 0.0
+            print(f"{processes:>9} {result['cycle_seconds']:>9.2f} {speedup:>8.2f} "
+                  f"{speedup / processes:>10.0%} {result['rows']:>9}  {result['status']}")
+
+        if args.crash:
+            processes = max(args.processes)
+            reset(tickers)
+            result = drain(args, processes, crash=True)
+            print(f"\nCrash run ({processes} workers, {args.lease_seconds:.0f}s lease): "
+                  f"{result['cycle_seconds']:.2f}s, {result['rows']} rows, {result['status']}")
+    finally:
+        if not args.keep:
+            admin = create_engine(get_db_url())
+            with admin.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+            admin.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,435 @@
+"""
+Pipeline benchmark suite with JSON results for comparing commits.
+
+Offline scenarios use the synthetic generator and fake Yahoo source from
+ingestion/fetchers.py; --db adds the scenarios that need a local PostgreSQL
+(DB_* settings from .env), run in a scratch schema that is dropped afterwards.
+
+    python benchmarks/suite.py                                   # offline scenarios
+    python benchmarks/suite.py --db --sizes 10000 100000 1000000
+    python benchmarks/suite.py --compare benchmarks/results/abc1234.json
+
+Scenarios:
+    ingestion   rows/s through fetch_stock_data with a FakeTicker-backed yf.Ticker
+    dsp         butterworth_filter / compute_fft / dsp_forecast per-ticker throughput
+    chart_prep  dashboard downsampling of a long history
+    backfill    rows/s through Backfill over a year of FakeFetcher chunks (nothing written)
+    news        articles/s through NewsIngester against the local FakeNewsServer
+    resample    one-pass session-grid alignment and gap fill vs. per-ticker pandas reindexing
+    screener    rank-one rolling correlation updates per bar vs. recomputing the matrix, 500 tickers
+    latest      load_latest_data latency at several table sizes (--db)
+    dashboard   bar cache cold/warm reads and range loads from rollups (--db)
+"""
+import sys
+import os
+import json
+import time
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from ingestion.fetchers import FakeTicker, YFinanceFetcher, synthetic_history
+from ingestion.fetch_stock import fetch_stock_data
+from ingestion.backfill import Backfill, null_loader
+from ingestion.fetchers import FakeFetcher
+from ingestion.news import NewsIngester
+from ingestion.fake_news import FakeNewsServer
+from analysis.dsp import butterworth_filter, compute_fft, dsp_forecast
+from analysis.resample import session_grid, align_bars, REVISIT_BARS, BAR_MINUTES
+from analysis.screener import RollingCovariance, correlation_clusters, strongest_peers, SCREENER_WINDOW
+from dashboard.downsample import CHART_WIDTH_PX, points_for_width, downsample_ohlc, downsample_line
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+SCRATCH_SCHEMA = 'bench_suite'
+
+
+def tickers_for(n):
+    return [f"T{i:04d}" for i in range(n)]
+
+
+def timings(func, repeat):
+    """Median and p95 milliseconds of repeated calls"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {'median_ms': float(np.median(samples)), 'p95_ms': float(np.percentile(samples, 95))}
+
+
+# ---------- offline scenarios ----------
+
+def bench_ingestion(args):
+    """fetch_stock_data end to end with yf.Ticker replaced by FakeTicker; writes are counted, not stored"""
+
+    def counting_writer(rows):
+        time.sleep(len(rows) / 1000 * args.write_cost)
+        return len(rows), 0
+
+    fetcher = YFinanceFetcher(ticker_factory=FakeTicker.factory(
+        latency=args.latency, jitter=args.latency / 4, error_rate=args.error_rate, seed=args.seed))
+    stats = fetch_stock_data(fetcher=fetcher, writer=counting_writer, incremental=False,
+                             tickers=tickers_for(args.tickers), workers=args.workers, rate=None)
+    return {
+        'tickers': args.tickers,
+        'workers': args.workers,
+        'latency_s': args.latency,
+        'error_rate': args.error_rate,
+        'rows': stats['inserted'],
+        'errors': len(stats['errors']),
+        'wall_seconds': stats['wall_seconds'],
+        'rows_per_second': stats['inserted'] / stats['wall_seconds'] if stats['wall_seconds'] else 0.0,
+    }
+
+
+def bench_dsp(args):
+    """Per-ticker DSP calls on the last `bars` synthetic closes"""
+    n = min(args.tickers, args.dsp_tickers)
+    series = [synthetic_history(t, period='1y')['Close'].iloc[-args.bars:] for t in tickers_for(n)]
+
+    out = {'tickers': n, 'bars': args.bars}
+    started = time.perf_counter()
+    filtered = [butterworth_filter(s, sample_minutes=BAR_MINUTES) for s in series]
+    out['butterworth_per_second'] = n / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for s in series:
+        compute_fft(s, timestamps=s.index)
+    out['fft_per_second'] = n / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for f in filtered[:args.forecast_tickers]:
+        dsp_forecast(f)
+    out['forecast_per_second'] = min(n, args.forecast_tickers) / (time.perf_counter() - started)
+    return out
+
+
+def bench_chart_prep(args):
+    """Downsampling a 5000-bar history the way the dashboard does"""
+    history = synthetic_history('T0000', period='5y').iloc[-5000:]
+    df = pd.DataFrame({
+        'timestamp': history.index.tz_localize(None), 'open': history['Open'].to_numpy(), 'high': history['High'].to_numpy(),
+        'low': history['Low'].to_numpy(), 'close': history['Close'].to_numpy(), 'volume': history['Volume'].to_numpy(),
+    })
+    return {
+        'bars': len(df),
+        'candles': timings(lambda: downsample_ohlc(df, points_for_width(CHART_WIDTH_PX, 0.25)), args.repeat),
+        'lttb_line': timings(lambda: downsample_line(df, 'timestamp', 'close'), args.repeat),
+    }
+
+
+def bench_backfill(args):
+    """Chunk planning, concurrent fake fetches and row conversion for a one-year backfill"""
+    fetcher = FakeFetcher(latency=args.latency, jitter=args.latency / 4, error_rate=args.error_rate, seed=args.seed)
+    runner = Backfill(fetcher, loader=null_loader, workers=args.workers, rate=None, checkpoints=False)
+    end = pd.Timestamp.now(tz='UTC').normalize()
+    stats = runner.run(tickers_for(args.backfill_tickers), end - pd.Timedelta(days=365), end)
+    return {
+        'tickers': args.backfill_tickers,
+        'workers': args.workers,
+        'chunks': stats['chunks'],
+        'rows': stats['fetched'],
+        'errors': len(stats['errors']),
+        'wall_seconds': stats['wall_seconds'],
+        'rows_per_second': stats['rows_per_second'],
+    }
+
+
+def bench_resample(args):
+    """A year of hourly closes for every ticker, with bars dropped at random, onto the session grid"""
+    rng = np.random.default_rng(args.seed)
+    tickers = tickers_for(args.tickers)
+    parts = []
+    for ticker in tickers:
+        history = synthetic_history(ticker, period='1y').iloc[-252 * 7:]
+        keep = rng.random(len(history)) > 0.02
+        parts.append((ticker, history.index[keep].tz_convert('UTC').tz_localize(None), history['Close'].to_numpy()[keep]))
+    arrays = {
+        'ticker': np.concatenate([np.full(len(ts), t, dtype=object) for t, ts, _ in parts]),
+        'timestamp': np.concatenate([ts.to_numpy(dtype='datetime64[us]') for _, ts, _ in parts]),
+        'close': np.concatenate([close for _, _, close in parts]),
+    }
+    grid = session_grid(arrays['timestamp'].min(), arrays['timestamp'].max(), tz='UTC')
+
+    def per_ticker():
+        index = pd.DatetimeIndex(grid)
+        return np.vstack([pd.Series(close, index=ts).reindex(index).ffill(limit=7).to_numpy() for _, ts, close in parts])
+
+    block = align_bars(arrays, grid)
+    tail = len(grid) - REVISIT_BARS - 7
+    recent = arrays['timestamp'] >= grid[tail]
+    tail_arrays = {name: values[recent] for name, values in arrays.items()}
+    report = block.gap_report()
+    return {
+        'tickers': len(tickers),
+        'grid_bars': len(grid),
+        'missing_bars': int(report['missing'].sum()),
+        'off_grid_bars': int(report['off_grid'].sum()),
+        'align': timings(lambda: align_bars(arrays, grid), max(1, args.repeat // 4)),
+        'align_ffill': timings(lambda: align_bars(arrays, grid).filled('close', 'ffill', 7), max(1, args.repeat // 4)),
+        'align_linear': timings(lambda: block.filled('close', 'linear'), max(1, args.repeat // 4)),
+        'incremental_tail': timings(lambda: align_bars(tail_arrays, grid[tail:], tickers=block.tickers), args.repeat),
+        'gap_report': timings(block.gap_report, max(1, args.repeat // 4)),
+        'pandas_reindex_ffill': timings(per_ticker, max(1, args.repeat // 4)),
+    }
+
+
+def bench_screener(args):
+    """Per-bar cost of keeping the universe's rolling correlation matrix current"""
+    rng = np.random.default_rng(args.seed)
+    n, window = args.screener_tickers, SCREENER_WINDOW
+    # a few common factors so the clusters are not all noise
+    factors = rng.normal(0, 0.004, (window + args.repeat, 8))
+    returns = (factors @ rng.normal(0, 1, (8, n)) / 4 + rng.normal(0, 0.003, (window + args.repeat, n))).T
+    grid = np.datetime64('2024-01-02T14:30') + np.arange(returns.shape[1]).astype('timedelta64[h]')
+
+    state = RollingCovariance(tickers_for(n), window)
+    state.reset(returns[:, :window], grid[:window])
+    started = time.perf_counter()
+    for column in range(window, returns.shape[1]):
+        state.push(returns[:, column], grid[column])
+    push_ms = (time.perf_counter() - started) * 1000 / args.repeat
+
+    corr = state.correlation()
+    exact = np.corrcoef(returns[:, -window:])
+    return {
+        'tickers': n,
+        'window': window,
+        'rank_one_push_ms': push_ms,
+        'recompute_corrcoef': timings(lambda: np.corrcoef(returns[:, -window:]), args.repeat),
+        'correlation_from_sums': timings(state.correlation, args.repeat),
+        'peers': timings(lambda: strongest_peers(corr), args.repeat),
+        'clusters': timings(lambda: correlation_clusters(corr), max(1, args.repeat // 4)),
+        'max_abs_error': float(np.nanmax(np.abs(corr - exact))),
+    }
+
+
+def bench_news(args):
+    """Feeds, pages and lxml parsing over pooled HTTP from the stand-in server; a second pass shows URL dedup"""
+
+    def counting_writer(rows):
+        return len(rows), 0
+
+    with FakeNewsServer(latency=args.latency) as server:
+        known = set()
+        ingester = NewsIngester(feed_url=server.feed_url, writer=counting_writer, known_urls=known,
+                                workers=args.workers, rate=None)
+        first = ingester.run(tickers_for(args.news_tickers))
+        known.update(f"{server.base_url}/article/{article_id}"
+                     for ticker in tickers_for(args.news_tickers) for article_id, _, _ in server.feed_items(ticker))
+        requests_before = server.requests
+        second = ingester.run(tickers_for(args.news_tickers))
+        second_requests = server.requests - requests_before
+
+    return {
+        'tickers': args.news_tickers,
+        'workers': args.workers,
+        'latency_s': args.latency,
+        'feed_items': first['feed_items'],
+        'duplicates': first['duplicates'],
+        'articles': first['inserted'],
+        'wall_seconds': first['wall_seconds'],
+        'articles_per_second': first['inserted'] / first['wall_seconds'] if first['wall_seconds'] else 0.0,
+        'rerun_requests': second_requests,
+        'rerun_inserted': second['inserted'],
+        'rerun_wall_seconds': second['wall_seconds'],
+    }
+
+
+# ---------- database scenarios ----------
+
+def scratch_engine():
+    from sqlalchemy import create_engine, text
+    from database.connection import get_db_url
+    from database.models import Base, StockPrice, Ticker, DailyBar, WeeklyBar
+
+    admin = create_engine(get_db_url())
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCRATCH_SCHEMA}"))
+    admin.dispose()
+
+    engine = create_engine(get_db_url(), connect_args={'options': f"-csearch_path={SCRATCH_SCHEMA}"})
+    Base.metadata.create_all(engine, tables=[t.__table__ for t in (StockPrice, Ticker, DailyBar, WeeklyBar)])
+    return engine
+
+
+def drop_scratch():
+    from sqlalchemy import create_engine, text
+    from database.connection import get_db_url
+
+    admin = create_engine(get_db_url())
+    with admin.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCRATCH_SCHEMA} CASCADE"))
+    admin.dispose()
+
+
+def load_synthetic(engine, tickers, period):
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session
+    from database.write import frame_to_rows, write_price_rows
+
+    rows = 0
+    with Session(engine) as session:
+        for ticker in tickers:
+            batch = frame_to_rows(ticker, synthetic_history(ticker, period=period))
+            rows += write_price_rows(session, batch, method='copy')[0]
+        session.commit()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return rows
+
+
+def bench_latest(args, engine):
+    """load_latest_data(500) for one ticker as the table grows"""
+    from database.read import load_latest_data
+
+    bars_per_ticker = len(synthetic_history('T0000', period=args.period))
+    out = []
+    loaded = 0
+    stored = 0
+    for size in sorted(args.sizes):
+        needed = max(1, -(-size // bars_per_ticker))
+        stored += load_synthetic(engine, tickers_for(needed)[loaded:], args.period)
+        loaded = max(loaded, needed)
+        load_latest_data(ticker='T0000', engine=engine)  # warm the cache
+        out.append({'table_rows': stored, 'tickers': loaded,
+                    **timings(lambda: load_latest_data(ticker='T0000', engine=engine), args.repeat)})
+    return out
+
+
+def bench_dashboard(args, engine):
+    """What one dashboard render reads: bar cache cold and warm, and a 1y range from the rollups"""
+    from sqlalchemy.orm import Session
+    from database.read import load_bars_for_range, load_tickers
+    from database.write import write_rollups
+    from dashboard.bar_cache import BarCache
+
+    tickers = load_tickers(engine)
+    if not tickers:
+        load_synthetic(engine, tickers_for(10), args.period)
+        tickers = load_tickers(engine)
+    with Session(engine) as session:
+        for resolution in ('1d', '1w'):
+            write_rollups(session, resolution, tickers)
+        session.commit()
+
+    def cold():
+        BarCache(engine=engine, refresh_seconds=3600).get('T0000', 5000)
+
+    warm_cache = BarCache(engine=engine, refresh_seconds=3600)
+    warm_cache.get('T0000', 5000)
+    since = pd.Timestamp.now().normalize() - pd.Timedelta(days=365)
+
+    return {
+        'bar_cache_cold': timings(cold, args.repeat),
+        'bar_cache_warm': timings(lambda: warm_cache.get('T0000', 100), args.repeat),
+        'range_1y': timings(lambda: load_bars_for_range('T0000', since.to_pydatetime(), engine=engine), args.repeat),
+    }
+
+
+# ---------- results ----------
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return 'unknown'
+
+
+def flatten(prefix, value, out):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            flatten(f"{prefix}.{key}" if prefix else key, item, out)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            flatten(f"{prefix}[{i}]", item, out)
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        out[prefix] = value
+    return out
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    old = flatten('', baseline['scenarios'], {})
+    new = flatten('', current['scenarios'], {})
+    print(f"\nvs {baseline['commit']} ({baseline_path}):")
+    for key in sorted(set(old) & set(new)):
+        if old[key]:
+            print(f"  {key:<50} {old[key]:>12.3f} -> {new[key]:>12.3f} ({(new[key] / old[key] - 1) * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', default=['ingestion', 'dsp', 'chart_prep', 'backfill', 'news', 'resample',
+                                                           'screener', 'latest', 'dashboard'])
+    parser.add_argument('--tickers', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=0.05, help='seconds per fake request')
+    parser.add_argument('--error-rate', type=float, default=0.01)
+    parser.add_argument('--write-cost', type=float, default=0.0, help='seconds per 1k rows written')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bars', type=int, default=500, help='DSP window')
+    parser.add_argument('--dsp-tickers', type=int, default=100)
+    parser.add_argument('--forecast-tickers', type=int, default=10, help='ARIMA fits are slow; fit fewer')
+    parser.add_argument('--backfill-tickers', type=int, default=50)
+    parser.add_argument('--news-tickers', type=int, default=50)
+    parser.add_argument('--screener-tickers', type=int, default=500)
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--db', action='store_true', help='run the PostgreSQL scenarios')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 500_000], help='table rows')
+    parser.add_argument('--period', default='1y', help='synthetic history per ticker for --db')
+    parser.add_argument('--output', default=None, help='JSON path (default results/<commit>.json)')
+    parser.add_argument('--compare', default=None, help='earlier results JSON to diff against')
+    args = parser.parse_args()
+
+    results = {
+        'commit': git_commit(),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'args': vars(args),
+        'scenarios': {},
+    }
+
+    offline = {'ingestion': bench_ingestion, 'dsp': bench_dsp, 'chart_prep': bench_chart_prep, 'backfill': bench_backfill,
+               'news': bench_news, 'resample': bench_resample, 'screener': bench_screener}
+    for name, func in offline.items():
+        if name in args.scenarios:
+            print(f"== {name}")
+            results['scenarios'][name] = func(args)
+
+    database = {'latest': bench_latest, 'dashboard': bench_dashboard}
+    wanted = [name for name in database if name in args.scenarios]
+    if wanted and args.db:
+        engine = scratch_engine()
+        try:
+            # dashboard reads the tables the latest scenario filled
+            for name in wanted:
+                print(f"== {name}")
+                results['scenarios'][name] = database[name](args, engine)
+        finally:
+            engine.dispose()
+            drop_scratch()
+    elif wanted:
+        print(f"Skipping {', '.join(wanted)} (needs --db)")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, default=str)
+    print(json.dumps(results['scenarios'], indent=2, default=str))
+    print(f"Results written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,116 @@
-from src.ingestion.fetch_stock import fetch_stock_data
-from src.database.read import load_latest_data
-from src.analysis.dsp import butterworth_filter, compute_fft, dsp_forecast
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src'))
+
+# same module names as the src/ scripts use, so the pooled engine is shared
+from ingestion.fetch_stock import fetch_stock_data
+from ingestion.work_queue import run_cycle, INGEST_PROCESSES
+from database.read import load_latest_data
+from analysis.dsp import butterworth_filter, compute_fft, dsp_forecast
+from analysis.resample import aligned_bars, finite_tail
+from analysis.indicators import update_technical_indicators
+from analysis.filtering import update_filter_states
+from analysis.materialize import materialize_dsp
+from analysis.spectra import update_spectra
+from analysis.screener import update_screener
+from analysis.rollups import update_rollups
+from analysis.sentiment import update_sentiment
+from ingestion.news import ingest_news
+from storage.mirror import sync_columnar, COLUMNAR_MIRROR
+from monitoring.metrics import registry, start_metrics_server
+from monitoring.events import stage, log_event
 from datetime import datetime
 
 def run_pipeline():
     print(f"Market Pulse Pipeline Started at {datetime.now()}")
 
     # Step 1: Ingest new data
-    fetch_stock_data()
+    with stage('ingest') as info:
+        stats = run_cycle() if INGEST_PROCESSES else fetch_stock_data()
+        info.update(fetched=stats['fetched'], inserted=stats['inserted'], errors=len(stats['errors']))
+    if COLUMNAR_MIRROR:
+        with stage('columnar_sync'):
+            sync_columnar()
+
+    # Step 2: Update technical indicators, streaming filter state and rollups for the new bars
+    with stage('indicators'):
+        update_technical_indicators()
+    with stage('filter_state'):
+        update_filter_states()
+    with stage('rollups'):
+        update_rollups()
+
+    # Step 3: Materialize filtered series, spectra and forecasts for the dashboard
+    with stage('materialize_dsp'):
+        snapshots = materialize_dsp()
+    with stage('spectra'):
+        spectra = update_spectra()
+    with stage('screener') as info:
+        screener = update_screener()
+        info.update(tickers=screener['tickers'], pushed=screener.get('pushed', 0), reset=screener.get('reset', False))
+    with stage('news') as info:
+        news = ingest_news()
+        info.update(inserted=news['inserted'], duplicates=news['duplicates'], errors=len(news['errors']))
+    with stage('sentiment') as info:
+        sentiment = update_sentiment()
+        info.update(articles=sentiment['articles'], scored=sentiment['scored'], cached=sentiment['cached'])
 
-    # Step 2: Load latest data from DB
-    df = load_latest_data()
+    # Step 4: Load latest data from DB
+    ticker = os.getenv('PIPELINE_TICKER', 'AAPL')
+    with stage('load_latest'):
+        df = load_latest_data(ticker=ticker)
+        aligned = aligned_bars([ticker])
 
-    # Step 3: Apply DSP
-    filtered = butterworth_filter(df['close'])
-    freqs, magnitude = compute_fft(df['close'])
-    forecast = dsp_forecast(filtered)
+    # Step 5: Apply DSP on the gap-filled hourly grid, from the ticker's first filled bar
+    with stage('dsp'):
+        close = aligned.filled('close')
+        close = close[0, int(finite_tail(close)[0]):]
+        filtered = butterworth_filter(close, sample_minutes=aligned.bar_minutes)
+        freqs, magnitude = compute_fft(close, sample_seconds=aligned.sample_seconds)
+        forecast = dsp_forecast(filtered)
 
+    log_event('metrics', **registry.snapshot())
     print(f"Pipeline Successfully ran at {datetime.now()}")
     
     return { "df": df, "filtered": filtered,
              "freqs": freqs,
              "magnitude": magnitude,
-             "forecast": forecast }
+             "forecast": forecast,
+             "snapshots": snapshots,
+             "spectra": spectra }
 
    
 
+def profile_pipeline(output):
+    """
+    Run once under cProfile.
+
+    Writes a pstats file (open with snakeviz, or turn into a flamegraph with
+    flameprof / gprof2dot) and prints the top functions by cumulative time.
+    """
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.runcall(run_pipeline)
+    finally:
+        profiler.dump_stats(output)
+        print(f"\nProfile written to {output}")
+        pstats.Stats(output).sort_stats('cumulative').print_stats(30)
+
+
 if __name__ == "__main__":
-    run_pipeline()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the pipeline once")
+    parser.add_argument('--profile', nargs='?', const=os.path.join('logs', 'pipeline.prof'), default=None,
+                        metavar='PATH', help="profile the run with cProfile and write pstats to PATH")
+    args = parser.parse_args()
+
+    start_metrics_server()
+    if args.profile:
+        os.makedirs(os.path.dirname(args.profile) or '.', exist_ok=True)
+        profile_pipeline(args.profile)
+    else:
+        run_pipeline()
@@ -1,23 +1,30 @@
 import numpy as np
-from scipy.signal import butter, filtfilt
+import pandas as pd
+from functools import lru_cache
+from scipy.signal import butter, get_window, sosfilt, sosfilt_zi, sosfiltfilt, welch
 from statsmodels.tsa.arima.model import ARIMA
 
+# hourly bars, the spacing analysis.resample.BAR_MINUTES aligns to
+SAMPLE_MINUTES = 60
 
-def butterworth_filter(series, cutoff_minutes=240, order=4):
-    """
-    Apply a Butterworth low-pass filter to smooth noisy price data.
 
-    Parameters:
-        series (pd.Series): Price series (e.g., df['close'])
-        cutoff_minutes (int): Period defining cutoff frequency (default 4 hours)
-        order (int): Filter order
+def design_butterworth(order=4, cutoff_minutes=240, sample_minutes=SAMPLE_MINUTES):
+    """
+    Butterworth low-pass design as second-order sections, cached per (order, cutoff, fs).
 
     Returns:
-        np.ndarray: Filtered signal
+        np.ndarray: SOS coefficients, shape (n_sections, 6); a copy of the cached
+                    design, since scipy's sosfilt rejects read-only arrays
     """
 
-    # Sampling frequency: 1 sample every 15 minutes → fs = 1/15 samples per minute
-    fs = 1 / 15.0
+    return _butterworth_sos(order, cutoff_minutes, sample_minutes).copy()
+
+
+@lru_cache(maxsize=64)
+def _butterworth_sos(order, cutoff_minutes, sample_minutes):
+
+    # Sampling frequency: 1 sample every sample_minutes → fs in samples per minute
+    fs = 1 / float(sample_minutes)
 
     # Convert cutoff period to frequency (cycles per minute)
     fc = 1 / cutoff_minutes
@@ -26,41 +33,238 @@ def butterworth_filter(series, cutoff_minutes=240, order=4):
     nyq = 0.5 * fs
     wn = fc / nyq
 
-    # Design Butterworth filter
-    b, a = butter(order, wn, btype='low', analog=False)
+    return butter(order, wn, btype='low', analog=False, output='sos')
+
+
+def butterworth_filter(series, cutoff_minutes=240, order=4, sample_minutes=SAMPLE_MINUTES):
+    """
+    Apply a Butterworth low-pass filter to smooth noisy price data.
+
+    Parameters:
+        series (pd.Series | np.ndarray): Price series (e.g., df['close']), or a 2-D
+                                         (tickers x bars) array filtered row by row
+        cutoff_minutes (int): Period defining cutoff frequency (default 4 hours)
+        order (int): Filter order
+        sample_minutes (float): Minutes between samples
+
+    Returns:
+        np.ndarray: Filtered signal, same shape as the input
+    """
+
+    sos = design_butterworth(order, cutoff_minutes, sample_minutes)
 
     # Zero-phase filtering to avoid phase shift
-    filtered = filtfilt(b, a, series)
+    filtered = sosfiltfilt(sos, np.asarray(series, dtype=np.float64), axis=-1)
 
     return filtered
 
 
-def compute_fft(series):
+class StreamingButterworth:
+    """
+    Causal Butterworth low-pass that carries filter state between calls.
+
+    Each ticker keeps its SOS delay-line state, so new bars are filtered in
+    O(new bars) instead of re-running over the whole history. The causal output lags
+    the zero-phase butterworth_filter; refine_tail() gives a zero-phase view of the
+    most recent bars when a smoothed display is needed.
+
+    Parameters:
+        cutoff_minutes, order, sample_minutes: As butterworth_filter
+    """
+
+    def __init__(self, cutoff_minutes=240, order=4, sample_minutes=SAMPLE_MINUTES):
+        self.cutoff_minutes = cutoff_minutes
+        self.order = order
+        self.sample_minutes = sample_minutes
+        self.sos = design_butterworth(order, cutoff_minutes, sample_minutes)
+        self.states = {}
+
+    @property
+    def key(self):
+        """Design this state belongs to: (order, cutoff_minutes, sample_minutes)"""
+        return (self.order, self.cutoff_minutes, self.sample_minutes)
+
+    def _initial_state(self, first_value):
+        # start as if the series had always sat at its first value (no step transient)
+        return sosfilt_zi(self.sos) * first_value
+
+    def update(self, ticker, values):
+        """
+        Filter new bars for one ticker, continuing from its stored state.
+
+        Returns:
+            np.ndarray: Causally filtered values for the new bars
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return values
+        zi = self.states.get(ticker)
+        if zi is None:
+            zi = self._initial_state(values[0])
+        filtered, self.states[ticker] = sosfilt(self.sos, values, zi=zi)
+        return filtered
+
+    def update_many(self, tickers, values):
+        """
+        Filter the same number of new bars for many tickers in one call.
+
+        Parameters:
+            tickers (list[str]): Row labels of values
+            values (np.ndarray): (tickers x new bars) array
+
+        Returns:
+            np.ndarray: Filtered (tickers x new bars) array
+        """
+
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape[1] == 0:
+            return values
+        # sosfilt wants zi shaped (sections, tickers, 2) for axis=-1 on a 2-D block
+        zi = np.stack([
+            self.states[t] if t in self.states else self._initial_state(values[i, 0])
+            for i, t in enumerate(tickers)
+        ], axis=1)
+        filtered, zf = sosfilt(self.sos, values, axis=-1, zi=zi)
+        for i, t in enumerate(tickers):
+            self.states[t] = zf[:, i, :]
+        return filtered
+
+    def refine_tail(self, values, window=64):
+        """Zero-phase filter over only the last `window` bars, for display"""
+        tail = np.asarray(values, dtype=np.float64)[..., -window:]
+        padlen = min(3 * (2 * len(self.sos) + 1), tail.shape[-1] - 1)
+        return sosfiltfilt(self.sos, tail, axis=-1, padlen=max(padlen, 0))
+
+    def get_state(self, ticker):
+        """Serializable copy of one ticker's state (None if never updated)"""
+        zi = self.states.get(ticker)
+        return None if zi is None else zi.astype(np.float64).tobytes()
+
+    def set_state(self, ticker, state):
+        """Restore a state produced by get_state"""
+        self.states[ticker] = np.frombuffer(state, dtype=np.float64).reshape(len(self.sos), 2).copy()
+
+
+def sample_interval_seconds(timestamps, default=3600.0):
+    """
+    Typical spacing of a timestamp series in seconds (median of positive gaps).
+
+    Overnight and weekend gaps are rarer than regular bars, so the median picks the
+    bar interval (3600 for the hourly bars ingestion stores).
+    """
+
+    ts = np.asarray(timestamps, dtype='datetime64[ns]')
+    if ts.size < 2:
+        return default
+    gaps = np.diff(ts).astype(np.int64) / 1e9
+    gaps = gaps[gaps > 0]
+    return float(np.median(gaps)) if gaps.size else default
+
+
+def compute_fft(series, timestamps=None, sample_seconds=None):
     """
     Compute FFT magnitude spectrum for frequency-domain analysis.
 
     Parameters:
         series (pd.Series): Price series
+        timestamps (array-like): Bar times, used to infer the sample interval
+        sample_seconds (float): Sample interval; defaults to the one inferred from
+                                timestamps or the series' DatetimeIndex, else 1 hour
 
     Returns:
         freqs (np.ndarray): Frequency bins
         magnitude (np.ndarray): Magnitude of FFT
     """
 
-    N = len(series)
+    if sample_seconds is None:
+        if timestamps is None and isinstance(getattr(series, 'index', None), pd.DatetimeIndex):
+            timestamps = series.index
+        sample_seconds = sample_interval_seconds(timestamps) if timestamps is not None else 3600.0
+
+    freqs, magnitude = compute_spectra(np.asarray(series, dtype=np.float64), sample_seconds, window=None)
+
+    return freqs, magnitude
+
+
+def compute_spectra(values, sample_seconds, window='hann'):
+    """
+    Magnitude spectra for many aligned series with one rfft along the last axis.
+
+    Parameters:
+        values (np.ndarray): (tickers x bars) array, or a single 1-D series
+        sample_seconds (float): Seconds between bars
+        window (str | None): scipy window name applied before the FFT ('hann', ...)
+
+    Returns:
+        freqs (np.ndarray): Frequency bins in Hz
+        magnitude (np.ndarray): |FFT| with the same leading shape as values
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    n = values.shape[-1]
 
     # Remove mean to avoid DC spike dominating spectrum
-    centered = series - np.mean(series)
+    centered = values - values.mean(axis=-1, keepdims=True)
+    if window is not None:
+        centered = centered * get_window(window, n, fftbins=True)
 
-    # FFT (real-valued)
-    fft_vals = np.fft.rfft(centered)
+    fft_vals = np.fft.rfft(centered, axis=-1)
+    freqs = np.fft.rfftfreq(n, d=sample_seconds)
 
-    # Frequency bins (15 minutes = 900 seconds)
-    freqs = np.fft.rfftfreq(N, d=15 * 60)
+    return freqs, np.abs(fft_vals)
 
-    magnitude = np.abs(fft_vals)
 
-    return freqs, magnitude
+def welch_spectra(values, sample_seconds, segment_bars=256, window='hann'):
+    """
+    Welch-averaged power spectral densities along the last axis, for long histories.
+
+    Returns:
+        freqs (np.ndarray): Frequency bins in Hz
+        psd (np.ndarray): PSD with the same leading shape as values
+    """
+
+    values = np.asarray(values, dtype=np.float64)
+    return welch(values, fs=1.0 / sample_seconds, window=window,
+                 nperseg=min(segment_bars, values.shape[-1]), detrend='constant', axis=-1)
+
+
+def dominant_cycles(tickers, values, sample_seconds, method='fft', window='hann', segment_bars=256):
+    """
+    Strongest cycle per ticker from a (tickers x bars) block.
+
+    Parameters:
+        tickers (list[str]): Row labels of values
+        values (np.ndarray): Aligned (tickers x bars) prices
+        sample_seconds (float): Seconds between bars
+        method (str): 'fft' (windowed periodogram) or 'welch'
+
+    Returns:
+        pd.DataFrame: ticker, frequency_hz, period_hours, power and power_share (the
+                      dominant bin's share of total non-DC power)
+    """
+
+    if method == 'welch':
+        freqs, power = welch_spectra(values, sample_seconds, segment_bars, window)
+    else:
+        freqs, magnitude = compute_spectra(values, sample_seconds, window)
+        power = magnitude ** 2
+
+    # skip the DC bin
+    power = np.atleast_2d(power)[:, 1:]
+    freqs = freqs[1:]
+    peak = np.argmax(power, axis=-1)
+    peak_power = power[np.arange(len(power)), peak]
+    total = power.sum(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'ticker': list(tickers),
+            'frequency_hz': freqs[peak],
+            'period_hours': 1.0 / freqs[peak] / 3600.0,
+            'power': peak_power,
+            'power_share': np.where(total > 0, peak_power / total, 0.0),
+        })
 
 
 def dsp_forecast(filtered_series, steps=4):
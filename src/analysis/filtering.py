@@ -0,0 +1,74 @@
+import sys
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.dsp import StreamingButterworth
+from database.connection import session_scope
+from database.read import load_bar_arrays_since, load_filter_states, partition_by_ticker
+from database.write import write_filter_states
+from ingestion.ticker_loader import get_sp500_tickers
+
+
+def update_filter_states(tickers=None, cutoff_minutes=240, order=4, sample_minutes=60):
+    """
+    Advance every ticker's streaming Butterworth state over its new bars.
+
+    Loads the persisted states for this design, reads only bars after each ticker's
+    last filtered bar in one query, filters them causally and saves the new states.
+    Tickers with the same number of new bars are filtered together as one 2-D block.
+    sample_minutes matches the hourly bars ingestion stores and is part of the state
+    key, so states saved under another spacing are not reused.
+
+    Returns:
+        dict: 'latest' (ticker -> latest causally filtered close), counts and timing
+    """
+
+    tickers = tickers or get_sp500_tickers()
+    started = time.perf_counter()
+
+    stream = StreamingButterworth(cutoff_minutes, order, sample_minutes)
+    stored = load_filter_states(order, cutoff_minutes, sample_minutes, tickers)
+    for ticker, (state, _, _) in stored.items():
+        stream.set_state(ticker, state)
+
+    arrays = load_bar_arrays_since({t: stored[t][1] if t in stored else None for t in tickers})
+    bars = partition_by_ticker(arrays)
+
+    # steady state: most tickers got the same number of bars, filter them in one call
+    by_length = defaultdict(list)
+    for ticker, columns in bars.items():
+        by_length[len(columns['close'])].append(ticker)
+
+    latest = {}
+    for group in by_length.values():
+        block = np.vstack([bars[t]['close'] for t in group])
+        filtered = stream.update_many(group, block)
+        for i, ticker in enumerate(group):
+            latest[ticker] = float(filtered[i, -1])
+
+    now = datetime.utcnow()
+    rows = [{
+        'ticker': ticker,
+        'filter_order': order,
+        'cutoff_minutes': cutoff_minutes,
+        'sample_minutes': sample_minutes,
+        'state': stream.get_state(ticker),
+        'last_timestamp': bars[ticker]['timestamp'][-1].item(),
+        'last_value': value,
+        'updated_at': now,
+    } for ticker, value in latest.items()]
+
+    with session_scope() as session:
+        write_filter_states(session, rows)
+
+    print(f"Filter states: {len(rows)} tickers advanced over {len(arrays['ticker'])} new bars")
+    return {
+        'latest': latest,
+        'tickers': len(rows),
+        'bars': len(arrays['ticker']),
+        'seconds': time.perf_counter() - started,
+    }
@@ -0,0 +1,231 @@
+import sys
+import os
+import json
+import time
+import warnings
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from statsmodels.tsa.arima.model import ARIMA
+from database.connection import session_scope
+from database.read import load_arima_params
+from database.write import write_arima_params
+from monitoring.metrics import registry
+
+ARIMA_ORDER = (2, 1, 2)
+FIT_MAXITER = int(os.getenv('ARIMA_MAXITER', '50'))
+FIT_TIME_BUDGET = float(os.getenv('ARIMA_TIME_BUDGET', '5'))  # seconds per fit
+
+
+class FitBudgetExceeded(Exception):
+    """Raised from the optimizer callback when a fit runs past its time budget"""
+
+
+def drift_forecast(values, steps):
+    """Fallback forecast: last value plus the average bar-to-bar change"""
+    values = np.asarray(values, dtype=np.float64)
+    slope = (values[-1] - values[0]) / (len(values) - 1) if len(values) > 1 else 0.0
+    return values[-1] + slope * np.arange(1, steps + 1)
+
+
+def fit_arima(values, order=ARIMA_ORDER, start_params=None, maxiter=FIT_MAXITER, time_budget=FIT_TIME_BUDGET):
+    """
+    Fit ARIMA within a time budget, optionally warm-started.
+
+    Parameters:
+        values (array-like): Series to fit (e.g. Butterworth filtered close)
+        order (tuple): ARIMA (p, d, q)
+        start_params (np.ndarray): Parameters from the ticker's previous fit
+        maxiter (int): Optimizer iterations
+        time_budget (float): Seconds before the fit is abandoned
+
+    Returns:
+        ARIMAResults: Fitted result (raises FitBudgetExceeded or the fit's own error)
+    """
+
+    deadline = time.perf_counter() + time_budget
+
+    def check_budget(*args):
+        if time.perf_counter() > deadline:
+            raise FitBudgetExceeded(f"fit exceeded {time_budget}s")
+
+    model = ARIMA(np.asarray(values, dtype=np.float64), order=order)
+    if start_params is not None and len(start_params) != len(model.start_params):
+        start_params = None
+
+    with warnings.catch_warnings():
+        # convergence is read from mle_retvals instead
+        warnings.simplefilter('ignore')
+        return model.fit(
+            start_params=start_params,
+            method_kwargs={'maxiter': maxiter, 'callback': check_budget}
+        )
+
+
+def forecast_ticker(job):
+    """
+    Fit and forecast one ticker; runs inside a pool worker.
+
+    Parameters:
+        job (tuple): (ticker, values, previous params or None, steps, order, time_budget)
+
+    Returns:
+        dict: ticker, forecast, params, converged, warm_start, fallback, error, seconds
+    """
+
+    ticker, values, start_params, steps, order, time_budget = job
+    started = time.perf_counter()
+    out = {'ticker': ticker, 'warm_start': start_params is not None, 'fallback': False,
+           'converged': False, 'params': None, 'error': None}
+
+    try:
+        res = fit_arima(values, order=order, start_params=start_params, time_budget=time_budget)
+        out['converged'] = bool(res.mle_retvals.get('converged', True)) if res.mle_retvals else True
+        out['params'] = np.asarray(res.params, dtype=np.float64)
+        out['forecast'] = np.asarray(res.forecast(steps=steps), dtype=np.float64)
+    except Exception as e:
+        out['error'] = str(e)
+
+    if not out['converged']:
+        # keep the parameters for the next warm start only if they came from a clean fit
+        out['fallback'] = True
+        out['params'] = None
+        out['forecast'] = drift_forecast(values, steps)
+
+    out['seconds'] = time.perf_counter() - started
+    return out
+
+
+class BatchForecaster:
+    """
+    Universe-wide ARIMA forecasting over a process pool.
+
+    Each ticker's fit starts from its previous parameters when known. Fits that fail,
+    don't converge or run past the time budget fall back to a drift forecast. Fitted
+    results are kept in memory so later bars can be appended with update() instead
+    of refitting.
+
+    Parameters:
+        order (tuple): ARIMA (p, d, q)
+        steps (int): Bars to forecast
+        workers (int): Pool processes (None = CPU count)
+        time_budget (float): Seconds allowed per fit
+    """
+
+    def __init__(self, order=ARIMA_ORDER, steps=4, workers=None, time_budget=FIT_TIME_BUDGET):
+        self.order = order
+        self.steps = steps
+        self.workers = workers
+        self.time_budget = time_budget
+        self.params = {}
+        self.results = {}
+        self.outcomes = {}  # ticker -> (converged, fit seconds) of the latest fit_all
+
+    @property
+    def order_key(self):
+        return ','.join(str(p) for p in self.order)
+
+    def fit_all(self, series):
+        """
+        Fit and forecast every ticker.
+
+        Parameters:
+            series (dict): ticker -> 1-D array of values to model
+
+        Returns:
+            (dict, dict): ticker -> forecast array, and run stats (fits/s, convergence)
+        """
+
+        jobs = [
+            (ticker, np.asarray(values, dtype=np.float64), self.params.get(ticker),
+             self.steps, self.order, self.time_budget)
+            for ticker, values in series.items()
+        ]
+
+        started = time.perf_counter()
+        # spawn, not fork: materialize_dsp runs this from a scheduler thread
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as pool:
+            outcomes = list(pool.map(forecast_ticker, jobs, chunksize=max(1, len(jobs) // 64)))
+        wall = time.perf_counter() - started
+
+        forecasts = {}
+        for out in outcomes:
+            forecasts[out['ticker']] = out['forecast']
+            # fits run in pool processes, so their timings are recorded here
+            registry.observe('arima_fit_seconds', out['seconds'], warm_start=str(out['warm_start']).lower())
+            registry.inc('arima_fits_total', status='fallback' if out['fallback'] else 'converged')
+            if out['params'] is not None:
+                self.params[out['ticker']] = out['params']
+            self.outcomes[out['ticker']] = (not out['fallback'], out['seconds'])
+            # pool results can't carry the fitted model back; update() needs a local fit
+            self.results.pop(out['ticker'], None)
+
+        fit_seconds = [out['seconds'] for out in outcomes]
+        stats = {
+            'tickers': len(outcomes),
+            'wall_seconds': wall,
+            'fits_per_second': len(outcomes) / wall if wall > 0 else 0.0,
+            'converged': sum(out['converged'] for out in outcomes),
+            'fallbacks': sum(out['fallback'] for out in outcomes),
+            'warm_started': sum(out['warm_start'] for out in outcomes),
+            'errors': {out['ticker']: out['error'] for out in outcomes if out['error']},
+            'mean_fit_seconds': float(np.mean(fit_seconds)) if fit_seconds else 0.0,
+            'max_fit_seconds': float(np.max(fit_seconds)) if fit_seconds else 0.0,
+        }
+        return forecasts, stats
+
+    def update(self, ticker, history, new_values):
+        """
+        Cheap forecast refresh: append new observations to a fitted result, no refit.
+
+        Parameters:
+            ticker (str): Symbol
+            history (array-like): Values the ticker's parameters were fitted on, used
+                                  to rebuild the result if it isn't in memory yet
+            new_values (array-like): Bars that arrived since
+
+        Returns:
+            np.ndarray: Forecast for the next `steps` bars
+        """
+
+        res = self.results.get(ticker)
+        if res is None:
+            params = self.params.get(ticker)
+            if params is None:
+                raise KeyError(f"No fitted parameters for {ticker}")
+            # Kalman filter pass with fixed parameters, no optimization
+            res = ARIMA(np.asarray(history, dtype=np.float64), order=self.order).filter(params)
+
+        res = res.append(np.asarray(new_values, dtype=np.float64), refit=False)
+        self.results[ticker] = res
+        return np.asarray(res.forecast(steps=self.steps), dtype=np.float64)
+
+    def load_params(self, tickers=None):
+        """Warm-start parameters from arima_params"""
+        self.params.update(load_arima_params(self.order_key, tickers))
+
+    def save_params(self):
+        """
+        Persist the parameters of every ticker fitted by fit_all to arima_params.
+
+        A fallback keeps the ticker's previous (warm-start) parameters and is stored
+        with converged=0, next to the fit's own duration.
+        """
+        now = datetime.utcnow()
+        rows = [{
+            'ticker': ticker,
+            'model_order': self.order_key,
+            'params': json.dumps([float(p) for p in self.params[ticker]]),
+            'converged': int(converged),
+            'fit_seconds': seconds,
+            'updated_at': now,
+        } for ticker, (converged, seconds) in self.outcomes.items() if ticker in self.params]
+        if not rows:
+            return 0
+        with session_scope() as session:
+            return write_arima_params(session, rows)
+
@@ -0,0 +1,180 @@
+import sys
+import os
+import time
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.connection import get_engine, session_scope
+from database.write import write_indicator_rows
+from ingestion.ticker_loader import get_sp500_tickers
+
+# windows are in bars; ingestion stores hourly bars, 7 per trading day
+BARS_PER_DAY = 7
+MA_SHORT = 5
+MA_LONG = 20
+VOLATILITY_WINDOW = 5 * BARS_PER_DAY
+RSI_PERIOD = 14
+
+# bars before the first new one needed to fill every window
+WARMUP_BARS = max(MA_LONG, VOLATILITY_WINDOW, RSI_PERIOD)
+
+
+def group_positions(tickers):
+    """
+    Position of each row within its ticker's run.
+
+    Parameters:
+        tickers (np.ndarray): Ticker per row, rows sorted by (ticker, timestamp)
+
+    Returns:
+        np.ndarray: 0 for each ticker's first bar, 1 for the next, ...
+    """
+
+    n = len(tickers)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+    lengths = np.diff(np.r_[starts, n])
+    return np.arange(n) - np.repeat(starts, lengths)
+
+
+def grouped_rolling_mean(values, positions, window):
+    """
+    Trailing mean over `window` rows that never crosses a ticker boundary.
+
+    Uses one cumulative sum over the whole array; rows with fewer than `window`
+    rows of history in their own ticker are NaN.
+    """
+
+    cumsum = np.concatenate([[0.0], np.cumsum(values, dtype=np.float64)])
+    idx = np.arange(1, len(values) + 1)
+    sums = cumsum[idx] - cumsum[np.maximum(idx - window, 0)]
+    out = sums / window
+    out[positions < window - 1] = np.nan
+    return out
+
+
+def compute_indicators(tickers, close):
+    """
+    MA-5, MA-20, 5-day volatility and RSI for every bar of every ticker at once.
+
+    Parameters:
+        tickers (np.ndarray): Ticker per row, rows sorted by (ticker, timestamp)
+        close (np.ndarray): Close price per row
+
+    Returns:
+        dict: ma_5, ma_20, volatility_5d, rsi arrays aligned with the input rows
+              (NaN where a window doesn't have enough history yet)
+    """
+
+    close = np.asarray(close, dtype=np.float64)
+    positions = group_positions(np.asarray(tickers))
+
+    ma_5 = grouped_rolling_mean(close, positions, MA_SHORT)
+    ma_20 = grouped_rolling_mean(close, positions, MA_LONG)
+
+    # bar-to-bar changes, zeroed on each ticker's first bar so windows can't leak
+    diff = np.diff(close, prepend=np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ret = np.log(close / np.roll(close, 1))
+    first = positions == 0
+    diff[first] = 0.0
+    log_ret[first] = 0.0
+
+    # std of hourly log returns over 5 trading days, needs window + 1 bars
+    mean_ret = grouped_rolling_mean(log_ret, positions, VOLATILITY_WINDOW)
+    mean_sq = grouped_rolling_mean(log_ret ** 2, positions, VOLATILITY_WINDOW)
+    variance = np.maximum(mean_sq - mean_ret ** 2, 0.0) * VOLATILITY_WINDOW / (VOLATILITY_WINDOW - 1)
+    volatility = np.sqrt(variance)
+    volatility[positions < VOLATILITY_WINDOW] = np.nan
+
+    # simple-average RSI, window based so incremental runs match full recomputes
+    gains = grouped_rolling_mean(np.maximum(diff, 0.0), positions, RSI_PERIOD)
+    losses = grouped_rolling_mean(np.maximum(-diff, 0.0), positions, RSI_PERIOD)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(losses == 0, 100.0, 100.0 - 100.0 / (1.0 + gains / losses))
+    rsi[positions < RSI_PERIOD] = np.nan
+
+    return {'ma_5': ma_5, 'ma_20': ma_20, 'volatility_5d': volatility, 'rsi': rsi}
+
+
+def load_indicator_input(tickers, engine=None):
+    """
+    Bars each ticker still needs indicators for, plus the warm-up bars before them.
+
+    One query: the last technical_indicators timestamp per ticker picks where each
+    ticker's read starts, then stock_prices is range scanned per ticker on
+    idx_ticker_timestamp.
+
+    Returns:
+        pd.DataFrame: ticker, timestamp, close, last_ts sorted by (ticker, timestamp)
+    """
+
+    engine = engine or get_engine()
+    query = text("""
+        WITH marks AS (
+            SELECT t.ticker,
+                   (SELECT max(i.timestamp) FROM technical_indicators i
+                    WHERE i.ticker = t.ticker) AS last_ts
+            FROM unnest(CAST(:tickers AS varchar[])) AS t(ticker)
+        ), starts AS (
+            SELECT m.ticker, m.last_ts,
+                   COALESCE((SELECT q.timestamp FROM stock_prices q
+                             WHERE q.ticker = m.ticker AND q.timestamp <= m.last_ts
+                             ORDER BY q.timestamp DESC
+                             OFFSET :warmup LIMIT 1),
+                            '-infinity'::timestamp) AS from_ts
+            FROM marks m
+        )
+        SELECT p.ticker, p.timestamp, p.close, s.last_ts
+        FROM starts s
+        JOIN stock_prices p ON p.ticker = s.ticker AND p.timestamp >= s.from_ts
+        WHERE p.close IS NOT NULL
+        ORDER BY p.ticker, p.timestamp
+    """)
+
+    with engine.connect() as conn:
+        return pd.read_sql_query(query, conn, params={'tickers': list(tickers), 'warmup': WARMUP_BARS})
+
+
+def update_technical_indicators(tickers=None):
+    """
+    Recompute indicators for bars newer than each ticker's last indicator row.
+
+    Returns:
+        dict: bars read, rows written and timings
+    """
+
+    tickers = tickers or get_sp500_tickers()
+    started = time.perf_counter()
+
+    bars = load_indicator_input(tickers)
+    loaded = time.perf_counter()
+    if bars.empty:
+        return {'bars_read': 0, 'rows_written': 0, 'load_seconds': loaded - started,
+                'compute_seconds': 0.0, 'write_seconds': 0.0}
+
+    values = compute_indicators(bars['ticker'].to_numpy(), bars['close'].to_numpy())
+    result = pd.DataFrame({'ticker': bars['ticker'], 'timestamp': bars['timestamp'], **values})
+
+    # only the new tail; warm-up rows already have indicators
+    new = bars['last_ts'].isna() | (bars['timestamp'] > bars['last_ts'])
+    result = result[new.to_numpy()]
+    computed = time.perf_counter()
+
+    rows = result.astype(object).where(result.notna(), None).to_dict('records')
+    with session_scope() as session:
+        written = write_indicator_rows(session, rows)
+
+    stats = {
+        'bars_read': len(bars),
+        'rows_written': written,
+        'load_seconds': loaded - started,
+        'compute_seconds': computed - loaded,
+        'write_seconds': time.perf_counter() - computed,
+    }
+    print(f"Technical indicators: {written} rows for {result['ticker'].nunique()} tickers "
+          f"({len(bars)} bars read)")
+    return stats
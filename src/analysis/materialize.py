@@ -0,0 +1,117 @@
+import sys
+import os
+import json
+import time
+from collections import defaultdict
+from datetime import datetime
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.dsp import butterworth_filter, compute_spectra
+from analysis.forecasting import BatchForecaster, ARIMA_ORDER
+from analysis.resample import aligned_bars, finite_tail
+from database.connection import session_scope
+from database.read import load_snapshot_marks
+from database.write import write_dsp_snapshots
+from ingestion.ticker_loader import get_sp500_tickers
+from monitoring.metrics import registry
+
+# what the dashboard shows: last 100 session-grid bars, default Butterworth, ARIMA next 4 bars
+DSP_WINDOW = 100
+FILTER_CUTOFF_MINUTES = 240
+FILTER_ORDER = 4
+FORECAST_STEPS = 4
+MIN_BARS = 30
+
+# bump when any of the above or the DSP code changes meaning
+MODEL_VERSION = (f"bw{FILTER_ORDER}-{FILTER_CUTOFF_MINUTES}m"
+                 f"_arima{''.join(str(p) for p in ARIMA_ORDER)}_w{DSP_WINDOW}_v2")
+
+
+def _json(values):
+    return json.dumps([None if not np.isfinite(v) else round(float(v), 6) for v in values])
+
+
+def materialize_dsp(tickers=None, window=DSP_WINDOW, workers=None):
+    """
+    Precompute the dashboard's DSP results for every ticker with new bars.
+
+    Bars come from the shared session grid (analysis.resample), gaps filled, so
+    samples are evenly spaced in trading time. Filters and spectra are computed on 2-D
+    blocks of equal-length windows, forecasts go through the warm-started
+    BatchForecaster pool. Results are upserted into dsp_snapshots, one current row
+    per (ticker, MODEL_VERSION) under uix_dsp_ticker_version, stamped with the as_of bar.
+
+    Returns:
+        dict: Counts and timing
+    """
+
+    tickers = tickers or get_sp500_tickers()
+    started = time.perf_counter()
+
+    marks = load_snapshot_marks(MODEL_VERSION, tickers)
+    aligned = aligned_bars(tickers).window(window)
+    close = aligned.filled('close')
+    as_of = aligned.last_observed()
+    # each row's usable history: the trailing run of filled bars
+    starts = finite_tail(close)
+
+    # only tickers whose newest bar isn't materialized yet
+    todo = {
+        ticker: (i, int(starts[i])) for i, ticker in enumerate(aligned.tickers)
+        if len(aligned.grid) - starts[i] >= MIN_BARS
+        and (ticker not in marks or as_of[i].item() > marks[ticker])
+    }
+    if not todo:
+        print("DSP snapshots: nothing new to materialize")
+        return {'tickers': 0, 'seconds': time.perf_counter() - started}
+
+    by_start = defaultdict(list)
+    for ticker, (row, start) in todo.items():
+        by_start[start].append(ticker)
+
+    filtered = {}
+    spectra = {}
+    for start, group in by_start.items():
+        block = close[[todo[t][0] for t in group], start:]
+        with registry.timer('dsp_seconds', step='butterworth'):
+            smooth = butterworth_filter(block, cutoff_minutes=FILTER_CUTOFF_MINUTES, order=FILTER_ORDER,
+                                        sample_minutes=aligned.bar_minutes)
+        with registry.timer('dsp_seconds', step='fft'):
+            freqs, magnitude = compute_spectra(block, aligned.sample_seconds, window=None)
+        for i, ticker in enumerate(group):
+            filtered[ticker] = smooth[i]
+            spectra[ticker] = (freqs, magnitude[i])
+
+    forecaster = BatchForecaster(steps=FORECAST_STEPS, workers=workers)
+    forecaster.load_params(list(filtered))
+    forecasts, forecast_stats = forecaster.fit_all(filtered)
+    forecaster.save_params()
+
+    now = datetime.utcnow()
+    rows = []
+    for ticker, (row, start) in todo.items():
+        freqs, magnitude = spectra[ticker]
+        # dominant non-DC bin
+        peak = int(np.argmax(magnitude[1:])) + 1 if len(magnitude) > 1 else 0
+        rows.append({
+            'ticker': ticker,
+            'model_version': MODEL_VERSION,
+            'as_of': as_of[row].item(),
+            'timestamps': json.dumps(list(np.datetime_as_string(aligned.grid[start:], unit='s'))),
+            'close': _json(close[row, start:]),
+            'filtered': _json(filtered[ticker]),
+            'fft_freqs': _json(freqs),
+            'fft_magnitude': _json(magnitude),
+            'forecast': _json(forecasts[ticker]),
+            'dominant_period_hours': float(1.0 / freqs[peak] / 3600.0) if peak else None,
+            'computed_at': now,
+        })
+
+    with session_scope() as session:
+        write_dsp_snapshots(session, rows)
+
+    elapsed = time.perf_counter() - started
+    print(f"DSP snapshots: {len(rows)} tickers materialized in {elapsed:.1f}s "
+          f"({forecast_stats['fallbacks']} forecast fallbacks)")
+    return {'tickers': len(rows), 'forecast': forecast_stats, 'seconds': elapsed}
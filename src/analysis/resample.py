@@ -0,0 +1,500 @@
+import sys
+import os
+import time
+import uuid
+import threading
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.read import load_session_timezone
+from monitoring.metrics import registry
+from monitoring.events import log_event
+from scheduler.market_hours import MarketCalendar, EXCHANGE_TZ, MARKET_OPEN, MARKET_CLOSE, EARLY_CLOSE
+from storage.source import load_bar_arrays
+
+RESAMPLE_FILL = os.getenv('RESAMPLE_FILL', 'ffill')  # none, zero, ffill or linear
+RESAMPLE_FILL_LIMIT = int(os.getenv('RESAMPLE_FILL_LIMIT', '7'))  # longest gap filled, in bars (0 = no limit)
+RESAMPLE_BARS = int(os.getenv('RESAMPLE_BARS', '2048'))  # grid columns kept per ticker
+RESAMPLE_CACHE = os.getenv('RESAMPLE_CACHE', os.path.join('data', 'resampled', 'bars_1h.npz'))
+# time zone of stock_prices' naive timestamps; empty = the database session TimeZone
+RESAMPLE_TIMEZONE = os.getenv('RESAMPLE_TIMEZONE', '')
+
+BAR_MINUTES = 60
+FILL_POLICIES = ('none', 'zero', 'ffill', 'linear')
+
+# grid columns re-read on every update, so bars that land late still fill their slot
+REVISIT_BARS = 14
+
+
+def session_grid(start, end, tz='UTC', bar_minutes=BAR_MINUTES, calendar=None):
+    """
+    Bar start times of every regular session between start and end.
+
+    Bars start at the open and every bar_minutes after it (09:30 ... 15:30 New York
+    for hourly bars), on trading days only, so overnight, weekend and holiday gaps
+    take no columns. Early-close days end with the bar that starts before 13:00.
+
+    Parameters:
+        start, end (datetime): Inclusive range, naive values in `tz`
+        tz (str): Time zone of the stored timestamps the grid has to match
+
+    Returns:
+        np.ndarray: Naive datetime64[us] bar starts in `tz`, ascending
+    """
+
+    calendar = calendar or MarketCalendar()
+    start = pd.Timestamp(start).tz_localize(tz, ambiguous=True, nonexistent='shift_forward')
+    end = pd.Timestamp(end).tz_localize(tz, ambiguous=True, nonexistent='shift_forward')
+    first = start.tz_convert(EXCHANGE_TZ).normalize().tz_localize(None)
+    last = end.tz_convert(EXCHANGE_TZ).normalize().tz_localize(None)
+    days = [d for d in pd.bdate_range(first, last) if calendar.is_trading_day(d)]
+    if not days:
+        return np.array([], dtype='datetime64[us]')
+
+    open_minutes = MARKET_OPEN.hour * 60 + MARKET_OPEN.minute
+    session_minutes = MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute - open_minutes
+    offsets = open_minutes + bar_minutes * np.arange(-(-session_minutes // bar_minutes))
+    early = np.array([calendar.is_early_close(d) for d in days])
+    closes = np.where(early, EARLY_CLOSE.hour * 60 + EARLY_CLOSE.minute, MARKET_CLOSE.hour * 60 + MARKET_CLOSE.minute)
+    days = pd.DatetimeIndex(days).to_numpy().astype('datetime64[m]')
+    local = (days[:, None] + offsets.astype('timedelta64[m]'))[offsets[None, :] < closes[:, None]]
+    grid = (pd.DatetimeIndex(local).tz_localize(EXCHANGE_TZ).tz_convert(tz).tz_localize(None)
+            .to_numpy(dtype='datetime64[us]'))
+    return grid[(grid >= start.tz_localize(None).to_datetime64()) & (grid <= end.tz_localize(None).to_datetime64())]
+
+
+def fill_gaps(values, mask, policy=RESAMPLE_FILL, limit=RESAMPLE_FILL_LIMIT):
+    """
+    Fill the missing cells of a (tickers x grid) block along the time axis.
+
+    Policies:
+        none:   leave missing bars NaN
+        zero:   0 (for volume)
+        ffill:  carry the last observed value forward
+        linear: interpolate between the observed bars either side of a gap; a gap
+                at the end of the grid is carried forward as with ffill
+
+    Nothing is filled before a ticker's first observed bar, or across a gap longer
+    than `limit` bars (0 = no limit).
+
+    Returns:
+        np.ndarray: New float64 array, same shape as values
+    """
+
+    if policy not in FILL_POLICIES:
+        raise ValueError(f"Unknown fill policy {policy!r}, expected one of {FILL_POLICIES}")
+    if policy == 'none':
+        return np.where(mask, values, np.nan)
+    if policy == 'zero':
+        return np.where(mask, values, 0.0)
+
+    n_rows, n_cols = mask.shape
+    rows = np.arange(n_rows)[:, None]
+    cols = np.arange(n_cols)
+
+    # index of the last observed bar at or before each column (-1 = none yet)
+    prev = np.where(mask, cols, -1)
+    np.maximum.accumulate(prev, axis=1, out=prev)
+    carried = values[rows, np.maximum(prev, 0)]
+    valid = prev >= 0
+    if limit:
+        valid &= cols - prev <= limit
+    if policy == 'ffill':
+        return np.where(valid, carried, np.nan)
+
+    # index of the next observed bar at or after each column (n_cols = none left)
+    nxt = np.where(mask, cols, n_cols)[:, ::-1]
+    nxt = np.minimum.accumulate(nxt, axis=1)[:, ::-1]
+    inside = (prev >= 0) & (nxt < n_cols)
+    if limit:
+        inside &= nxt - prev - 1 <= limit
+    weight = np.where(inside, (cols - prev) / np.maximum(nxt - prev, 1), 0.0)
+    following = values[rows, np.minimum(nxt, n_cols - 1)]
+    interpolated = carried + (following - carried) * weight
+    return np.where(inside, interpolated, np.where(valid & (nxt == n_cols), carried, np.nan))
+
+
+def finite_tail(values):
+    """Start column of each row's trailing run of finite values (n_cols = none)"""
+    n_cols = values.shape[1]
+    if n_cols == 0:
+        return np.zeros(len(values), dtype=np.int64)
+    bad = ~np.isfinite(values)
+    last_bad = n_cols - 1 - np.argmax(bad[:, ::-1], axis=1)
+    return np.where(bad.any(axis=1), last_bad + 1, 0)
+
+
+class AlignedBlock:
+    """
+    Bars of many tickers on one shared session grid.
+
+    Each column is a dense (tickers x grid) float64 array with NaN where a ticker has
+    no bar, and `mask` marks the cells that hold a real bar. Rows follow `tickers`,
+    columns follow `grid`; fills are computed on demand so the raw bars stay intact.
+
+    Parameters:
+        tickers (list[str]): Row labels
+        grid (np.ndarray): datetime64[us] bar starts
+        values (dict): column -> (tickers x grid) array
+        mask (np.ndarray): bool (tickers x grid), True where a bar was stored
+        off_grid (np.ndarray): Bars per ticker that fell between grid points
+        bar_minutes (int): Grid spacing in session time
+    """
+
+    def __init__(self, tickers, grid, values, mask, off_grid=None, bar_minutes=BAR_MINUTES):
+        self.tickers = list(tickers)
+        self.rows = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.grid = grid
+        self.values = values
+        self.mask = mask
+        self.off_grid = off_grid if off_grid is not None else np.zeros(len(self.tickers), dtype=np.int64)
+        self.bar_minutes = bar_minutes
+
+    @property
+    def sample_seconds(self):
+        return self.bar_minutes * 60.0
+
+    @property
+    def shape(self):
+        return self.mask.shape
+
+    def window(self, n):
+        """The newest n grid columns (views, no copies)"""
+        n = min(n, len(self.grid))
+        return AlignedBlock(self.tickers, self.grid[len(self.grid) - n:],
+                            {name: v[:, v.shape[1] - n:] for name, v in self.values.items()},
+                            self.mask[:, self.mask.shape[1] - n:], self.off_grid, self.bar_minutes)
+
+    def select(self, tickers):
+        """Rows for the given tickers that the block holds, in that order"""
+        index = [self.rows[t] for t in tickers if t in self.rows]
+        return AlignedBlock([self.tickers[i] for i in index], self.grid,
+                            {name: v[index] for name, v in self.values.items()},
+                            self.mask[index], self.off_grid[index], self.bar_minutes)
+
+    def filled(self, column='close', policy=None, limit=RESAMPLE_FILL_LIMIT):
+        """Dense values of one column with gaps filled (volume defaults to zero-fill)"""
+        if policy is None:
+            policy = 'zero' if column == 'volume' else RESAMPLE_FILL
+        return fill_gaps(self.values[column], self.mask, policy, limit)
+
+    def session_slots(self):
+        """Position of each grid column within its session (0 = the opening bar)"""
+        columns = np.arange(len(self.grid))
+        if not len(columns):
+            return columns
+        opens = np.r_[True, np.diff(self.grid) > np.timedelta64(self.bar_minutes, 'm')]
+        return columns - np.maximum.accumulate(np.where(opens, columns, 0))
+
+    def last_observed(self):
+        """Timestamp of each ticker's newest real bar (NaT if it has none)"""
+        observed = self.mask.any(axis=1)
+        last = self.mask.shape[1] - 1 - np.argmax(self.mask[:, ::-1], axis=1)
+        out = np.full(len(self.tickers), np.datetime64('NaT'), dtype='datetime64[us]')
+        out[observed] = self.grid[last[observed]]
+        return out
+
+    def gap_report(self):
+        """
+        Per-ticker coverage of the grid from the ticker's first bar to the grid's end.
+
+        Returns:
+            pd.DataFrame: ticker, expected, observed, missing, coverage, gaps,
+                          longest_gap (bars), first, last, off_grid
+        """
+
+        n_cols = self.mask.shape[1]
+        observed = self.mask.any(axis=1)
+        first = np.where(observed, np.argmax(self.mask, axis=1), n_cols)
+        missing = (np.arange(n_cols) >= first[:, None]) & ~self.mask
+
+        # run lengths of consecutive missing bars: running count minus the count at the last observed bar
+        count = np.cumsum(missing, axis=1)
+        at_reset = np.maximum.accumulate(np.where(missing, 0, count), axis=1)
+        longest = (count - at_reset).max(axis=1) if n_cols else np.zeros(len(self.tickers), dtype=np.int64)
+        starts = missing & ~np.c_[np.zeros((len(self.tickers), 1), dtype=bool), missing[:, :-1]]
+
+        expected = n_cols - first
+        n_observed = self.mask.sum(axis=1)
+        first_ts = np.full(len(self.tickers), np.datetime64('NaT'), dtype='datetime64[us]')
+        first_ts[observed] = self.grid[first[observed]]
+        return pd.DataFrame({
+            'ticker': self.tickers,
+            'expected': expected,
+            'observed': n_observed,
+            'missing': expected - n_observed,
+            'coverage': np.divide(n_observed, expected, out=np.zeros(len(self.tickers)), where=expected > 0),
+            'gaps': starts.sum(axis=1),
+            'longest_gap': longest,
+            'first': first_ts,
+            'last': self.last_observed(),
+            'off_grid': self.off_grid,
+        })
+
+    def memory(self):
+        return sum(v.nbytes for v in self.values.values()) + self.mask.nbytes + self.grid.nbytes
+
+
+def align_bars(arrays, grid, tickers=None, columns=('close',), bar_minutes=BAR_MINUTES, count_from=None):
+    """
+    Scatter multi-ticker bars onto a shared grid in one vectorized pass.
+
+    Parameters:
+        arrays (dict): Column arrays as load_bar_arrays returns them (with ticker)
+        grid (np.ndarray): datetime64[us] bar starts from session_grid
+        tickers (list[str]): Row order (default the tickers present, sorted); bars of
+                             other tickers are dropped
+        columns (tuple[str]): Value columns to align
+        count_from (np.datetime64): Count off-grid bars only from here on (default all)
+
+    Returns:
+        AlignedBlock
+    """
+
+    codes = np.asarray(arrays['ticker'], dtype=str)
+    if tickers is None:
+        tickers = np.unique(codes).tolist()
+    tickers = list(tickers)
+    shape = (len(tickers), len(grid))
+    values = {name: np.full(shape, np.nan) for name in columns}
+    mask = np.zeros(shape, dtype=bool)
+    off_grid = np.zeros(len(tickers), dtype=np.int64)
+    if len(codes) == 0 or not len(grid) or not tickers:
+        return AlignedBlock(tickers, grid, values, mask, off_grid, bar_minutes)
+
+    # ticker -> row through a sorted label lookup instead of a Python loop over bars
+    labels = np.asarray(tickers, dtype=str)
+    order = np.argsort(labels)
+    sorted_labels = labels[order]
+    found = np.minimum(np.searchsorted(sorted_labels, codes), len(sorted_labels) - 1)
+    known = sorted_labels[found] == codes
+    rows = order[found]
+
+    timestamps = np.asarray(arrays['timestamp'], dtype='datetime64[us]')
+    position = np.searchsorted(grid, timestamps)
+    in_range = (timestamps >= grid[0]) & (timestamps < grid[-1] + np.timedelta64(bar_minutes, 'm'))
+    on_grid = grid[np.minimum(position, len(grid) - 1)] == timestamps
+    hit = known & on_grid
+    if count_from is not None:
+        in_range &= timestamps >= count_from
+    np.add.at(off_grid, rows[known & in_range & ~on_grid], 1)
+
+    rows, position = rows[hit], position[hit]
+    mask[rows, position] = True
+    for name in columns:
+        values[name][rows, position] = np.asarray(arrays[name], dtype=np.float64)[hit]
+    return AlignedBlock(tickers, grid, values, mask, off_grid, bar_minutes)
+
+
+class ResampleCache:
+    """
+    An AlignedBlock of the newest `bars` grid columns, kept current incrementally.
+
+    The first update aligns the whole window; later ones extend the grid to now and
+    re-read only the bars from REVISIT_BARS columns back, so each run costs one small
+    query no matter how long the window is. Tickers seen for the first time are
+    loaded for the full window and appended as rows. The block is saved to an .npz
+    file after each update, so separate pipeline runs stay incremental.
+    invalidate_resample_cache() forces the next update to realign the whole window,
+    e.g. after a backfill wrote bars further back than REVISIT_BARS.
+
+    Parameters:
+        columns (tuple[str]): Value columns to keep
+        bars (int): Grid columns kept
+        path (str): .npz file (None = in-memory only)
+        tz (str): Time zone of the stored timestamps (default RESAMPLE_TIMEZONE, else
+                  the database session TimeZone)
+    """
+
+    def __init__(self, columns=('close', 'volume'), bars=RESAMPLE_BARS, path=RESAMPLE_CACHE, tz=None, engine=None):
+        self.columns = tuple(columns)
+        self.bars = bars
+        self.path = path
+        self.tz = tz or RESAMPLE_TIMEZONE or None
+        self.engine = engine
+        self.block = None
+        self.realigns = 0  # full realignments done by this instance
+        self.lock = threading.Lock()
+        if self.path and os.path.exists(self.path):
+            self.load()
+
+    def _timezone(self):
+        if self.tz is None:
+            self.tz = load_session_timezone(self.engine)
+        return self.tz
+
+    def _grid(self, start, end):
+        return session_grid(start, end, tz=self._timezone())
+
+    def _now(self):
+        return pd.Timestamp.now(tz=self._timezone()).tz_localize(None).floor('min')
+
+    def _full_grid(self, now):
+        # ~7 bars per session and ~252 sessions a year, with room for holidays
+        days = int(self.bars / 7 * 1.5) + 10
+        grid = self._grid(now - pd.Timedelta(days=days), now)
+        return grid[len(grid) - self.bars:] if len(grid) > self.bars else grid
+
+    def _load(self, tickers, start):
+        return load_bar_arrays(tickers, start=start.astype('datetime64[us]').item(),
+                               columns=['timestamp', *self.columns], engine=self.engine)
+
+    def update(self, tickers):
+        """
+        Bring the block up to date for `tickers` and return their rows.
+
+        Returns:
+            AlignedBlock: Rows for the requested tickers that have any stored bars
+        """
+
+        with self.lock, registry.timer('resample_seconds'):
+            started = time.perf_counter()
+            now = self._now()
+            block = self.block
+            stale = self._stale_marker()
+            if block is None or not len(block.grid) or stale is not None:
+                grid = self._full_grid(now)
+                if not len(grid):
+                    return AlignedBlock([], grid, {c: np.empty((0, 0)) for c in self.columns}, np.empty((0, 0), bool))
+                # rows of tickers not asked for this time are re-read too
+                rows = list(dict.fromkeys([*block.tickers, *tickers])) if block is not None else tickers
+                block = align_bars(self._load(rows, grid[0]), grid, columns=self.columns)
+                self.realigns += 1
+                mode = 'full'
+            else:
+                block = self._extend(block, now)
+                new = [t for t in tickers if t not in block.rows]
+                if new:
+                    block = _stack(block, align_bars(self._load(new, block.grid[0]), block.grid, columns=self.columns))
+                mode = 'incremental'
+
+            self.block = block
+            if self.path:
+                self.save()
+            if stale is not None:
+                self._clear_stale_marker(stale)
+            registry.inc('resample_updates_total', mode=mode)
+            log_event('resample', mode=mode, tickers=len(block.tickers), bars=len(block.grid),
+                      seconds=round(time.perf_counter() - started, 3), bytes=block.memory())
+            return block.select(tickers)
+
+    def _extend(self, block, now):
+        """Append grid columns up to now and re-align the last REVISIT_BARS + new columns"""
+        extension = self._grid(pd.Timestamp(block.grid[-1]) + pd.Timedelta(minutes=1), now)
+        grid = np.concatenate([block.grid, extension])
+        keep = max(0, len(block.grid) - REVISIT_BARS)
+        # off-grid bars in the re-read columns were counted before; only count the new ones
+        tail = align_bars(self._load(block.tickers, grid[keep]), grid[keep:], tickers=block.tickers,
+                          columns=self.columns, count_from=block.grid[-1] + np.timedelta64(block.bar_minutes, 'm'))
+
+        drop = max(0, len(grid) - self.bars)
+        values = {name: np.concatenate([block.values[name][:, drop:keep], tail.values[name][:, max(0, drop - keep):]],
+                                       axis=1)
+                  for name in self.columns}
+        mask = np.concatenate([block.mask[:, drop:keep], tail.mask[:, max(0, drop - keep):]], axis=1)
+        return AlignedBlock(block.tickers, grid[drop:], values, mask, block.off_grid + tail.off_grid,
+                            block.bar_minutes)
+
+    def _stale_marker(self):
+        """mtime of the invalidation marker next to the .npz, None if there is none"""
+        try:
+            return os.stat(f"{self.path}.stale").st_mtime_ns if self.path else None
+        except FileNotFoundError:
+            return None
+
+    def _clear_stale_marker(self, seen):
+        # a marker written while this update ran stays for the next one
+        if self._stale_marker() == seen:
+            try:
+                os.remove(f"{self.path}.stale")
+            except FileNotFoundError:
+                pass
+
+    def save(self):
+        """Write the block atomically (temp file + rename)"""
+        block = self.block
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        tmp = f"{self.path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(tmp, tickers=np.asarray(block.tickers, dtype=str), grid=block.grid, mask=block.mask,
+                 off_grid=block.off_grid, tz=np.asarray(self._timezone()), bar_minutes=block.bar_minutes,
+                 **{f"values_{name}": block.values[name] for name in self.columns})
+        os.replace(tmp, self.path)
+
+    def load(self):
+        """Read a saved block; ignored if it was built for other columns, another time zone or calendar"""
+        try:
+            with np.load(self.path, allow_pickle=False) as saved:
+                if not all(f"values_{name}" in saved for name in self.columns):
+                    return
+                if self.tz is not None and str(saved['tz']) != self.tz:
+                    return
+                grid = saved['grid']
+                # e.g. saved before early closes dropped the half-days' afternoon slots
+                if len(grid) and not np.array_equal(grid, session_grid(grid[0], grid[-1], tz=str(saved['tz']),
+                                                                       bar_minutes=int(saved['bar_minutes']))):
+                    return
+                self.tz = str(saved['tz'])
+                self.block = AlignedBlock(saved['tickers'].tolist(), saved['grid'],
+                                          {name: saved[f"values_{name}"] for name in self.columns},
+                                          saved['mask'], saved['off_grid'], int(saved['bar_minutes']))
+        except (OSError, ValueError, KeyError) as e:
+            log_event('resample_cache_error', path=self.path, error=str(e))
+
+
+def _stack(block, other):
+    """Rows of `other` appended below `block` (same grid)"""
+    return AlignedBlock(block.tickers + other.tickers, block.grid,
+                        {name: np.vstack([block.values[name], other.values[name]]) for name in block.values},
+                        np.vstack([block.mask, other.mask]), np.r_[block.off_grid, other.off_grid],
+                        block.bar_minutes)
+
+
+_cache = None
+_lock = threading.Lock()
+
+
+def get_resample_cache():
+    """Process-wide ResampleCache backed by RESAMPLE_CACHE"""
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = ResampleCache()
+    return _cache
+
+
+def invalidate_resample_cache(path=RESAMPLE_CACHE):
+    """
+    Make every ResampleCache saved at `path` realign its whole window on the next update.
+
+    A marker file rather than deleting the .npz, so caches already held in memory by
+    other processes (the scheduler) see it too.
+    """
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(f"{path}.stale", 'w') as f:
+        f.write(pd.Timestamp.utcnow().isoformat())
+
+
+def aligned_bars(tickers):
+    """Shared-grid block of close and volume for `tickers`, updated incrementally"""
+    return get_resample_cache().update(tickers)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Align stored bars on the session grid and print the gap report")
+    parser.add_argument('--tickers', nargs='*', help='default: the S&P 500 list')
+    parser.add_argument('--worst', type=int, default=20, help='tickers with the lowest coverage to show')
+    args = parser.parse_args()
+
+    from ingestion.ticker_loader import get_sp500_tickers
+
+    block = aligned_bars(args.tickers or get_sp500_tickers())
+    report = block.gap_report()
+    print(f"{len(block.tickers)} tickers x {len(block.grid)} bars "
+          f"({block.grid[0] if len(block.grid) else '-'} .. {block.grid[-1] if len(block.grid) else '-'}), "
+          f"{block.memory() / 1e6:.1f} MB")
+    print(report.sort_values('coverage').head(args.worst).to_string(index=False))
@@ -0,0 +1,46 @@
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import session_scope
+from database.read import load_tickers
+from database.write import write_rollups, claim_rollup_marks, ROLLUPS
+
+
+def update_rollups(tickers=None, since=None, resolutions=tuple(ROLLUPS)):
+    """
+    Bring the daily and weekly OHLCV tables up to date with stock_prices.
+
+    Only buckets that new bars can have touched are re-aggregated: each ticker's
+    newest bucket onwards, or from the oldest bar written since the last run when
+    late bars landed further back. Pass `since` to rebuild everything from a date.
+
+    Returns:
+        dict: resolution -> buckets written, plus seconds
+    """
+
+    tickers = tickers or load_tickers()
+    started = time.perf_counter()
+
+    stats = {}
+    with session_scope() as session:
+        written_from = claim_rollup_marks(session, tickers) if since is None else None
+        for resolution in resolutions:
+            stats[resolution] = write_rollups(session, resolution, tickers, since=since, written_from=written_from)
+
+    stats['seconds'] = time.perf_counter() - started
+    print("Rollups: " + ", ".join(f"{stats[r]} {r} buckets" for r in resolutions)
+          + f" for {len(tickers)} tickers in {stats['seconds']:.2f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Update the daily/weekly OHLCV rollups")
+    parser.add_argument('--since', type=datetime.fromisoformat, default=None,
+                        help="rebuild buckets from this date (default: only the newest buckets)")
+    args = parser.parse_args()
+    update_rollups(since=args.since)
@@ -0,0 +1,365 @@
+import sys
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import datetime
+import numpy as np
+from scipy.linalg.blas import dger
+from scipy.cluster.hierarchy import linkage, fcluster
+from scipy.spatial.distance import squareform
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.resample import get_resample_cache, REVISIT_BARS
+from database.connection import session_scope
+from database.write import write_screener_rows, write_correlation_matrix
+from ingestion.ticker_loader import get_sp500_tickers
+from monitoring.metrics import registry
+from monitoring.events import log_event
+
+SCREENER_WINDOW = int(os.getenv('SCREENER_WINDOW', '140'))  # return bars in the rolling matrix (20 sessions)
+SCREENER_VOLUME_SESSIONS = int(os.getenv('SCREENER_VOLUME_SESSIONS', '20'))  # same-bar history for volume z-scores
+SCREENER_CLUSTER_CORR = float(os.getenv('SCREENER_CLUSTER_CORR', '0.7'))  # average correlation that joins a cluster
+SCREENER_STATE = os.getenv('SCREENER_STATE', os.path.join('data', 'resampled', 'screener_state.npz'))
+
+# screener column -> sessions back (None = one bar)
+RETURN_HORIZONS = {'return_1h': None, 'return_1d': 1, 'return_5d': 5}
+
+
+def log_returns(close):
+    """Bar-to-bar log returns of a filled (tickers x grid) close block; unfilled bars and the first column give 0"""
+    returns = np.zeros_like(close)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        returns[:, 1:] = np.log(close[:, 1:] / close[:, :-1])
+    returns[~np.isfinite(returns)] = 0.0
+    return returns
+
+
+class RollingCovariance:
+    """
+    Covariance and correlation of the universe's last `window` return vectors,
+    maintained with rank-one updates as bars arrive.
+
+    Only the window's column sums and cross-product matrix X'X are kept. A new bar r
+    adds r r' (BLAS dger, in place) and the bar leaving the window is taken out with
+    -o o', so each bar costs O(tickers^2) rather than a fresh O(window x tickers^2)
+    product. A bar that changes after it was pushed (a late bar filling a gap) is
+    swapped the same way. Everything is rebuilt exactly every `rebuild_every` updates
+    so rounding drift from the downdates can't accumulate.
+
+    Parameters:
+        tickers (list[str]): Column order of the return vectors
+        window (int): Bars in the window
+        rebuild_every (int): Updates between exact rebuilds (default window)
+    """
+
+    def __init__(self, tickers, window=SCREENER_WINDOW, rebuild_every=None):
+        n = len(tickers)
+        self.tickers = list(tickers)
+        self.window = window
+        self.rebuild_every = rebuild_every or window
+        self.ring = np.zeros((window, n))  # the window's return vectors, slot = push count % window
+        self.timestamps = np.full(window, np.datetime64('NaT'), dtype='datetime64[us]')
+        self.total = np.zeros(n)
+        self.cross = np.zeros((n, n), order='F')  # Fortran order so dger updates it in place
+        self.count = 0
+        self.updates = 0
+
+    @property
+    def last(self):
+        """Grid timestamp of the newest pushed bar (None before the first)"""
+        return self.timestamps[(self.count - 1) % self.window] if self.count else None
+
+    def _add(self, x, alpha):
+        self.total += alpha * x
+        self.cross = dger(alpha, x, x, a=self.cross, overwrite_a=True)
+
+    def _updated(self):
+        self.updates += 1
+        if self.updates >= self.rebuild_every:
+            self.rebuild()
+
+    def push(self, returns, timestamp):
+        """Add one bar's return vector, dropping the oldest once the window is full"""
+        slot = self.count % self.window
+        if self.count >= self.window:
+            self._add(self.ring[slot], -1.0)
+        self.ring[slot] = returns
+        self.timestamps[slot] = timestamp
+        self._add(self.ring[slot], 1.0)
+        self.count += 1
+        self._updated()
+
+    def revise(self, age, returns):
+        """Replace the vector pushed `age` bars ago (0 = newest)"""
+        slot = (self.count - 1 - age) % self.window
+        self._add(self.ring[slot], -1.0)
+        self.ring[slot] = returns
+        self._add(self.ring[slot], 1.0)
+        self._updated()
+
+    def reset(self, returns, timestamps):
+        """Start over from a (tickers x bars) block, keeping its newest `window` bars"""
+        returns, timestamps = returns[:, -self.window:], timestamps[-self.window:]
+        n = len(timestamps)
+        self.ring[:] = 0.0
+        self.ring[:n] = returns.T
+        self.timestamps[:] = np.datetime64('NaT')
+        self.timestamps[:n] = timestamps
+        self.count = n
+        self.rebuild()
+
+    def rebuild(self):
+        """Exact sums from the stored vectors"""
+        rows = self.ring[:min(self.count, self.window)]
+        self.total = rows.sum(axis=0)
+        self.cross = np.asfortranarray(rows.T @ rows)
+        self.updates = 0
+
+    def sync(self, returns, grid):
+        """
+        Bring the window up to the newest column of an aligned return block.
+
+        Already-pushed columns that resampling may still re-align (the last
+        REVISIT_BARS) are revised where they changed, newer columns are pushed. Falls
+        back to reset() when the block no longer lines up with what was pushed or is
+        more than a window ahead.
+
+        Returns:
+            dict: pushed, revised and whether the window was reset
+        """
+
+        last = self.last
+        start = int(np.searchsorted(grid, last, side='right')) if last is not None else 0
+        lined_up = last is not None and start > 0 and grid[start - 1] == last
+        if not lined_up or len(grid) - start >= self.window:
+            self.reset(returns, grid)
+            return {'pushed': 0, 'revised': 0, 'reset': True}
+
+        revised = 0
+        for age in range(min(REVISIT_BARS, start, self.count, self.window)):
+            column = start - 1 - age
+            slot = (self.count - 1 - age) % self.window
+            if self.timestamps[slot] != grid[column]:
+                self.reset(returns, grid)
+                return {'pushed': 0, 'revised': 0, 'reset': True}
+            if not np.array_equal(self.ring[slot], returns[:, column]):
+                self.revise(age, returns[:, column])
+                revised += 1
+        for column in range(start, len(grid)):
+            self.push(returns[:, column], grid[column])
+        return {'pushed': len(grid) - start, 'revised': revised, 'reset': False}
+
+    def covariance(self):
+        n = min(self.count, self.window)
+        if n < 2:
+            return np.full((len(self.tickers), len(self.tickers)), np.nan)
+        mean = self.total / n
+        return (self.cross - n * np.outer(mean, mean)) / (n - 1)
+
+    def correlation(self):
+        """Correlation matrix; NaN where a ticker's returns have no variance"""
+        cov = self.covariance()
+        std = np.sqrt(np.clip(np.diag(cov), 0.0, None))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = cov / np.outer(std, std)
+        corr[~np.isfinite(corr)] = np.nan
+        np.clip(corr, -1.0, 1.0, out=corr)
+        np.fill_diagonal(corr, 1.0)
+        return corr
+
+    def save(self, path):
+        """Write the state atomically (temp file + rename)"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp.npz"
+        np.savez(tmp, tickers=np.asarray(self.tickers, dtype=str), window=self.window, ring=self.ring,
+                 timestamps=self.timestamps, count=self.count)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, tickers, window):
+        """Saved state for exactly these tickers and window, else None"""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as saved:
+                if int(saved['window']) != window or saved['tickers'].tolist() != list(tickers):
+                    return None
+                state = cls(tickers, window)
+                state.ring[:] = saved['ring']
+                state.timestamps[:] = saved['timestamps']
+                state.count = int(saved['count'])
+        except (OSError, ValueError, KeyError) as e:
+            log_event('screener_state_error', path=path, error=str(e))
+            return None
+        state.rebuild()
+        return state
+
+
+def volume_zscores(volume, mask, slots, column, sessions=SCREENER_VOLUME_SESSIONS):
+    """
+    Volume of grid `column` against the same bar of the previous `sessions` sessions.
+
+    Hourly volume has a strong intraday shape (the opening bar is the heaviest), so
+    each bar is compared with its own slot, not with the bars just before it.
+
+    Returns:
+        np.ndarray: z-score per ticker, NaN without a bar at `column` or enough history
+    """
+
+    same = np.flatnonzero(slots[:column] == slots[column])[-sessions:]
+    past = np.where(mask[:, same], volume[:, same], np.nan)
+    count = np.isfinite(past).sum(axis=1)
+    mean = np.nansum(past, axis=1) / np.maximum(count, 1)
+    var = np.nansum((past - mean[:, None]) ** 2, axis=1) / np.maximum(count - 1, 1)
+    std = np.sqrt(var)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (volume[:, column] - mean) / std
+    return np.where(mask[:, column] & (count >= 2) & (std > 0), z, np.nan)
+
+
+def correlation_clusters(corr, min_corr=SCREENER_CLUSTER_CORR):
+    """
+    Average-linkage clusters on 1 - correlation, cut where the average correlation
+    drops below min_corr.
+
+    Returns:
+        np.ndarray: Cluster id per ticker, 1 = largest cluster, 0 = not clustered
+    """
+
+    n = len(corr)
+    if n < 2:
+        return np.zeros(n, dtype=np.int64)
+    distance = 1.0 - np.nan_to_num(corr, nan=0.0)
+    distance = np.clip((distance + distance.T) / 2, 0.0, 2.0)
+    np.fill_diagonal(distance, 0.0)
+    labels = fcluster(linkage(squareform(distance, checks=False), method='average'),
+                      t=1.0 - min_corr, criterion='distance')
+    ids, sizes = np.unique(labels, return_counts=True)
+    rank = np.empty(len(ids), dtype=np.int64)
+    rank[np.argsort(-sizes, kind='stable')] = np.arange(1, len(ids) + 1)
+    index = np.searchsorted(ids, labels)
+    return np.where(sizes[index] > 1, rank[index], 0)
+
+
+def strongest_peers(corr):
+    """Most correlated other ticker per row, and the universe-average correlation"""
+    others = np.where(np.isfinite(corr), corr, -np.inf)
+    np.fill_diagonal(others, -np.inf)
+    peer = np.argmax(others, axis=1)
+    peer_corr = others[np.arange(len(corr)), peer]
+
+    finite = np.isfinite(corr)
+    np.fill_diagonal(finite, False)
+    count = finite.sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        average = np.where(finite, corr, 0.0).sum(axis=1) / count
+    return peer, np.where(np.isfinite(peer_corr), peer_corr, np.nan), np.where(count > 0, average, np.nan)
+
+
+_state = None
+_realigns = 0  # ResampleCache.realigns the state was last synced against
+_lock = threading.Lock()
+
+
+def _nullable(value):
+    return float(value) if np.isfinite(value) else None
+
+
+def update_screener(tickers=None, window=SCREENER_WINDOW):
+    """
+    Cross-sectional screen of the whole universe from the shared session grid.
+
+    Returns, same-slot volume z-scores and the rolling correlation matrix are all
+    computed on (tickers x bars) blocks; the matrix is advanced with rank-one updates
+    for the bars that arrived since the last run (the state persists in
+    SCREENER_STATE) and only rebuilt when the universe changes. Results go to
+    screener_results (one row per ticker) and correlation_matrix.
+
+    Returns:
+        dict: Counts and timing
+    """
+
+    global _state, _realigns
+    tickers = tickers or get_sp500_tickers()
+    started = time.perf_counter()
+
+    cache = get_resample_cache()
+    block = cache.update(tickers)
+    observed = np.flatnonzero(block.mask.any(axis=0))
+    if len(block.tickers) < 2 or not len(observed) or observed[-1] < window:
+        print("Screener: not enough aligned bars yet")
+        return {'tickers': 0, 'seconds': time.perf_counter() - started}
+
+    # screen as of the newest bar any ticker has; later grid columns haven't arrived yet
+    column = int(observed[-1])
+    grid = block.grid[:column + 1]
+    close = block.filled('close')[:, :column + 1]
+    slots = block.session_slots()[:column + 1]
+    bars_per_session = int(slots.max()) + 1
+
+    with registry.timer('screener_seconds', step='correlation'):
+        returns = log_returns(close)
+        with _lock:
+            state = _state
+            if state is None or state.tickers != block.tickers or state.window != window:
+                state = RollingCovariance.load(SCREENER_STATE, block.tickers, window)
+            if state is None:
+                state = RollingCovariance(block.tickers, window)
+            if cache.realigns != _realigns:
+                # the whole window was re-read (e.g. after a backfill), older than sync() revisits
+                state.reset(returns, grid)
+                sync = {'pushed': 0, 'revised': 0, 'reset': True}
+            else:
+                sync = state.sync(returns, grid)
+            _state, _realigns = state, cache.realigns
+            corr = state.correlation()
+            state.save(SCREENER_STATE)
+
+    with registry.timer('screener_seconds', step='screen'):
+        screen = {}
+        latest = close[:, column]
+        for name, sessions in RETURN_HORIZONS.items():
+            back = column - (bars_per_session * sessions if sessions else 1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                screen[name] = latest / close[:, back] - 1.0 if back >= 0 else np.full(len(latest), np.nan)
+        screen['volume_z'] = volume_zscores(block.values['volume'], block.mask, slots, column)
+        peer, peer_corr, avg_corr = strongest_peers(corr)
+        clusters = correlation_clusters(corr)
+        as_of = block.last_observed()
+
+    now = datetime.utcnow()
+    rows = []
+    for i, ticker in enumerate(block.tickers):
+        if np.isnat(as_of[i]):
+            continue
+        rows.append({
+            'ticker': ticker,
+            'as_of': as_of[i].item(),
+            'close': _nullable(latest[i]),
+            **{name: _nullable(screen[name][i]) for name in ('return_1h', 'return_1d', 'return_5d', 'volume_z')},
+            'avg_corr': _nullable(avg_corr[i]),
+            'peer': block.tickers[peer[i]] if np.isfinite(peer_corr[i]) else None,
+            'peer_corr': _nullable(peer_corr[i]),
+            'cluster': int(clusters[i]),
+            'computed_at': now,
+        })
+
+    with session_scope() as session:
+        write_screener_rows(session, rows)
+        write_correlation_matrix(session, {
+            'window': window,
+            'as_of': grid[-1].item(),
+            'tickers': json.dumps(block.tickers),
+            'matrix': corr.astype(np.float32).tobytes(),
+            'computed_at': now,
+        })
+
+    elapsed = time.perf_counter() - started
+    registry.inc('screener_matrix_updates_total', sync['pushed'], kind='pushed')
+    registry.inc('screener_matrix_updates_total', sync['revised'], kind='revised')
+    log_event('screener', tickers=len(rows), window=window, seconds=round(elapsed, 3), **sync)
+    detail = 'matrix rebuilt' if sync['reset'] else f"{sync['pushed']} bars pushed, {sync['revised']} revised"
+    print(f"Screener: {len(rows)} tickers in {elapsed:.2f}s ({detail})")
+    return {'tickers': len(rows), 'clusters': int(clusters.max()), 'seconds': elapsed, **sync}
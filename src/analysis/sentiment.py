@@ -0,0 +1,166 @@
+import sys
+import os
+import re
+import time
+import hashlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import session_scope
+from database.read import load_unscored_articles, load_cached_sentiment
+from database.write import write_sentiment_scores, write_sentiment_cache, write_sentiment_hourly
+from monitoring.metrics import registry
+
+SENTIMENT_BATCH = int(os.getenv('SENTIMENT_BATCH', '2000'))  # articles per select/commit
+SENTIMENT_WORKERS = int(os.getenv('SENTIMENT_WORKERS', '0')) or None  # None = CPU count
+SCORE_CHUNK = 100  # texts per pool task
+
+# VADER's conventional thresholds on the compound score
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+
+_analyzer = None
+
+
+def _init_worker():
+    """Build one VADER analyzer per pool process (loading the lexicon is the slow part)"""
+    global _analyzer
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+    _analyzer = SentimentIntensityAnalyzer()
+
+
+def score_texts(texts):
+    """VADER (compound, pos, neg, neu) for each text; runs inside a pool worker"""
+    if _analyzer is None:
+        _init_worker()
+    scores = []
+    for text in texts:
+        s = _analyzer.polarity_scores(text)
+        scores.append((s['compound'], s['pos'], s['neg'], s['neu']))
+    return scores
+
+
+def article_text(title, content):
+    return f"{title or ''}. {content or ''}".strip()
+
+
+def content_hash(text):
+    """Hash of the whitespace/case-normalized text, so syndicated copies share a score"""
+    normalized = re.sub(r'\s+', ' ', text).strip().lower()
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def hourly_rows(frame, now):
+    """Per-(ticker, hour) totals of a scored batch, ready to add into sentiment_hourly"""
+    frame = frame.assign(
+        hour=pd.to_datetime(frame['published_at']).dt.floor('h'),
+        positive=(frame['sentiment_score'] >= POSITIVE_THRESHOLD).astype(int),
+        negative=(frame['sentiment_score'] <= NEGATIVE_THRESHOLD).astype(int),
+    )
+    grouped = frame.groupby(['ticker', 'hour']).agg(
+        articles=('sentiment_score', 'size'),
+        score_sum=('sentiment_score', 'sum'),
+        positive_articles=('positive', 'sum'),
+        negative_articles=('negative', 'sum'),
+    ).reset_index()
+    grouped['mean_score'] = grouped['score_sum'] / grouped['articles']
+    grouped['updated_at'] = now
+    grouped['hour'] = grouped['hour'].dt.to_pydatetime()
+    return grouped.astype(object).to_dict('records')
+
+
+def update_sentiment(batch_size=SENTIMENT_BATCH, workers=SENTIMENT_WORKERS):
+    """
+    Score every article that has no sentiment_scores row yet.
+
+    Articles are taken in batches via an anti-join. Texts already scored (same
+    content hash, e.g. syndicated copies) come from sentiment_cache; the rest are
+    scored once per distinct hash across a process pool. Each batch's scores, new
+    cache entries and hourly aggregate increments are committed together; only
+    articles whose score was actually inserted (not scored meanwhile by an overlapping
+    run) are added to the hourly aggregate.
+
+    Returns:
+        dict: articles scored, texts scored vs. served from cache, seconds
+    """
+
+    started = time.perf_counter()
+    stats = {'articles': 0, 'scored': 0, 'cached': 0}
+
+    # spawn, not fork: callers run this from scheduler threads
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, mp_context=context) as pool:
+        while True:
+            articles = load_unscored_articles(batch_size)
+            if not articles:
+                break
+
+            texts = [article_text(a.title, a.content) for a in articles]
+            hashes = [content_hash(t) for t in texts]
+            cached = load_cached_sentiment(set(hashes))
+
+            # each distinct uncached text is scored once, however many articles share it
+            todo = {}
+            for h, t in zip(hashes, texts):
+                if h not in cached and h not in todo:
+                    todo[h] = t
+            todo_hashes = list(todo)
+            todo_texts = [todo[h] for h in todo_hashes]
+
+            with registry.timer('sentiment_score_seconds'):
+                chunks = [todo_texts[i:i + SCORE_CHUNK] for i in range(0, len(todo_texts), SCORE_CHUNK)]
+                fresh = [score for chunk in pool.map(score_texts, chunks) for score in chunk]
+            scored = dict(zip(todo_hashes, fresh))
+
+            now = datetime.utcnow()
+            rows = []
+            for article, h in zip(articles, hashes):
+                compound, positive, negative, neutral = cached.get(h) or scored[h]
+                rows.append({
+                    'article_id': article.id,
+                    'ticker': article.ticker,
+                    'sentiment_score': compound,
+                    'positive': positive,
+                    'negative': negative,
+                    'neutral': neutral,
+                    'created_at': now,
+                })
+            cache_rows = [
+                {'content_hash': h, 'sentiment_score': s[0], 'positive': s[1], 'negative': s[2],
+                 'neutral': s[3], 'created_at': now}
+                for h, s in scored.items()
+            ]
+            frame = pd.DataFrame({
+                'article_id': [a.id for a in articles],
+                'ticker': [a.ticker for a in articles],
+                'published_at': [a.published_at for a in articles],
+                'sentiment_score': [r['sentiment_score'] for r in rows],
+            })
+
+            with session_scope() as session:
+                inserted = write_sentiment_scores(session, rows)
+                write_sentiment_cache(session, cache_rows)
+                frame = frame[frame['article_id'].isin(inserted)]
+                if len(frame):
+                    write_sentiment_hourly(session, hourly_rows(frame, now))
+
+            stats['articles'] += len(inserted)
+            stats['scored'] += len(scored)
+            stats['cached'] += len(rows) - len(scored)
+            registry.inc('sentiment_articles_total', len(inserted))
+            registry.inc('sentiment_cache_hits_total', len(rows) - len(scored))
+
+            if len(articles) < batch_size:
+                break
+
+    stats['seconds'] = time.perf_counter() - started
+    print(f"Sentiment: {stats['articles']} articles, {stats['scored']} texts scored, "
+          f"{stats['cached']} from cache in {stats['seconds']:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    update_sentiment()
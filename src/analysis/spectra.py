@@ -0,0 +1,53 @@
+import sys
+import os
+import time
+from datetime import datetime
+import numpy as np
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.dsp import dominant_cycles
+from analysis.resample import aligned_bars
+from database.connection import session_scope
+from database.write import write_spectral_rows
+from ingestion.ticker_loader import get_sp500_tickers
+
+
+def update_spectra(tickers=None, bars=512, method='fft', window='hann'):
+    """
+    Dominant cycle per ticker over its last `bars` closes, persisted to spectral_summary.
+
+    The block is the last `bars` columns of the shared session grid, gaps filled, and
+    is transformed in a single call; tickers with unfilled gaps in that window
+    (shorter histories, or gaps past RESAMPLE_FILL_LIMIT) are skipped.
+
+    Returns:
+        pd.DataFrame: The summary rows that were written
+    """
+
+    tickers = tickers or get_sp500_tickers()
+    started = time.perf_counter()
+
+    aligned = aligned_bars(tickers).window(bars)
+    close = aligned.filled('close')
+    complete = np.isfinite(close).all(axis=1)
+    full = [t for t, ok in zip(aligned.tickers, complete) if ok]
+    if len(aligned.grid) < bars or not full:
+        print("Spectra: no ticker has enough bars yet")
+        return None
+
+    sample_seconds = aligned.sample_seconds
+    summary = dominant_cycles(full, close[complete], sample_seconds, method=method, window=window)
+
+    summary['method'] = method
+    summary['as_of'] = [ts.item() for ts in aligned.last_observed()[complete]]
+    summary['bars'] = bars
+    summary['sample_seconds'] = sample_seconds
+    summary['created_at'] = datetime.utcnow()
+
+    rows = summary.replace([np.inf, -np.inf], np.nan).astype(object)
+    rows = rows.where(rows.notna(), None).to_dict('records')
+    with session_scope() as session:
+        write_spectral_rows(session, rows)
+
+    print(f"Spectra: {len(full)} tickers in {time.perf_counter() - started:.2f}s")
+    return summary
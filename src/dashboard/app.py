@@ -1,14 +1,19 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime
+from datetime import datetime, timedelta
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database.connection import get_session
-from database.models import StockPrice
-from analysis.dsp import butterworth_filter, compute_fft, dsp_forecast
+from database.connection import get_engine
+from database.read import load_dsp_snapshot, load_tickers, load_bars_for_range, load_screener, load_correlation_matrix, BAR_COLUMNS
+from analysis.materialize import MODEL_VERSION
+from analysis.screener import SCREENER_WINDOW
+from dashboard.bar_cache import BarCache
+from storage.hot_cache import HOT_CACHE, get_hot_cache, refresh_hot_cache
+from dashboard.downsample import CHART_WIDTH_PX, points_for_width, downsample_ohlc, downsample_line
 
 # Page config
 st.set_page_config(
@@ -26,42 +31,127 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def get_stock_data(ticker):
+@st.cache_resource
+def get_db_engine():
+    """Pooled engine for Core queries, shared across reruns and sessions"""
+    return get_engine()
+
+@st.cache_resource
+def get_bar_cache():
+    """Process-wide LRU of per-ticker bars, refreshed incrementally"""
+    return BarCache(engine=get_db_engine())
+
+@st.cache_resource
+def get_hot_bar_cache():
+    """Ring-buffer cache of every ticker's newest bars, kept current by ingestion's NOTIFY"""
+    return get_hot_cache(engine=get_db_engine())
+
+def get_stock_data(ticker, bars=100):
     """Get stock data for a specific ticker"""
-    session = get_session()
-    
-    results = session.query(StockPrice)\
-                    .filter_by(ticker=ticker)\
-                    .order_by(StockPrice.timestamp.desc())\
-                    .limit(100)\
-                    .all()
-    
-    data = []
-    for row in results:
-        data.append({
-            'timestamp': row.timestamp,
-            'open': row.open,
-            'high': row.high,
-            'low': row.low,
-            'close': row.close,
-            'volume': row.volume
-        })
-    
-    session.close()
-    df = pd.DataFrame(data)
-    return df.sort_values('timestamp') if not df.empty else df
+    if HOT_CACHE:
+        df = get_hot_bar_cache().frame(ticker, bars)
+        if df is not None:
+            return df
+    return get_bar_cache().get(ticker, bars)
+
+# long histories are read from the daily/weekly rollups, about this many bars per chart
+HISTORY_RANGES = {'3mo': 91, '1y': 365, '5y': 1826}
+RANGE_CHART_POINTS = 250
+
+@st.cache_data(ttl=300)
+def get_range_data(ticker, days, refreshed=None):
+    """
+    Bars for the last `days` days at the coarsest resolution that still fills the chart.
 
+    `refreshed` only keys the cache: a new value after "Refresh Data" reloads this ticker.
+    """
+    arrays, resolution = load_bars_for_range(ticker, datetime.utcnow() - timedelta(days=days),
+                                             points=RANGE_CHART_POINTS, engine=get_db_engine())
+    return pd.DataFrame({name: arrays[name] for name in BAR_COLUMNS}), resolution
 
 
 
+
+@st.cache_data(ttl=60)
+def get_dsp_snapshot(ticker):
+    """Latest materialized DSP results for a ticker (one indexed query)"""
+    return load_dsp_snapshot(ticker, MODEL_VERSION, engine=get_db_engine())
+
 @st.cache_data(ttl=300)
 def get_all_tickers():
     """Get list of all available tickers"""
-    session = get_session()
-    tickers = session.query(StockPrice.ticker).distinct().all()
-    session.close()
-    return sorted([t[0] for t in tickers])
+    return load_tickers(engine=get_db_engine())
+
+@st.cache_data(ttl=60)
+def get_screener():
+    """Every ticker's precomputed screen (analysis/screener.py)"""
+    return load_screener(engine=get_db_engine())
+
+@st.cache_data(ttl=60)
+def get_correlation():
+    """Rolling correlation matrix of the universe, as stored by the screener stage"""
+    return load_correlation_matrix(SCREENER_WINDOW, engine=get_db_engine())
+
+def top_pairs(correlation, n=20):
+    """Most correlated ticker pairs from the upper triangle of the matrix"""
+    tickers, matrix = correlation['tickers'], correlation['matrix']
+    rows, cols = np.triu_indices(len(tickers), k=1)
+    values = np.nan_to_num(matrix[rows, cols], nan=-np.inf)
+    best = np.argpartition(-values, min(n, len(values) - 1))[:n] if len(values) > n else np.arange(len(values))
+    best = best[np.argsort(-values[best])]
+    return pd.DataFrame({'ticker': [tickers[i] for i in rows[best]], 'peer': [tickers[j] for j in cols[best]],
+                         'correlation': values[best]})
+
+def render_screener():
+    """Universe-wide screens: top movers, volume spikes and correlated clusters"""
+    screen = get_screener()
+    correlation = get_correlation()
+    if screen.empty or correlation is None:
+        st.warning("No screener results yet. Run the pipeline first.")
+        return
+
+    age_minutes = (datetime.utcnow() - screen['computed_at'].max()).total_seconds() / 60
+    st.caption(f"{len(screen)} tickers | correlation over the last {SCREENER_WINDOW} session bars as of "
+               f"{correlation['as_of']} | computed {age_minutes:.0f} min ago")
+
+    horizon = st.radio("Return over:", ['return_1h', 'return_1d', 'return_5d'], horizontal=True,
+                       format_func=lambda name: name.split('_')[1])
+    movers = screen.dropna(subset=[horizon])
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Top Gainers")
+        st.dataframe(movers.nlargest(10, horizon)[['ticker', 'close', horizon, 'volume_z']], hide_index=True)
+    with col2:
+        st.subheader("Top Losers")
+        st.dataframe(movers.nsmallest(10, horizon)[['ticker', 'close', horizon, 'volume_z']], hide_index=True)
+
+    st.subheader("Volume Spikes")
+    threshold = st.slider("Volume z-score at least:", 1.0, 6.0, 2.0, 0.5)
+    spikes = screen[screen['volume_z'] >= threshold].sort_values('volume_z', ascending=False)
+    st.dataframe(spikes[['ticker', 'close', 'volume_z', 'return_1h', 'return_1d', 'as_of']], hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Correlated Clusters")
+        clustered = screen[screen['cluster'] > 0]
+        clusters = (clustered.groupby('cluster')
+                    .agg(size=('ticker', 'size'), avg_corr=('avg_corr', 'mean'), members=('ticker', ', '.join))
+                    .reset_index().sort_values('size', ascending=False))
+        st.dataframe(clusters, hide_index=True)
+    with col2:
+        st.subheader("Most Correlated Pairs")
+        st.dataframe(top_pairs(correlation), hide_index=True)
+
+    if not clusters.empty:
+        cluster = st.selectbox("Cluster:", clusters['cluster'].tolist())
+        members = clustered.loc[clustered['cluster'] == cluster, 'ticker'].tolist()
+        index = {ticker: i for i, ticker in enumerate(correlation['tickers'])}
+        rows = [index[t] for t in members if t in index]
+        heatmap = go.Figure(data=go.Heatmap(z=correlation['matrix'][np.ix_(rows, rows)],
+                                            x=[correlation['tickers'][i] for i in rows],
+                                            y=[correlation['tickers'][i] for i in rows],
+                                            zmin=-1, zmax=1, colorscale='RdBu'))
+        st.plotly_chart(heatmap, use_container_width=True)
 
 def calculate_change(df):
     """Calculate price change between last two data points"""
@@ -85,18 +175,35 @@ if not tickers:
     st.stop()
 
 # Sidebar
+with st.sidebar:
+    page = st.radio("View:", ["Ticker", "Screener"], horizontal=True)
+
+if page == "Screener":
+    render_screener()
+    st.stop()
+
 with st.sidebar:
     st.header("Stock Selection")
     selected_ticker = st.selectbox("Choose a stock:", tickers)
+    history = st.select_slider("History:", options=[100, 250, 500, 1000, 2500, 5000] + list(HISTORY_RANGES),
+                               value=100, format_func=lambda v: f"{v} bars" if isinstance(v, int) else v)
 
     st.divider()
     
     if st.button("🔄 Refresh Data", use_container_width=True):
-        st.cache_data.clear()
+        #only this ticker is reloaded, other cached tickers stay warm
+        get_bar_cache().invalidate(selected_ticker)
+        if HOT_CACHE:
+            refresh_hot_cache([selected_ticker])
+        st.session_state.setdefault('refreshed', {})[selected_ticker] = datetime.utcnow()
         st.rerun()
 
 # Fetch data
-df = get_stock_data(selected_ticker)
+if history in HISTORY_RANGES:
+    df, resolution = get_range_data(selected_ticker, HISTORY_RANGES[history],
+                                    st.session_state.get('refreshed', {}).get(selected_ticker))
+else:
+    df, resolution = get_stock_data(selected_ticker, history), '1h'
 
 if df.empty:
     st.warning(f"No data found for {selected_ticker}")
@@ -139,17 +246,20 @@ with col4:
 # Main candlestick chart
 st.subheader(f"{selected_ticker} Price Chart")
 
+# about one candle per 4 pixels, merged server-side so long histories stay light
+candles = downsample_ohlc(df, points_for_width(CHART_WIDTH_PX, 0.25))
+
 fig = go.Figure(data=go.Candlestick(
-    x=df['timestamp'],
-    open=df['open'],
-    high=df['high'],
-    low=df['low'],
-    close=df['close'],
+    x=candles['timestamp'],
+    open=candles['open'],
+    high=candles['high'],
+    low=candles['low'],
+    close=candles['close'],
     name=selected_ticker
 ))
 
 fig.update_layout(
-    title=f'{selected_ticker} Stock Price',
+    title=f'{selected_ticker} Stock Price ({resolution} bars)',
     yaxis_title='Price ($)',
     xaxis_title='Time',
     height=500,
@@ -165,8 +275,8 @@ col1, col2 = st.columns(2)
 with col1:
     st.subheader("Volume Analysis")
     volume_fig = go.Figure(data=go.Bar(
-        x=df['timestamp'],
-        y=df['volume'],
+        x=candles['timestamp'],
+        y=candles['volume'],
         marker_color='lightblue'
     ))
     volume_fig.update_layout(
@@ -178,9 +288,12 @@ with col1:
 
 with col2:
     st.subheader("Price Distribution")
-    price_fig = go.Figure(data=go.Histogram(
-        x=df['close'],
-        nbinsx=20,
+    #binned here so only 20 bars are sent to the browser
+    counts, edges = np.histogram(df['close'], bins=20)
+    price_fig = go.Figure(data=go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
         marker_color='lightcoral'
     ))
     price_fig.update_layout(
@@ -213,18 +326,28 @@ st.title("📈 StockStream DSP Dashboard")
 # User selects a ticker
 ticker = st.text_input("Enter a ticker symbol:", "AAPL")
 
-# Load data
-df = get_stock_data(ticker)
+# Precomputed by the analytics stage (analysis/materialize.py), never fitted on render
+snapshot = get_dsp_snapshot(ticker)
 
-if df.empty:
-    st.warning("No data found for this ticker.")
+if snapshot is None:
+    st.warning("No DSP results materialized for this ticker yet. Run the pipeline first.")
 else:
     # -----------------------------
-    # DSP PROCESSING
+    # FRESHNESS
     # -----------------------------
-    df['filtered'] = butterworth_filter(df['close'])
-    freqs, magnitude = compute_fft(df['close'])
-    forecast = dsp_forecast(df['filtered'])
+    latest_bars = get_stock_data(ticker)
+    age_minutes = (datetime.utcnow() - snapshot['computed_at']).total_seconds() / 60
+    st.caption(f"DSP results as of bar {snapshot['as_of']} | computed {age_minutes:.0f} min ago | model {snapshot['model_version']}")
+    if not latest_bars.empty and latest_bars['timestamp'].iloc[-1] > snapshot['as_of']:
+        st.info("Newer bars have arrived since these results were computed; showing the last materialized results.")
+
+    df = pd.DataFrame({
+        'timestamp': snapshot['timestamps'],
+        'close': snapshot['close'],
+        'filtered': snapshot['filtered'],
+    })
+    freqs, magnitude = snapshot['fft_freqs'], snapshot['fft_magnitude']
+    forecast = pd.Series(snapshot['forecast'])
 
     # -----------------------------
     # SUMMARY 
@@ -269,9 +392,10 @@ else:
 
     # Raw vs Filtered
     st.subheader("Raw vs Filtered Close Price")
+    line_df = downsample_line(df, 'timestamp', 'close')
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['close'], name='Raw Close'))
-    fig.add_trace(go.Scatter(x=df['timestamp'], y=df['filtered'], name='Filtered Close'))
+    fig.add_trace(go.Scatter(x=line_df['timestamp'], y=line_df['close'], name='Raw Close'))
+    fig.add_trace(go.Scatter(x=line_df['timestamp'], y=line_df['filtered'], name='Filtered Close'))
     st.plotly_chart(fig, use_container_width=True)
 
     # FFT
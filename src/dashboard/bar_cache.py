@@ -0,0 +1,105 @@
+import sys
+import os
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.read import BAR_COLUMNS
+from storage.source import load_bar_arrays
+
+BAR_CACHE_MB = float(os.getenv('BAR_CACHE_MB', '256'))
+BAR_CACHE_MAX_BARS = int(os.getenv('BAR_CACHE_MAX_BARS', '5000'))
+BAR_CACHE_REFRESH_SECONDS = float(os.getenv('BAR_CACHE_REFRESH_SECONDS', '60'))
+
+
+class BarCache:
+    """
+    Process-wide LRU of per-ticker bar arrays, bounded by memory.
+
+    A cached ticker is refreshed incrementally: only bars newer than the last cached
+    timestamp are read, at most once per refresh interval, and the arrays are trimmed
+    to the newest max_bars.
+
+    Parameters:
+        max_bytes (int): Evict least recently used tickers beyond this size
+        max_bars (int): Bars kept per ticker
+        refresh_seconds (float): Minimum time between incremental refreshes
+        engine: SQLAlchemy engine (default get_engine()); bars come from DATA_SOURCE
+    """
+
+    def __init__(self, max_bytes=int(BAR_CACHE_MB * 1024 * 1024), max_bars=BAR_CACHE_MAX_BARS,
+                 refresh_seconds=BAR_CACHE_REFRESH_SECONDS, engine=None):
+        self.max_bytes = max_bytes
+        self.max_bars = max_bars
+        self.refresh_seconds = refresh_seconds
+        self.engine = engine
+        self.entries = OrderedDict()  # ticker -> (arrays, refreshed_at, nbytes)
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, ticker, entry):
+        if entry is None:
+            return load_bar_arrays(ticker, last_n=self.max_bars, engine=self.engine)
+
+        arrays = entry[0]
+        last = arrays['timestamp'][-1].item() if len(arrays['timestamp']) else None
+        if last is None:
+            return load_bar_arrays(ticker, last_n=self.max_bars, engine=self.engine)
+
+        newer = load_bar_arrays(ticker, start=last, engine=self.engine)
+        fresh = newer['timestamp'] > arrays['timestamp'][-1]
+        if not fresh.any():
+            return arrays
+        return {
+            name: np.concatenate([arrays[name], newer[name][fresh]])[-self.max_bars:]
+            for name in arrays
+        }
+
+    def get_arrays(self, ticker):
+        """Column arrays for a ticker, oldest bar first"""
+        with self.lock:
+            entry = self.entries.get(ticker)
+            if entry is not None:
+                self.entries.move_to_end(ticker)
+
+        if entry is not None and time.monotonic() - entry[1] < self.refresh_seconds:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        arrays = self._load(ticker, entry)
+        size = sum(values.nbytes for values in arrays.values())
+
+        with self.lock:
+            old = self.entries.pop(ticker, None)
+            if old is not None:
+                self.nbytes -= old[2]
+            self.entries[ticker] = (arrays, time.monotonic(), size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes and len(self.entries) > 1:
+                _, (_, _, evicted) = self.entries.popitem(last=False)
+                self.nbytes -= evicted
+        return arrays
+
+    def get(self, ticker, bars=None):
+        """DataFrame of the newest `bars` bars (all cached bars if None)"""
+        arrays = self.get_arrays(ticker)
+        df = pd.DataFrame({name: arrays[name] for name in BAR_COLUMNS})
+        return df.tail(bars).reset_index(drop=True) if bars else df
+
+    def invalidate(self, ticker):
+        """Drop one ticker so its next read reloads from the data source"""
+        with self.lock:
+            entry = self.entries.pop(ticker, None)
+            if entry is not None:
+                self.nbytes -= entry[2]
+
+    def stats(self):
+        with self.lock:
+            return {'tickers': len(self.entries), 'bytes': self.nbytes,
+                    'hits': self.hits, 'misses': self.misses}
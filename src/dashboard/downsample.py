@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+# plotly charts span roughly this many pixels with use_container_width on a wide layout
+CHART_WIDTH_PX = 1200
+
+
+def points_for_width(width_px=CHART_WIDTH_PX, points_per_px=1.0):
+    """Number of points worth sending for a chart of the given pixel width"""
+    return max(2, int(width_px * points_per_px))
+
+
+def lttb(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets downsampling of a line series.
+
+    Parameters:
+        x (array-like): Monotonic x values (timestamps are fine, tz-aware included)
+        y (array-like): Values
+        n_out (int): Points to keep (first and last are always kept)
+
+    Returns:
+        np.ndarray: Indices of the kept points
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    if isinstance(getattr(x, 'dtype', None), pd.DatetimeTZDtype):
+        # tz-aware data would turn into an object array; UTC instants keep the spacing
+        x = pd.DatetimeIndex(x).tz_convert(None)
+    xs = np.asarray(x)
+    xs = xs.astype('datetime64[ns]').astype(np.int64).astype(np.float64) if np.issubdtype(xs.dtype, np.datetime64) \
+        else xs.astype(np.float64)
+
+    # bucket edges for the n - 2 interior points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    keep[-1] = n - 1
+
+    prev = 0
+    for b in range(n_out - 2):
+        start, end = edges[b], edges[b + 1]
+        # average of the next bucket is the third triangle vertex
+        nxt_start, nxt_end = end, edges[b + 2] if b + 2 < len(edges) else n
+        avg_x = xs[nxt_start:nxt_end].mean()
+        avg_y = y[nxt_start:nxt_end].mean()
+
+        area = np.abs(
+            (xs[prev] - avg_x) * (y[start:end] - y[prev])
+            - (xs[prev] - xs[start:end]) * (avg_y - y[prev])
+        )
+        prev = start + int(np.argmax(area))
+        keep[b + 1] = prev
+
+    return keep
+
+
+def minmax_indices(y, n_out):
+    """
+    Indices of each bucket's min and max, so spikes survive downsampling.
+
+    Returns:
+        np.ndarray: Sorted, unique indices (at most n_out)
+    """
+
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    buckets = n_out // 2
+    if buckets < 1 or n <= n_out:
+        return np.arange(n)
+
+    # pad to a whole number of equal buckets so argmin/argmax run once over a 2-D view
+    size = int(np.ceil(n / buckets))
+    padded = np.full(size * buckets, np.nan)
+    padded[:n] = y
+    view = padded.reshape(buckets, size)
+    base = np.arange(buckets) * size
+    lo = base + np.nanargmin(np.where(np.isnan(view), np.inf, view), axis=1)
+    hi = base + np.nanargmax(np.where(np.isnan(view), -np.inf, view), axis=1)
+    return np.unique(np.clip(np.concatenate([lo, hi, [0, n - 1]]), 0, n - 1))
+
+
+def downsample_ohlc(df, n_out):
+    """
+    Merge consecutive bars into at most n_out candles.
+
+    Open is the bucket's first open, close its last close, high/low the extremes and
+    volume the sum, so the chart shape is preserved.
+    """
+
+    n = len(df)
+    if n <= n_out:
+        return df
+
+    bucket = np.arange(n) * n_out // n
+    grouped = df.groupby(bucket, sort=False)
+    return pd.DataFrame({
+        'timestamp': grouped['timestamp'].first(),
+        'open': grouped['open'].first(),
+        'high': grouped['high'].max(),
+        'low': grouped['low'].min(),
+        'close': grouped['close'].last(),
+        'volume': grouped['volume'].sum(),
+    }).reset_index(drop=True)
+
+
+def downsample_line(df, x, y, width_px=CHART_WIDTH_PX):
+    """Rows of df kept by LTTB on (x, y) for a chart of width_px pixels"""
+    if df.empty:
+        return df
+    keep = lttb(df[x].to_numpy(), df[y].to_numpy(), points_for_width(width_px))
+    return df.iloc[keep]
@@ -1,10 +1,18 @@
 import os
+import time
+import threading
+from contextlib import contextmanager
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 
 load_dotenv()
 
+_engine = None
+_session_factory = None
+_lock = threading.Lock()
+
 def get_db_url():
     """PostgreSQL connection"""
     host = os.getenv('DB_HOST', 'localhost')
@@ -15,14 +23,135 @@ def get_db_url():
 
     return f"postgresql://{user}:{password}@{host}:{port}/{database}"
 
-def get_engine():
-    """SQLAlchemy engine"""
-    database_url = get_db_url()
-    engine = create_engine(database_url, echo=False)
+def get_pool_config():
+    """Pool settings from env"""
+    return {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes'),
+        'statement_timeout_ms': int(os.getenv('DB_STATEMENT_TIMEOUT_MS', '0')),  # 0 = no limit
+    }
+
+
+class PoolStats:
+    """Counters for pool checkouts, updated from pool events"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def count(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+def _create_engine():
+    config = get_pool_config()
+    connect_args = {}
+    if config['statement_timeout_ms'] > 0:
+        connect_args['options'] = f"-c statement_timeout={config['statement_timeout_ms']}"
+
+    engine = create_engine(
+        get_db_url(),
+        echo=False,
+        poolclass=TimedQueuePool,
+        pool_size=config['pool_size'],
+        max_overflow=config['max_overflow'],
+        pool_timeout=config['pool_timeout'],
+        pool_recycle=config['pool_recycle'],
+        pool_pre_ping=config['pool_pre_ping'],
+        connect_args=connect_args
+    )
+
+    event.listen(engine, 'connect', lambda *args: pool_stats.count('connects'))
+    event.listen(engine, 'checkout', lambda *args: pool_stats.count('checkouts'))
+    event.listen(engine, 'checkin', lambda *args: pool_stats.count('checkins'))
     return engine
 
+def get_engine():
+    """SQLAlchemy engine, one pooled engine per process created on first use"""
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                _engine = _create_engine()
+    return _engine
+
+def get_session_factory():
+    """Shared sessionmaker bound to the pooled engine (wrap with st.cache_resource in Streamlit)"""
+    global _session_factory
+    if _session_factory is None:
+        with _lock:
+            if _session_factory is None:
+                _session_factory = sessionmaker(bind=get_engine())
+    return _session_factory
+
 def get_session():
     """Database session"""
-    engine = get_engine()
-    Session = sessionmaker(bind=engine)
-    return Session()
+    return get_session_factory()()
+
+@contextmanager
+def session_scope():
+    """Session that commits on success, rolls back on error and always closes"""
+    session = get_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+def dispose_engine():
+    """Drop the pooled engine, e.g. in a forked worker process before first use"""
+    global _engine, _session_factory
+    with _lock:
+        if _engine is not None:
+            _engine.dispose(close=False)
+        _engine = None
+        _session_factory = None
+
+def get_pool_stats():
+    """Pool size, usage and checkout wait stats for sizing the pool under load"""
+    stats = {
+        'checkouts': pool_stats.checkouts,
+        'checkins': pool_stats.checkins,
+        'connects': pool_stats.connects,
+        'wait_seconds_total': pool_stats.wait_seconds,
+        'wait_seconds_max': pool_stats.max_wait_seconds,
+        'wait_seconds_avg': pool_stats.wait_seconds / pool_stats.checkouts if pool_stats.checkouts else 0.0,
+    }
+    if _engine is not None:
+        pool = _engine.pool
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'idle': pool.checkedin(),
+        })
+    return stats
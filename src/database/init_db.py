@@ -3,18 +3,77 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from database.models import Base
-from database.connection import get_engine
+from database.connection import get_engine, session_scope
+from database.write import rebuild_ticker_table
+from database.partitions import create_partitioned_prices, ensure_partitions, is_partitioned
 
 from sqlalchemy import text
 
-def init_db():
+# opt in to the monthly range-partitioned stock_prices layout (see database/partitions.py)
+STOCK_PRICES_PARTITIONED = os.getenv('STOCK_PRICES_PARTITIONED', 'false').lower() in ('1', 'true', 'yes')
+
+def upgrade_dsp_snapshots(conn):
+    """
+    dsp_snapshots used to keep one row per as_of bar under uix_dsp_ticker_version_asof
+    plus a duplicate index; keep each ticker's newest row and switch to one row per
+    ticker and model version. Safe to run repeatedly.
+    """
+    conn.execute(text("""
+        DELETE FROM dsp_snapshots d USING dsp_snapshots n
+        WHERE d.ticker = n.ticker AND d.model_version = n.model_version
+          AND (d.as_of < n.as_of OR (d.as_of = n.as_of AND d.id < n.id))
+    """))
+    conn.execute(text("DROP INDEX IF EXISTS idx_dsp_ticker_version_asof"))
+    conn.execute(text("ALTER TABLE dsp_snapshots DROP CONSTRAINT IF EXISTS uix_dsp_ticker_version_asof"))
+    exists = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'uix_dsp_ticker_version'")).scalar()
+    if not exists:
+        conn.execute(text("ALTER TABLE dsp_snapshots ADD CONSTRAINT uix_dsp_ticker_version UNIQUE (ticker, model_version)"))
+
+def upgrade_sentiment_scores(conn):
+    """
+    Overlapping sentiment runs could score an article twice before sentiment_scores
+    had uix_sentiment_article; keep the first score and add the constraint, which
+    replaces idx_sentiment_article. Safe to run repeatedly.
+    """
+    exists = conn.execute(text("SELECT 1 FROM pg_constraint WHERE conname = 'uix_sentiment_article'")).scalar()
+    if exists:
+        return
+    conn.execute(text("""
+        DELETE FROM sentiment_scores d USING sentiment_scores k
+        WHERE d.article_id = k.article_id AND d.id > k.id
+    """))
+    conn.execute(text("DROP INDEX IF EXISTS idx_sentiment_article"))
+    conn.execute(text("ALTER TABLE sentiment_scores ADD CONSTRAINT uix_sentiment_article UNIQUE (article_id)"))
+
+def init_db(partitioned=STOCK_PRICES_PARTITIONED):
     """creating tables"""
     try: 
         engine = get_engine()
         print(f"Connecting to database: {engine}")
+
+        #partitioned stock_prices has to exist before create_all, which then skips it
+        if partitioned:
+            with engine.begin() as conn:
+                exists = conn.execute(text("SELECT to_regclass('stock_prices')")).scalar() is not None
+                if not exists:
+                    create_partitioned_prices(conn)
+                    print("Created partitioned stock_prices")
+                elif not is_partitioned(conn):
+                    print("stock_prices already exists as a plain table; run 'python src/database/partitions.py migrate'")
+
         Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            upgrade_dsp_snapshots(conn)
+            upgrade_sentiment_scores(conn)
+            conn.execute(text("ALTER TABLE tickers ADD COLUMN IF NOT EXISTS rollup_from timestamp"))
+        ensure_partitions()
         print("Database tables created successfully!")
 
+        #seed the tickers table from any existing bars
+        with session_scope() as session:
+            seeded = rebuild_ticker_table(session)
+        print(f"Tickers table holds {seeded} tickers")
+
         #test connection
         with engine.connect() as conn:
             result = conn.execute(text("SELECT current_database(), current_user"))
@@ -28,4 +87,4 @@ def init_db():
     return True
 
 if __name__ == "__main__":
-    init_db()
+    init_db(partitioned=STOCK_PRICES_PARTITIONED or '--partitioned' in sys.argv)
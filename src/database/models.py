@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, Integer, BigInteger, String, DateTime, Text, Index, UniqueConstraint, ForeignKey
+from sqlalchemy import Column, Float, Integer, BigInteger, String, DateTime, Text, Index, UniqueConstraint, ForeignKey, LargeBinary
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 
@@ -22,6 +22,15 @@ class StockPrice(Base):
         Index('idx_ticker_timestamp', 'ticker', 'timestamp'),
     )
 
+class Ticker(Base):
+    __tablename__ = 'tickers'
+
+    ticker = Column(String(10), primary_key=True)
+    first_bar = Column(DateTime)
+    last_bar = Column(DateTime) #kept up to date by ingestion
+    rollup_from = Column(DateTime) #oldest bar written since the last rollup, cleared by update_rollups
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 class NewsArticle(Base):
     __tablename__ = 'news_article'
 
@@ -51,6 +60,10 @@ class SentinmentScore(Base):
     neutral = Column(Float)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        UniqueConstraint('article_id', name='uix_sentiment_article'), #one score per article, its index serves the unscored anti-join
+    )
+
 
 class TechnicalIndicator(Base):
     __tablename__ = 'technical_indicators'
@@ -70,3 +83,225 @@ class TechnicalIndicator(Base):
 
     )
 
+
+class FilterState(Base):
+    __tablename__ = 'filter_state'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    filter_order = Column(Integer, nullable=False)
+    cutoff_minutes = Column(Float, nullable=False)
+    sample_minutes = Column(Float, nullable=False)
+    state = Column(LargeBinary, nullable=False) #float64 SOS delay line, sections x 2
+    last_timestamp = Column(DateTime, nullable=False) #newest bar already filtered
+    last_value = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'filter_order', 'cutoff_minutes', 'sample_minutes', name='uix_filter_state'),
+    )
+
+
+class ArimaParams(Base):
+    __tablename__ = 'arima_params'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    model_order = Column(String(20), nullable=False) #e.g. "2,1,2"
+    params = Column(Text, nullable=False) #JSON list of fitted parameters, used to warm start the next fit
+    converged = Column(Integer, default=1)
+    fit_seconds = Column(Float)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'model_order', name='uix_arima_ticker_order'),
+    )
+
+
+class SpectralSummary(Base):
+    __tablename__ = 'spectral_summary'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    method = Column(String(10), nullable=False) #'fft' or 'welch'
+    as_of = Column(DateTime, nullable=False) #newest bar in the analysed window
+    bars = Column(Integer)
+    sample_seconds = Column(Float)
+    frequency_hz = Column(Float)
+    period_hours = Column(Float) #dominant cycle length
+    power = Column(Float)
+    power_share = Column(Float) #dominant bin's share of total non-DC power
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'method', name='uix_spectral_ticker_method'),
+        Index('idx_spectral_period', 'method', 'period_hours'),
+    )
+
+
+class DspSnapshot(Base):
+    __tablename__ = 'dsp_snapshots'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    model_version = Column(String(50), nullable=False)
+    as_of = Column(DateTime, nullable=False) #newest bar the results were computed from, one current row per ticker and version
+    timestamps = Column(Text) #JSON list of ISO timestamps for the window
+    close = Column(Text) #JSON lists aligned with timestamps
+    filtered = Column(Text)
+    fft_freqs = Column(Text)
+    fft_magnitude = Column(Text)
+    forecast = Column(Text) #JSON list, next bars
+    dominant_period_hours = Column(Float)
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'model_version', name='uix_dsp_ticker_version'),
+    )
+
+class DailyBar(Base):
+    __tablename__ = 'stock_prices_daily'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    timestamp = Column(DateTime, nullable=False) #start of the day bucket
+    open = Column(Float) #first bar's open
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float) #last bar's close
+    volume = Column(BigInteger)
+    bars = Column(Integer) #hourly bars in the bucket
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'timestamp', name='uix_daily_ticker_timestamp'),
+    )
+
+class WeeklyBar(Base):
+    __tablename__ = 'stock_prices_weekly'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    timestamp = Column(DateTime, nullable=False) #monday of the week bucket
+    open = Column(Float)
+    high = Column(Float)
+    low = Column(Float)
+    close = Column(Float)
+    volume = Column(BigInteger)
+    bars = Column(Integer)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'timestamp', name='uix_weekly_ticker_timestamp'),
+    )
+
+class PipelineRun(Base):
+    __tablename__ = 'pipeline_runs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    job = Column(String(50), nullable=False) #pipeline stage
+    trigger = Column(String(20)) #schedule or upstream
+    scheduled_for = Column(DateTime)
+    started_at = Column(DateTime) #null when the slot was skipped
+    finished_at = Column(DateTime)
+    duration_seconds = Column(Float)
+    status = Column(String(20), nullable=False) #success, error or skipped
+    detail = Column(Text) #JSON stats or error
+
+    __table_args__ = (
+        Index('idx_pipeline_runs_job_scheduled', 'job', 'scheduled_for'),
+    )
+
+class SentimentCache(Base):
+    __tablename__ = 'sentiment_cache'
+
+    content_hash = Column(String(64), primary_key=True) #sha256 of the normalized title + content
+    sentiment_score = Column(Float)
+    positive = Column(Float)
+    negative = Column(Float)
+    neutral = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SentimentHourly(Base):
+    __tablename__ = 'sentiment_hourly'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    hour = Column(DateTime, nullable=False) #published_at truncated to the hour
+    articles = Column(Integer, nullable=False)
+    score_sum = Column(Float, nullable=False) #running sums so new scores can be added in place
+    mean_score = Column(Float)
+    positive_articles = Column(Integer) #compound >= 0.05
+    negative_articles = Column(Integer) #compound <= -0.05
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'hour', name='uix_sentiment_ticker_hour'),
+    )
+
+class IngestJob(Base):
+    __tablename__ = 'ingest_jobs'
+
+    ticker = Column(String(10), primary_key=True) #one fetch job per ticker and cycle
+    cycle = Column(Integer, nullable=False, default=0)
+    status = Column(String(10), nullable=False, default='pending') #pending, leased, done or failed
+    lease_id = Column(String(36)) #fences completions from a worker whose lease expired
+    leased_by = Column(String(100))
+    lease_expires_at = Column(DateTime)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index('idx_ingest_jobs_claim', 'status', 'lease_expires_at'),
+    )
+
+class BackfillChunk(Base):
+    __tablename__ = 'backfill_chunks'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    chunk_start = Column(DateTime, nullable=False) #UTC, inclusive
+    chunk_end = Column(DateTime, nullable=False) #UTC, exclusive
+    rows = Column(Integer) #bars the source returned for the range
+    finished_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', 'chunk_start', 'chunk_end', name='uix_backfill_chunk'),
+    )
+
+class ScreenerResult(Base):
+    __tablename__ = 'screener_results'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    ticker = Column(String(10), nullable=False)
+    as_of = Column(DateTime, nullable=False) #newest real bar of the ticker
+    close = Column(Float)
+    return_1h = Column(Float) #simple returns over 1 bar, 1 session and 5 sessions of the session grid
+    return_1d = Column(Float)
+    return_5d = Column(Float)
+    volume_z = Column(Float) #latest volume vs. the same bar of previous sessions
+    avg_corr = Column(Float) #mean correlation with the rest of the universe
+    peer = Column(String(10)) #most correlated other ticker
+    peer_corr = Column(Float)
+    cluster = Column(Integer) #correlation cluster id, 0 = unclustered
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('ticker', name='uix_screener_ticker'),
+    )
+
+class CorrelationMatrix(Base):
+    __tablename__ = 'correlation_matrix'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    window = Column(Integer, nullable=False) #return bars in the rolling window
+    as_of = Column(DateTime, nullable=False) #newest grid bar in the window
+    tickers = Column(Text, nullable=False) #JSON list, row/column order of matrix
+    matrix = Column(LargeBinary, nullable=False) #float32 correlations, tickers x tickers
+    computed_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('window', name='uix_correlation_window'),
+    )
+
@@ -0,0 +1,251 @@
+import sys
+import os
+import re
+from datetime import date, datetime
+from sqlalchemy import text
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_engine
+
+# months of empty partitions kept ahead of the newest bar, and how many months of
+# bars to retain (0 = keep everything)
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '3'))
+RETENTION_MONTHS = int(os.getenv('STOCK_PRICES_RETENTION_MONTHS', '0'))
+
+PARTITION_NAME = re.compile(r'^stock_prices_p(\d{4})_(\d{2})$')
+
+# same columns and unique constraint as models.StockPrice; the partition key has to be
+# part of every unique constraint, which (ticker, timestamp) already is, so the surrogate
+# id is no longer a primary key and idx_ticker_timestamp (a duplicate of the
+# constraint's index) is not created
+PARTITIONED_DDL = """
+    CREATE TABLE stock_prices (
+        id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+        ticker VARCHAR(10) NOT NULL,
+        timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+        open DOUBLE PRECISION,
+        high DOUBLE PRECISION,
+        low DOUBLE PRECISION,
+        close DOUBLE PRECISION,
+        volume BIGINT,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        CONSTRAINT uix_ticker_timestamp UNIQUE (ticker, timestamp)
+    ) PARTITION BY RANGE (timestamp)
+"""
+
+# bars arrive in time order, so a BRIN on timestamp is tiny and prunes whole-universe
+# time range scans (e.g. the last N days) that the (ticker, timestamp) btree can't serve
+BRIN_DDL = "CREATE INDEX IF NOT EXISTS idx_stock_prices_timestamp_brin ON stock_prices USING brin (timestamp)"
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def add_months(value, months):
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"stock_prices_p{month.year:04d}_{month.month:02d}"
+
+
+def is_partitioned(conn):
+    """True when stock_prices is a declaratively partitioned table"""
+    kind = conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('stock_prices')")).scalar()
+    return kind == 'p'
+
+
+def list_partitions(conn):
+    """
+    Monthly partitions attached to stock_prices.
+
+    Returns:
+        list[(str, date)]: (partition name, first day of its month), oldest first
+    """
+
+    rows = conn.execute(text("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('stock_prices')
+    """)).fetchall()
+
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_NAME.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def create_partitioned_prices(conn):
+    """Create stock_prices as a monthly range-partitioned table with its BRIN index"""
+    conn.execute(text(PARTITIONED_DDL))
+    conn.execute(text(BRIN_DDL))
+
+
+def ensure_partitions(start=None, months_ahead=PARTITION_MONTHS_AHEAD, engine=None):
+    """
+    Create any missing monthly partitions from `start` through `months_ahead` months
+    past the current month. No-op when stock_prices isn't partitioned.
+
+    Parameters:
+        start (date | datetime): Oldest month needed (default the current month)
+
+    Returns:
+        list[str]: Partitions created
+    """
+
+    engine = engine or get_engine()
+    created = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            return created
+
+        existing = {name for name, _ in list_partitions(conn)}
+        month = month_start(start or datetime.utcnow())
+        last = add_months(month_start(datetime.utcnow()), months_ahead)
+        while month <= last:
+            name = partition_name(month)
+            if name not in existing:
+                # a table under a partition's name that isn't attached (detached before
+                # apply_retention renamed what it detaches) would turn CREATE into a no-op
+                if conn.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is not None:
+                    raise RuntimeError(f"{name} exists but isn't a partition of stock_prices; "
+                                       f"rename it or re-attach it before loading {month:%Y-%m}")
+                conn.execute(text(
+                    f"CREATE TABLE {name} PARTITION OF stock_prices "
+                    f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+                ))
+                created.append(name)
+            month = add_months(month, 1)
+
+    if created:
+        print(f"Created stock_prices partitions: {', '.join(created)}")
+    return created
+
+
+def apply_retention(months=RETENTION_MONTHS, drop=False, engine=None):
+    """
+    Detach (and optionally drop) partitions entirely older than `months` months.
+
+    Detached partitions stay around as ordinary tables for archiving, renamed to
+    <partition>_detached so the month can be created again later (e.g. by a backfill).
+
+    Returns:
+        list[str]: Partitions detached, by their original names
+    """
+
+    if months <= 0:
+        return []
+
+    engine = engine or get_engine()
+    cutoff = add_months(month_start(datetime.utcnow()), -months)
+    detached = []
+    with engine.begin() as conn:
+        if not is_partitioned(conn):
+            print("stock_prices isn't partitioned; retention needs the partitioned layout")
+            return detached
+
+        for name, month in list_partitions(conn):
+            if add_months(month, 1) > cutoff:
+                break
+            conn.execute(text(f"ALTER TABLE stock_prices DETACH PARTITION {name}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {name}"))
+            else:
+                archive, n = f"{name}_detached", 1
+                while conn.execute(text("SELECT to_regclass(:name)"), {'name': archive}).scalar() is not None:
+                    n += 1
+                    archive = f"{name}_detached_{n}"
+                conn.execute(text(f"ALTER TABLE {name} RENAME TO {archive}"))
+            detached.append(name)
+
+    if detached:
+        print(f"{'Dropped' if drop else 'Detached'} {len(detached)} partitions older than {cutoff}")
+    return detached
+
+
+def migrate_to_partitioned(drop_legacy=False, engine=None):
+    """
+    Move an existing heap stock_prices into the partitioned layout.
+
+    The heap table is renamed to stock_prices_legacy and copied over one month per
+    transaction, so the copy can be re-run after an interruption. Stop ingestion
+    while this runs.
+
+    Returns:
+        int: Rows copied
+    """
+
+    engine = engine or get_engine()
+
+    with engine.begin() as conn:
+        legacy = conn.execute(text("SELECT to_regclass('stock_prices_legacy')")).scalar()
+        if legacy is None:
+            if is_partitioned(conn):
+                print("stock_prices is already partitioned")
+                return 0
+            # index names are schema-wide, so the old ones make room for the new table's
+            conn.execute(text("ALTER TABLE stock_prices RENAME TO stock_prices_legacy"))
+            conn.execute(text("ALTER TABLE stock_prices_legacy RENAME CONSTRAINT uix_ticker_timestamp "
+                              "TO uix_ticker_timestamp_legacy"))
+            conn.execute(text("ALTER INDEX IF EXISTS idx_ticker_timestamp RENAME TO idx_ticker_timestamp_legacy"))
+            create_partitioned_prices(conn)
+
+        first, last = conn.execute(text("SELECT min(timestamp), max(timestamp) FROM stock_prices_legacy")).fetchone()
+
+    if first is None:
+        print("stock_prices_legacy is empty")
+    else:
+        ensure_partitions(start=first, engine=engine)
+
+    copied = 0
+    month = month_start(first) if first is not None else None
+    while month is not None and month <= month_start(last):
+        bounds = {'lo': month, 'hi': add_months(month, 1)}
+        with engine.begin() as conn:
+            result = conn.execute(text("""
+                INSERT INTO stock_prices (id, ticker, timestamp, open, high, low, close, volume, created_at)
+                SELECT id, ticker, timestamp, open, high, low, close, volume, created_at
+                FROM stock_prices_legacy
+                WHERE timestamp >= :lo AND timestamp < :hi
+                ON CONFLICT ON CONSTRAINT uix_ticker_timestamp DO NOTHING
+            """), bounds)
+            copied += result.rowcount
+        print(f"  {month:%Y-%m}: {result.rowcount} rows")
+        month = add_months(month, 1)
+
+    with engine.begin() as conn:
+        conn.execute(text("SELECT setval(pg_get_serial_sequence('stock_prices', 'id'), "
+                          "coalesce((SELECT max(id) FROM stock_prices), 0) + 1, false)"))
+        old = conn.execute(text("SELECT count(*) FROM stock_prices_legacy")).scalar()
+        new = conn.execute(text("SELECT count(*) FROM stock_prices")).scalar()
+        print(f"Migrated {copied} rows ({new} partitioned vs {old} legacy)")
+        if drop_legacy:
+            if new >= old:
+                conn.execute(text("DROP TABLE stock_prices_legacy"))
+                print("Dropped stock_prices_legacy")
+            else:
+                print("Row counts differ; keeping stock_prices_legacy")
+    return copied
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the partitioned stock_prices layout")
+    parser.add_argument('command', choices=['ensure', 'retention', 'migrate'])
+    parser.add_argument('--months', type=int, default=RETENTION_MONTHS, help="retention: months of bars to keep")
+    parser.add_argument('--drop', action='store_true', help="retention: drop instead of detach; "
+                                                            "migrate: drop the legacy table afterwards")
+    args = parser.parse_args()
+
+    if args.command == 'ensure':
+        ensure_partitions()
+    elif args.command == 'retention':
+        apply_retention(args.months, drop=args.drop)
+    else:
+        migrate_to_partitioned(drop_legacy=args.drop)
@@ -1,33 +1,442 @@
+import json
+import numpy as np
 import pandas as pd
-from .connection import get_session
-from .models import StockPrice
+from datetime import datetime
+from sqlalchemy import select, func, text
+from .connection import get_engine
+from .models import (
+    StockPrice, Ticker, FilterState, ArimaParams, DspSnapshot, DailyBar, WeeklyBar, SentimentCache, NewsArticle,
+    BackfillChunk, ScreenerResult, CorrelationMatrix,
+)
 
-def load_latest_data(limit=500):
-    session = get_session()
+BAR_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+FLOAT_COLUMNS = {"open", "high", "low", "close"}
 
-    # Query the most recent rows
+prices = StockPrice.__table__
+
+# resolution -> (table, bars per trading day), finest first
+RESOLUTIONS = {
+    "1h": (prices, 7.0),
+    "1d": (DailyBar.__table__, 1.0),
+    "1w": (WeeklyBar.__table__, 0.2),
+}
+
+
+def build_bars_query(tickers=None, start=None, end=None, last_n=None, columns=BAR_COLUMNS, table=prices):
+    """
+    Core select of only the requested stock_prices columns.
+
+    Parameters:
+        tickers (str | list[str]): One or more symbols (None = all)
+        start, end (datetime): Inclusive start / exclusive end on timestamp
+        last_n (int): Keep only the newest N bars per ticker
+        columns (list[str]): Columns besides ticker to return
+        table (Table): stock_prices or one of its rollup tables
+
+    Returns:
+        Select: Rows ordered by (ticker, timestamp)
+    """
+
+    if isinstance(tickers, str):
+        tickers = [tickers]
+    selected = [table.c.ticker] + [table.c[name] for name in columns if name != "ticker"]
+
+    filters = []
+    if tickers is not None:
+        filters.append(table.c.ticker.in_(tickers))
+    if start is not None:
+        filters.append(table.c.timestamp >= start)
+    if end is not None:
+        filters.append(table.c.timestamp < end)
+
+    if last_n is None:
+        return select(*selected).where(*filters).order_by(table.c.ticker, table.c.timestamp)
+
+    if tickers is not None and len(tickers) == 1:
+        # newest N via a backward index scan, flipped back to chronological order
+        newest = (
+            select(*selected).where(*filters)
+            .order_by(table.c.timestamp.desc())
+            .limit(last_n)
+            .subquery()
+        )
+        return select(*newest.c).order_by(newest.c.timestamp)
+
+    rank = func.row_number().over(partition_by=table.c.ticker, order_by=table.c.timestamp.desc())
+    ranked = select(*selected, rank.label("rn")).where(*filters).subquery()
+    return (
+        select(*[ranked.c[c.name] for c in selected])
+        .where(ranked.c.rn <= last_n)
+        .order_by(ranked.c.ticker, ranked.c.timestamp)
+    )
+
+
+def rows_to_arrays(rows, names):
+    """
+    Turn cursor rows into one typed NumPy array per column.
+
+    Floats become float64 (NULL -> NaN), volume int64 (NULL -> 0), timestamps
+    datetime64[us] and ticker an object array.
+    """
+
+    arrays = {}
+    columns = list(zip(*rows)) if rows else [() for _ in names]
+    for name, values in zip(names, columns):
+        if name in FLOAT_COLUMNS:
+            arrays[name] = np.array(values, dtype=np.float64)
+        elif name == "volume":
+            arrays[name] = np.array([v or 0 for v in values], dtype=np.int64)
+        elif name == "timestamp":
+            arrays[name] = np.array(values, dtype="datetime64[us]")
+        else:
+            arrays[name] = np.array(values, dtype=object)
+    return arrays
+
+
+def load_bar_arrays(tickers=None, start=None, end=None, last_n=None, columns=BAR_COLUMNS, engine=None):
+    """
+    Load bars as a dict of column arrays, one result set for all tickers.
+
+    Returns:
+        dict: column name -> np.ndarray, rows ordered by (ticker, timestamp)
+    """
+
+    engine = engine or get_engine()
+    query = build_bars_query(tickers, start, end, last_n, columns)
+    with engine.connect() as conn:
+        result = conn.execute(query)
+        names = list(result.keys())
+        rows = result.fetchall()
+    return rows_to_arrays(rows, names)
+
+
+def choose_resolution(start, end=None, points=250):
+    """
+    Coarsest resolution that still yields at least `points` bars over [start, end).
+
+    Falls back to hourly bars when even they can't reach `points`.
+    """
+
+    end = end or datetime.utcnow()
+    trading_days = max((end - start).total_seconds() / 86400.0, 0.0) * 5 / 7
+    for resolution in reversed(list(RESOLUTIONS)):
+        if trading_days * RESOLUTIONS[resolution][1] >= points:
+            return resolution
+    return "1h"
+
+
+def load_bars_for_range(tickers, start, end=None, points=250, columns=BAR_COLUMNS, engine=None):
+    """
+    Bars over a time range at the coarsest resolution that gives about `points` bars,
+    e.g. ~250 daily rows for a one-year chart instead of ~1,750 hourly ones.
+
+    Returns:
+        (dict, str): column arrays ordered by (ticker, timestamp), and the resolution used
+    """
+
+    resolution = choose_resolution(start, end, points)
+    engine = engine or get_engine()
+    query = build_bars_query(tickers, start, end, None, columns, table=RESOLUTIONS[resolution][0])
+    with engine.connect() as conn:
+        result = conn.execute(query)
+        names = list(result.keys())
+        rows = result.fetchall()
+    return rows_to_arrays(rows, names), resolution
+
+
+def load_bars(tickers=None, start=None, end=None, last_n=None, columns=BAR_COLUMNS, engine=None):
+    """
+    Load bars as a DataFrame built straight from the cursor (no ORM objects).
+
+    Returns:
+        pd.DataFrame: ticker plus the requested columns, ordered by (ticker, timestamp)
+    """
+
+    return pd.DataFrame(load_bar_arrays(tickers, start, end, last_n, columns, engine))
+
+
+def stream_bars(tickers=None, start=None, end=None, columns=BAR_COLUMNS, chunk_rows=100_000, engine=None):
+    """
+    Stream bars through a server-side cursor for multi-million-row reads.
+
+    Yields:
+        dict: column arrays for up to chunk_rows rows, in (ticker, timestamp) order
+    """
+
+    engine = engine or get_engine()
+    query = build_bars_query(tickers, start, end, None, columns)
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, max_row_buffer=chunk_rows).execute(query)
+        names = list(result.keys())
+        for rows in result.partitions(chunk_rows):
+            yield rows_to_arrays(rows, names)
+
+
+def partition_by_ticker(arrays):
+    """
+    Split a multi-ticker column dict into per-ticker views (no copies).
+
+    Returns:
+        dict: ticker -> {column: array slice}
+    """
+
+    tickers = arrays["ticker"]
+    if len(tickers) == 0:
+        return {}
+    starts = np.flatnonzero(np.r_[True, tickers[1:] != tickers[:-1]])
+    ends = np.r_[starts[1:], len(tickers)]
+    return {
+        tickers[s]: {name: values[s:e] for name, values in arrays.items() if name != "ticker"}
+        for s, e in zip(starts, ends)
+    }
+
+
+def load_bar_arrays_since(starts, columns=("timestamp", "close"), engine=None):
+    """
+    Bars strictly after a per-ticker timestamp, in one query.
+
+    Parameters:
+        starts (dict): ticker -> naive timestamp already processed (None = all bars)
+        columns (tuple[str]): stock_prices columns besides ticker
+
+    Returns:
+        dict: column name -> np.ndarray, rows ordered by (ticker, timestamp)
+    """
+
+    engine = engine or get_engine()
+    tickers = list(starts)
+    after = [starts[t] if starts[t] is not None else datetime.min for t in tickers]
+    selected = ", ".join(f"p.{name}" for name in columns)
+    query = text(f"""
+        SELECT p.ticker, {selected}
+        FROM unnest(CAST(:tickers AS varchar[]), CAST(:after AS timestamp[])) AS s(ticker, after_ts)
+        JOIN stock_prices p ON p.ticker = s.ticker AND p.timestamp > s.after_ts
+        ORDER BY p.ticker, p.timestamp
+    """)
+    with engine.connect() as conn:
+        result = conn.execute(query, {"tickers": tickers, "after": after})
+        names = list(result.keys())
+        rows = result.fetchall()
+    return rows_to_arrays(rows, names)
+
+
+def load_filter_states(order, cutoff_minutes, sample_minutes, tickers=None, engine=None):
+    """
+    Persisted streaming filter states for one filter design.
+
+    Returns:
+        dict: ticker -> (state bytes, last_timestamp, last_value)
+    """
+
+    engine = engine or get_engine()
+    states = FilterState.__table__
+    query = select(states.c.ticker, states.c.state, states.c.last_timestamp, states.c.last_value).where(
+        states.c.filter_order == order,
+        states.c.cutoff_minutes == cutoff_minutes,
+        states.c.sample_minutes == sample_minutes,
+    )
+    if tickers is not None:
+        query = query.where(states.c.ticker.in_(list(tickers)))
+    with engine.connect() as conn:
+        return {row.ticker: (bytes(row.state), row.last_timestamp, row.last_value) for row in conn.execute(query)}
+
+
+def load_arima_params(model_order, tickers=None, engine=None):
+    """
+    Last fitted ARIMA parameters per ticker, for warm starts.
+
+    Returns:
+        dict: ticker -> np.ndarray of parameters
+    """
+
+    engine = engine or get_engine()
+    table = ArimaParams.__table__
+    query = select(table.c.ticker, table.c.params).where(table.c.model_order == model_order)
+    if tickers is not None:
+        query = query.where(table.c.ticker.in_(list(tickers)))
+    with engine.connect() as conn:
+        return {row.ticker: np.array(json.loads(row.params)) for row in conn.execute(query)}
+
+
+def load_snapshot_marks(model_version, tickers, engine=None):
+    """
+    as_of of each ticker's latest DSP snapshot for a model version.
+
+    Returns:
+        dict: ticker -> naive as_of timestamp
+    """
+
+    engine = engine or get_engine()
+    query = text("""
+        SELECT t.ticker,
+               (SELECT max(d.as_of) FROM dsp_snapshots d
+                WHERE d.ticker = t.ticker AND d.model_version = :version)
+        FROM unnest(CAST(:tickers AS varchar[])) AS t(ticker)
+    """)
+    with engine.connect() as conn:
+        rows = conn.execute(query, {"tickers": list(tickers), "version": model_version}).fetchall()
+    return {ticker: as_of for ticker, as_of in rows if as_of is not None}
+
+
+def load_dsp_snapshot(ticker, model_version, engine=None):
+    """
+    Latest materialized DSP result for a ticker, via uix_dsp_ticker_version.
+
+    Returns:
+        dict | None: Snapshot with JSON columns decoded, plus age_seconds since it was computed
+    """
+
+    engine = engine or get_engine()
+    snapshots = DspSnapshot.__table__
     query = (
-        session.query(StockPrice)
-        .order_by(StockPrice.timestamp.desc())
-        .limit(limit)
+        select(snapshots)
+        .where(snapshots.c.ticker == ticker, snapshots.c.model_version == model_version)
+        .order_by(snapshots.c.as_of.desc())
+        .limit(1)
     )
+    with engine.connect() as conn:
+        row = conn.execute(query).mappings().first()
+    if row is None:
+        return None
+
+    snapshot = dict(row)
+    for name in ("close", "filtered", "fft_freqs", "fft_magnitude", "forecast"):
+        snapshot[name] = np.array(json.loads(snapshot[name] or "[]"), dtype=np.float64)
+    snapshot["timestamps"] = pd.to_datetime(json.loads(snapshot["timestamps"] or "[]"))
+    snapshot["age_seconds"] = (datetime.utcnow() - snapshot["computed_at"]).total_seconds()
+    return snapshot
+
+
+def load_screener(engine=None):
+    """
+    Current screener_results row of every ticker.
+
+    Returns:
+        pd.DataFrame: One row per ticker
+    """
+
+    engine = engine or get_engine()
+    results = ScreenerResult.__table__
+    with engine.connect() as conn:
+        rows = conn.execute(select(results).order_by(results.c.ticker)).mappings().all()
+    return pd.DataFrame(rows, columns=[c.name for c in results.columns])
+
+
+def load_correlation_matrix(window, engine=None):
+    """
+    Stored correlation matrix for a rolling window length.
+
+    Returns:
+        dict | None: tickers (list), as_of, computed_at and matrix (float32 tickers x tickers)
+    """
+
+    engine = engine or get_engine()
+    matrices = CorrelationMatrix.__table__
+    with engine.connect() as conn:
+        row = conn.execute(select(matrices).where(matrices.c.window == window)).mappings().first()
+    if row is None:
+        return None
+    tickers = json.loads(row["tickers"])
+    matrix = np.frombuffer(row["matrix"], dtype=np.float32).reshape(len(tickers), len(tickers))
+    return {"tickers": tickers, "as_of": row["as_of"], "computed_at": row["computed_at"], "matrix": matrix}
+
+
+def load_tickers(engine=None):
+    """
+    All tickers with stored bars, from the small maintained tickers table.
+
+    Falls back to a loose index scan of idx_ticker_timestamp (one probe per distinct
+    ticker) when the table hasn't been seeded yet.
+    """
+
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        tickers = [row[0] for row in conn.execute(select(Ticker.__table__.c.ticker).order_by(Ticker.__table__.c.ticker))]
+        if tickers:
+            return tickers
+        rows = conn.execute(text("""
+            WITH RECURSIVE t AS (
+                (SELECT ticker FROM stock_prices ORDER BY ticker LIMIT 1)
+                UNION ALL
+                SELECT (SELECT p.ticker FROM stock_prices p WHERE p.ticker > t.ticker ORDER BY p.ticker LIMIT 1)
+                FROM t WHERE t.ticker IS NOT NULL
+            )
+            SELECT ticker FROM t WHERE ticker IS NOT NULL
+        """))
+        return [row[0] for row in rows]
+
+
+def load_session_timezone(engine=None):
+    """Database session TimeZone, the zone stock_prices' naive timestamps were written in"""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT current_setting('TimeZone')")).scalar()
+
+
+def load_backfill_checkpoints(tickers, start, end, engine=None):
+    """
+    Backfill chunks already loaded that overlap [start, end).
+
+    Returns:
+        set: (ticker, chunk_start, chunk_end) with naive UTC datetimes
+    """
+
+    engine = engine or get_engine()
+    chunks = BackfillChunk.__table__
+    query = select(chunks.c.ticker, chunks.c.chunk_start, chunks.c.chunk_end).where(
+        chunks.c.ticker.in_(list(tickers)), chunks.c.chunk_start < end, chunks.c.chunk_end > start)
+    with engine.connect() as conn:
+        return {tuple(row) for row in conn.execute(query)}
+
+
+def load_news_urls(engine=None):
+    """Every stored article URL, streamed server-side so a large table isn't buffered twice"""
+
+    engine = engine or get_engine()
+    query = select(NewsArticle.__table__.c.url).where(NewsArticle.__table__.c.url.isnot(None))
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=50_000).execute(query)
+        return {row[0] for row in result}
+
+
+def load_unscored_articles(limit=2000, engine=None):
+    """
+    Articles without a sentiment_scores row (anti-join), oldest id first.
+
+    Returns:
+        list[Row]: id, ticker, published_at, title, content
+    """
+
+    engine = engine or get_engine()
+    query = text("""
+        SELECT a.id, a.ticker, a.published_at, a.title, a.content
+        FROM news_article a
+        WHERE NOT EXISTS (SELECT 1 FROM sentiment_scores s WHERE s.article_id = a.id)
+        ORDER BY a.id
+        LIMIT :limit
+    """)
+    with engine.connect() as conn:
+        return conn.execute(query, {"limit": limit}).fetchall()
+
+
+def load_cached_sentiment(hashes, engine=None):
+    """
+    Cached scores for content hashes.
+
+    Returns:
+        dict: content_hash -> (compound, positive, negative, neutral)
+    """
+
+    if not hashes:
+        return {}
+    engine = engine or get_engine()
+    cache = SentimentCache.__table__
+    query = select(cache.c.content_hash, cache.c.sentiment_score, cache.c.positive,
+                   cache.c.negative, cache.c.neutral).where(cache.c.content_hash.in_(list(hashes)))
+    with engine.connect() as conn:
+        return {row[0]: tuple(row[1:]) for row in conn.execute(query)}
+
 
-    rows = query.all()
-    session.close()
-
-    # Convert ORM objects → DataFrame
-    df = pd.DataFrame([
-        {
-            "ticker": r.ticker,
-            "timestamp": r.timestamp,
-            "open": r.open,
-            "high": r.high,
-            "low": r.low,
-            "close": r.close,
-            "volume": r.volume
-        }
-        for r in rows
-    ])
-
-    # Ensure chronological order
-    return df.sort_values("timestamp")
+def load_latest_data(limit=500, ticker="AAPL", engine=None):
+    # Most recent rows for one ticker, in chronological order
+    return load_bars(ticker, last_n=limit, engine=engine)
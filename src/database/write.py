@@ -0,0 +1,578 @@
+import io
+import json
+import pandas as pd
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert
+from .models import (
+    StockPrice, Ticker, TechnicalIndicator, FilterState, ArimaParams, SpectralSummary, DspSnapshot, PipelineRun,
+    SentinmentScore, SentimentCache, SentimentHourly, NewsArticle, BackfillChunk, ScreenerResult, CorrelationMatrix,
+)
+
+PRICE_COLUMNS = ['ticker', 'timestamp', 'open', 'high', 'low', 'close', 'volume']
+INDICATOR_COLUMNS = ['ma_5', 'ma_20', 'volatility_5d', 'rsi']
+
+# rows per INSERT statement, and the batch size where COPY becomes cheaper
+INSERT_CHUNK_SIZE = 1000
+COPY_THRESHOLD = 5000
+
+# LISTEN/NOTIFY channel for committed stock_prices rows
+BARS_CHANNEL = 'bars_ingested'
+NOTIFY_PAYLOAD_BYTES = 7900
+
+
+def frame_to_rows(ticker, data):
+    """
+    Convert a yfinance history frame into stock_prices rows.
+
+    Parameters:
+        ticker (str): Symbol the frame belongs to
+        data (pd.DataFrame): Frame indexed by timestamp with Open/High/Low/Close/Volume
+
+    Returns:
+        list[dict]: One dict per bar, keyed by PRICE_COLUMNS
+    """
+
+    if data is None or data.empty:
+        return []
+
+    # bars without prices can't be stored (yfinance sometimes pads with NaN)
+    data = data.dropna(subset=['Open', 'High', 'Low', 'Close'])
+    if data.empty:
+        return []
+
+    frame = pd.DataFrame({
+        'ticker': ticker,
+        'timestamp': data.index,
+        'open': data['Open'].astype(float).round(3).to_numpy(),
+        'high': data['High'].astype(float).round(3).to_numpy(),
+        'low': data['Low'].astype(float).round(3).to_numpy(),
+        'close': data['Close'].astype(float).round(3).to_numpy(),
+        'volume': data['Volume'].fillna(0).astype('int64').to_numpy(),
+    })
+
+    return frame.to_dict('records')
+
+
+def insert_price_rows(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Write rows with multi-row INSERT ... ON CONFLICT DO NOTHING and move the
+    tickers table's marks for the rows that went in.
+
+    Returns:
+        (int, int): Rows inserted, rows skipped as duplicates
+    """
+
+    written = []
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = (
+            insert(StockPrice)
+            .values(chunk)
+            .on_conflict_do_nothing(constraint='uix_ticker_timestamp')
+            .returning(StockPrice.ticker, StockPrice.timestamp)
+        )
+        written.extend(session.execute(stmt).fetchall())
+
+    upsert_ticker_marks(session, written)
+    return len(written), len(rows) - len(written)
+
+
+def copy_price_rows(session, rows):
+    """
+    Write rows by COPY-ing into a temp staging table and merging into stock_prices,
+    then move the tickers table's marks for the rows that went in.
+
+    Returns:
+        (int, int): Rows inserted, rows skipped as duplicates
+    """
+
+    if not rows:
+        return 0, 0
+
+    buffer = io.StringIO()
+    pd.DataFrame(rows, columns=PRICE_COLUMNS).to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+
+    # raw psycopg2 connection of the session's current transaction
+    cursor = session.connection().connection.cursor()
+    try:
+        # timestamptz so the cast into stock_prices matches the INSERT path
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS stock_prices_staging (
+                ticker VARCHAR(10),
+                timestamp TIMESTAMPTZ,
+                open DOUBLE PRECISION,
+                high DOUBLE PRECISION,
+                low DOUBLE PRECISION,
+                close DOUBLE PRECISION,
+                volume BIGINT
+            ) ON COMMIT DELETE ROWS
+        """)
+        cursor.copy_expert(
+            f"COPY stock_prices_staging ({', '.join(PRICE_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        cursor.execute(f"""
+            INSERT INTO stock_prices ({', '.join(PRICE_COLUMNS)}, created_at)
+            SELECT {', '.join(PRICE_COLUMNS)}, now() AT TIME ZONE 'utc'
+            FROM stock_prices_staging
+            ON CONFLICT ON CONSTRAINT uix_ticker_timestamp DO NOTHING
+            RETURNING ticker, timestamp
+        """)
+        written = cursor.fetchall()
+        cursor.execute("TRUNCATE stock_prices_staging")
+    finally:
+        cursor.close()
+
+    upsert_ticker_marks(session, written)
+    return len(written), len(rows) - len(written)
+
+
+def write_price_rows(session, rows, method='auto'):
+    """
+    Bulk write stock_prices rows, leaning on uix_ticker_timestamp to drop duplicates.
+
+    Parameters:
+        session: SQLAlchemy session (caller commits)
+        rows (list[dict]): Output of frame_to_rows, may span several tickers
+        method (str): 'insert', 'copy' or 'auto' (COPY for large batches)
+
+    Returns:
+        (int, int): Rows inserted, rows skipped as duplicates
+    """
+
+    if not rows:
+        return 0, 0
+
+    if method == 'copy' or (method == 'auto' and len(rows) >= COPY_THRESHOLD):
+        counts = copy_price_rows(session, rows)
+    elif method in ('insert', 'auto'):
+        counts = insert_price_rows(session, rows)
+    else:
+        raise ValueError(f"Unknown write method: {method}")
+
+    return counts
+
+
+def notify_bars(session, rows, channel=BARS_CHANNEL):
+    """
+    pg_notify the tickers in rows on `channel`, inside the caller's transaction.
+
+    Postgres delivers the notification only when the transaction commits, so a
+    listener (storage/hot_cache.py) never sees bars that were rolled back.
+    Payloads are JSON lists of tickers kept under the 8000-byte NOTIFY limit.
+    """
+
+    return _notify_tickers(session, sorted({row['ticker'] for row in rows}), channel)
+
+
+def notify_rebuild(session, tickers, channel=BARS_CHANNEL):
+    """
+    pg_notify listeners to reload `tickers` from scratch rather than append.
+
+    For bars written behind a ticker's newest bar (backfills), which an append-only
+    refresh skips. Payloads are {"rebuild": [tickers]}.
+    """
+
+    return _notify_tickers(session, sorted(set(tickers)), channel, key='rebuild')
+
+
+def _notify_tickers(session, tickers, channel, key=None):
+    def send(batch):
+        payload = json.dumps(batch if key is None else {key: batch})
+        session.execute(text("SELECT pg_notify(:channel, :payload)"), {'channel': channel, 'payload': payload})
+
+    empty = 2 if key is None else len(json.dumps({key: []}))
+    batch, size = [], empty
+    for ticker in tickers:
+        cost = len(json.dumps(ticker)) + 2
+        if batch and size + cost > NOTIFY_PAYLOAD_BYTES:
+            send(batch)
+            batch, size = [], empty
+        batch.append(ticker)
+        size += cost
+    if batch:
+        send(batch)
+    return len(tickers)
+
+
+def upsert_ticker_marks(session, written):
+    """
+    Keep the tickers table's first/last bar in step with bars just inserted, and lower
+    each ticker's rollup_from to the oldest of them so update_rollups revisits its bucket.
+
+    Parameters:
+        written (list): (ticker, timestamp) of each inserted row
+    """
+
+    marks = {}
+    for ticker, timestamp in written:
+        first, last = marks.get(ticker, (timestamp, timestamp))
+        marks[ticker] = (min(first, timestamp), max(last, timestamp))
+    if not marks:
+        return
+
+    stmt = insert(Ticker).values([
+        {'ticker': ticker, 'first_bar': first, 'last_bar': last, 'rollup_from': first}
+        for ticker, (first, last) in marks.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['ticker'],
+        set_={
+            'first_bar': func.least(Ticker.first_bar, stmt.excluded.first_bar),
+            'last_bar': func.greatest(Ticker.last_bar, stmt.excluded.last_bar),
+            'rollup_from': func.least(Ticker.rollup_from, stmt.excluded.rollup_from),
+            'updated_at': func.now(),
+        }
+    )
+    session.execute(stmt)
+
+
+def rebuild_ticker_table(session):
+    """Seed tickers from stock_prices (one full scan, for existing databases)"""
+
+    result = session.execute(text("""
+        INSERT INTO tickers (ticker, first_bar, last_bar, updated_at)
+        SELECT ticker, min(timestamp), max(timestamp), now()
+        FROM stock_prices
+        GROUP BY ticker
+        ON CONFLICT (ticker) DO UPDATE
+        SET first_bar = EXCLUDED.first_bar, last_bar = EXCLUDED.last_bar, updated_at = now()
+    """))
+    return result.rowcount
+
+
+def write_indicator_rows(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Upsert technical_indicators rows, replacing values for existing (ticker, timestamp).
+
+    Returns:
+        int: Rows written
+    """
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(TechnicalIndicator).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_tech_ticker_timestamp',
+            set_={column: stmt.excluded[column] for column in INDICATOR_COLUMNS}
+        )
+        written += session.execute(stmt).rowcount
+
+    return written
+
+
+def write_filter_states(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Upsert streaming filter states (see FilterState), one row per ticker and design.
+
+    Returns:
+        int: Rows written
+    """
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(FilterState).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_filter_state',
+            set_={
+                'state': stmt.excluded.state,
+                'last_timestamp': stmt.excluded.last_timestamp,
+                'last_value': stmt.excluded.last_value,
+                'updated_at': stmt.excluded.updated_at,
+            }
+        )
+        written += session.execute(stmt).rowcount
+
+    return written
+
+
+def write_arima_params(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Upsert fitted ARIMA parameters, one row per ticker and model order.
+
+    Returns:
+        int: Rows written
+    """
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(ArimaParams).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_arima_ticker_order',
+            set_={
+                'params': stmt.excluded.params,
+                'converged': stmt.excluded.converged,
+                'fit_seconds': stmt.excluded.fit_seconds,
+                'updated_at': stmt.excluded.updated_at,
+            }
+        )
+        written += session.execute(stmt).rowcount
+
+    return written
+
+
+def write_spectral_rows(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Upsert spectral_summary rows, keeping the latest summary per ticker and method.
+
+    Returns:
+        int: Rows written
+    """
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(SpectralSummary).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_spectral_ticker_method',
+            set_={name: stmt.excluded[name] for name in chunk[0] if name not in ('ticker', 'method')}
+        )
+        written += session.execute(stmt).rowcount
+
+    return written
+
+
+def write_dsp_snapshots(session, rows, chunk_size=200):
+    """
+    Upsert materialized DSP results, keeping one current row per ticker and model version.
+
+    Returns:
+        int: Rows written
+    """
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(DspSnapshot).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_dsp_ticker_version',
+            set_={name: stmt.excluded[name] for name in chunk[0]
+                  if name not in ('ticker', 'model_version')}
+        )
+        written += session.execute(stmt).rowcount
+
+    return written
+
+
+def delete_stale_dsp_snapshots(session, model_version):
+    """
+    Drop snapshots of other model versions, which nothing reads once the version is bumped.
+
+    Returns:
+        int: Rows deleted
+    """
+
+    table = DspSnapshot.__table__
+    return session.execute(table.delete().where(table.c.model_version != model_version)).rowcount
+
+
+# rollup resolution -> (table, date_trunc unit, unique constraint)
+ROLLUPS = {
+    '1d': ('stock_prices_daily', 'day', 'uix_daily_ticker_timestamp'),
+    '1w': ('stock_prices_weekly', 'week', 'uix_weekly_ticker_timestamp'),
+}
+
+
+def write_screener_rows(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Upsert screener_results, one current row per ticker.
+
+    Returns:
+        int: Rows written
+    """
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start:start + chunk_size]
+        stmt = insert(ScreenerResult).values(chunk)
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_screener_ticker',
+            set_={name: stmt.excluded[name] for name in chunk[0] if name != 'ticker'}
+        )
+        written += session.execute(stmt).rowcount
+
+    return written
+
+
+def write_correlation_matrix(session, row):
+    """Replace the stored correlation matrix for row['window']"""
+    stmt = insert(CorrelationMatrix).values(row)
+    stmt = stmt.on_conflict_do_update(
+        constraint='uix_correlation_window',
+        set_={name: stmt.excluded[name] for name in row if name != 'window'}
+    )
+    session.execute(stmt)
+
+
+def claim_rollup_marks(session, tickers):
+    """
+    Read and clear tickers.rollup_from, in the caller's transaction.
+
+    The row locks are held until the rollups commit, so bars written meanwhile lower
+    rollup_from again afterwards instead of being lost.
+
+    Returns:
+        dict: ticker -> oldest bar written since the last rollup
+    """
+
+    rows = session.execute(text("""
+        UPDATE tickers SET rollup_from = NULL
+        FROM (SELECT ticker, rollup_from FROM tickers
+              WHERE ticker = ANY(CAST(:tickers AS varchar[])) AND rollup_from IS NOT NULL
+              FOR UPDATE) AS old
+        WHERE tickers.ticker = old.ticker
+        RETURNING old.ticker, old.rollup_from
+    """), {'tickers': list(tickers)}).fetchall()
+    return {ticker: rollup_from for ticker, rollup_from in rows}
+
+
+def write_rollups(session, resolution, tickers, since=None, written_from=None):
+    """
+    Re-aggregate the OHLCV buckets touched by new bars and upsert them.
+
+    Each ticker's bars are read from the start of its newest existing bucket (the
+    only one that can still be growing) or the bucket of its oldest newly written
+    bar, whichever is earlier. When `since` is given, every ticker is rebuilt from
+    the bucket containing `since` instead.
+
+    Parameters:
+        resolution (str): '1d' or '1w'
+        tickers (list[str]): Symbols to roll up
+        since (datetime): Rebuild buckets from here instead of the newest bucket
+        written_from (dict): ticker -> oldest bar written since the last rollup (claim_rollup_marks)
+
+    Returns:
+        int: Buckets written
+    """
+
+    table, unit, constraint = ROLLUPS[resolution]
+    result = session.execute(text(f"""
+        INSERT INTO {table} (ticker, timestamp, open, high, low, close, volume, bars, updated_at)
+        SELECT p.ticker,
+               date_trunc('{unit}', p.timestamp) AS bucket,
+               (array_agg(p.open ORDER BY p.timestamp))[1],
+               max(p.high),
+               min(p.low),
+               (array_agg(p.close ORDER BY p.timestamp DESC))[1],
+               sum(p.volume),
+               count(*),
+               now() AT TIME ZONE 'utc'
+        FROM unnest(CAST(:tickers AS varchar[]), CAST(:written_from AS timestamp[])) AS t(ticker, written_from)
+        CROSS JOIN LATERAL (
+            SELECT max(r.timestamp) AS newest FROM {table} r WHERE r.ticker = t.ticker
+        ) n
+        CROSS JOIN LATERAL (
+            SELECT coalesce(date_trunc('{unit}', CAST(:since AS timestamp)),
+                            CASE WHEN n.newest IS NOT NULL
+                                 THEN least(date_trunc('{unit}', t.written_from), n.newest) END,
+                            '-infinity') AS from_ts
+        ) s
+        JOIN stock_prices p ON p.ticker = t.ticker AND p.timestamp >= s.from_ts
+        GROUP BY p.ticker, bucket
+        ON CONFLICT ON CONSTRAINT {constraint} DO UPDATE
+        SET open = EXCLUDED.open, high = EXCLUDED.high, low = EXCLUDED.low, close = EXCLUDED.close,
+            volume = EXCLUDED.volume, bars = EXCLUDED.bars, updated_at = EXCLUDED.updated_at
+    """), {'tickers': list(tickers), 'since': since,
+          'written_from': [(written_from or {}).get(t) for t in tickers]})
+    return result.rowcount
+
+
+def write_pipeline_run(session, row):
+    """Append one stage run to pipeline_runs"""
+    session.execute(insert(PipelineRun).values(row))
+
+
+def write_news_articles(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Bulk insert news_article rows, skipping URLs that are already stored (uix_url).
+
+    Returns:
+        (int, int): Rows inserted, rows skipped as duplicates
+    """
+
+    inserted = 0
+    for start in range(0, len(rows), chunk_size):
+        stmt = insert(NewsArticle).values(rows[start:start + chunk_size]).on_conflict_do_nothing(constraint='uix_url')
+        inserted += session.execute(stmt).rowcount
+    return inserted, len(rows) - inserted
+
+
+def write_backfill_checkpoints(session, rows):
+    """Record loaded (ticker, chunk) ranges; commit with the chunk's bars so both land or neither"""
+
+    if not rows:
+        return 0
+    stmt = insert(BackfillChunk).values(rows).on_conflict_do_nothing(constraint='uix_backfill_chunk')
+    return session.execute(stmt).rowcount
+
+
+def delete_backfill_checkpoints(session, tickers, start, end):
+    """Forget loaded chunks overlapping [start, end) so the next backfill fetches them again"""
+
+    table = BackfillChunk.__table__
+    return session.execute(table.delete().where(
+        table.c.ticker.in_(list(tickers)), table.c.chunk_start < end, table.c.chunk_end > start)).rowcount
+
+
+def write_sentiment_scores(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Bulk insert sentiment_scores rows, skipping articles another run scored first (uix_sentiment_article).
+
+    Returns:
+        set: article_id of the rows actually inserted
+    """
+
+    inserted = set()
+    for start in range(0, len(rows), chunk_size):
+        stmt = (
+            insert(SentinmentScore)
+            .values(rows[start:start + chunk_size])
+            .on_conflict_do_nothing(constraint='uix_sentiment_article')
+            .returning(SentinmentScore.article_id)
+        )
+        inserted.update(session.execute(stmt).scalars())
+    return inserted
+
+
+def write_sentiment_cache(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """Add newly scored content hashes; a hash scored concurrently elsewhere is kept as is"""
+
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        stmt = insert(SentimentCache).values(rows[start:start + chunk_size]).on_conflict_do_nothing()
+        written += session.execute(stmt).rowcount
+    return written
+
+
+def write_sentiment_hourly(session, rows, chunk_size=INSERT_CHUNK_SIZE):
+    """
+    Fold a batch's per-(ticker, hour) totals into sentiment_hourly by adding to the
+    running counts and sums, so existing articles never need re-reading.
+
+    Returns:
+        int: Rows written
+    """
+
+    table = SentimentHourly.__table__
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        stmt = insert(SentimentHourly).values(rows[start:start + chunk_size])
+        articles = table.c.articles + stmt.excluded.articles
+        score_sum = table.c.score_sum + stmt.excluded.score_sum
+        stmt = stmt.on_conflict_do_update(
+            constraint='uix_sentiment_ticker_hour',
+            set_={
+                'articles': articles,
+                'score_sum': score_sum,
+                'mean_score': score_sum / articles,
+                'positive_articles': table.c.positive_articles + stmt.excluded.positive_articles,
+                'negative_articles': table.c.negative_articles + stmt.excluded.negative_articles,
+                'updated_at': stmt.excluded.updated_at,
+            }
+        )
+        written += session.execute(stmt).rowcount
+    return written
@@ -0,0 +1,369 @@
+import sys
+import os
+import time
+import queue
+import threading
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion.ticker_loader import get_sp500_tickers
+from ingestion.fetchers import YFinanceFetcher, FakeFetcher
+from ingestion.engine import TokenBucket, NOTIFY_BARS
+from database.connection import get_session, session_scope
+from database.read import load_backfill_checkpoints
+from database.write import (
+    frame_to_rows, write_price_rows, write_backfill_checkpoints, delete_backfill_checkpoints, notify_rebuild,
+)
+from database.partitions import ensure_partitions
+from analysis.rollups import update_rollups
+from analysis.resample import invalidate_resample_cache
+from storage.mirror import sync_columnar, COLUMNAR_MIRROR
+from monitoring.metrics import registry
+from monitoring.events import log_event
+
+# backfill settings, overridable from .env
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '8'))
+BACKFILL_RATE = float(os.getenv('BACKFILL_RATE', '5'))  # requests per second
+BACKFILL_TIMEOUT = float(os.getenv('BACKFILL_TIMEOUT', '30'))
+BACKFILL_BATCH_ROWS = int(os.getenv('BACKFILL_BATCH_ROWS', '50000'))  # rows per COPY + merge
+
+# stock_prices holds hourly bars. Yahoo serves 1h history for the last 730 days;
+# 60-day requests keep each response small enough to retry cheaply.
+INTERVAL = '1h'
+CHUNK_DAYS = 60
+LOOKBACK_DAYS = 729
+
+# chunks sit on a fixed grid from this anchor, so reruns over other ranges reuse them
+CHUNK_ANCHOR = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+_DONE = object()
+
+
+def _utc(value):
+    value = pd.Timestamp(value)
+    return (value.tz_localize('UTC') if value.tzinfo is None else value.tz_convert('UTC')).to_pydatetime()
+
+
+def next_chunk_edge(value, chunk_days=CHUNK_DAYS):
+    """First chunk grid boundary at or after `value`"""
+    width = timedelta(days=chunk_days)
+    return CHUNK_ANCHOR + width * -((CHUNK_ANCHOR - _utc(value)) // width)
+
+
+def plan_chunks(tickers, start, end, chunk_days=CHUNK_DAYS, split_at=None):
+    """
+    Split [start, end) into grid-aligned chunks for every ticker.
+
+    Parameters:
+        split_at (datetime): Also cut the chunk containing this time, so the part
+                             before it can be checkpointed while the rest stays open
+
+    Returns:
+        list[(str, datetime, datetime)]: (ticker, chunk start, chunk end) in UTC,
+                                         oldest chunk of each ticker first
+    """
+
+    start, end = _utc(start), _utc(end)
+    width = timedelta(days=chunk_days)
+    first = CHUNK_ANCHOR + width * ((start - CHUNK_ANCHOR) // width)
+    bounds = []
+    edge = first
+    while edge < end:
+        lo, hi = max(edge, start), min(edge + width, end)
+        if split_at is not None and lo < split_at < hi:
+            bounds.extend([(lo, split_at), (split_at, hi)])
+        else:
+            bounds.append((lo, hi))
+        edge += width
+    return [(ticker, lo, hi) for ticker in tickers for lo, hi in bounds]
+
+
+def uncovered(chunks, done):
+    """
+    What is left of each chunk after the loaded ranges in `done`.
+
+    A chunk's start is moved past every checkpoint that covers it, so checkpoints
+    recorded with other bounds (a differently clamped start, an earlier run's open
+    tail) still count. Chunks covered entirely are dropped.
+
+    Parameters:
+        done (set): (ticker, chunk_start, chunk_end) naive UTC, from load_backfill_checkpoints
+    """
+
+    spans = {}
+    for ticker, lo, hi in done:
+        spans.setdefault(ticker, []).append((lo.replace(tzinfo=timezone.utc), hi.replace(tzinfo=timezone.utc)))
+    left = []
+    for ticker, lo, hi in chunks:
+        for span_lo, span_hi in sorted(spans.get(ticker, [])):
+            if span_lo <= lo < span_hi:
+                lo = span_hi
+        if lo < hi:
+            left.append((ticker, lo, hi))
+    return left
+
+
+def _naive(value):
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class BackfillLoader:
+    """
+    Loader stage: COPY rows into the staging table and merge into stock_prices, then
+    checkpoint the chunks they came from in the same transaction.
+    """
+
+    def __init__(self):
+        self.session = get_session()
+
+    def __call__(self, rows, chunks):
+        try:
+            inserted, skipped = write_price_rows(self.session, rows, method='copy')
+            write_backfill_checkpoints(self.session, chunks)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return inserted, skipped
+
+    def close(self):
+        self.session.close()
+
+
+def null_loader(rows, chunks):
+    """Loader that stores nothing, for offline runs and benchmarks"""
+    return 0, len(rows)
+
+
+class Backfill:
+    """
+    Concurrent, resumable historical load of hourly bars.
+
+    Chunks already checkpointed are skipped. The rest are fetched by a bounded thread
+    pool under a shared token bucket and handed to one loader thread, which batches
+    them into large COPY + merge transactions that also write the chunks'
+    checkpoints. An interrupted run therefore resumes exactly after the last
+    committed batch, and a chunk is never recorded without its bars. Chunks that
+    reach into the last day aren't checkpointed, so new bars are picked up next time.
+
+    Parameters:
+        fetcher (Fetcher): Source of history frames (fetch with start/end)
+        loader (callable): (rows, checkpoint rows) -> (inserted, skipped), default BackfillLoader
+        workers (int): Fetch threads
+        rate (float): Max requests per second (None = unlimited)
+        timeout (float): Per-request timeout in seconds
+        batch_rows (int): Rows buffered before each COPY
+        checkpoints (bool): Skip and record finished chunks in backfill_chunks
+    """
+
+    def __init__(self, fetcher, loader=None, workers=BACKFILL_WORKERS, rate=BACKFILL_RATE,
+                 timeout=BACKFILL_TIMEOUT, batch_rows=BACKFILL_BATCH_ROWS, checkpoints=True):
+        self.fetcher = fetcher
+        self.loader = loader
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.timeout = timeout
+        self.batch_rows = batch_rows
+        self.checkpoints = checkpoints
+        self.lock = threading.Lock()
+
+    def _fetch_chunk(self, chunk, rows_queue, stats):
+        ticker, start, end = chunk
+        self.bucket.acquire()
+        started = time.perf_counter()
+        try:
+            frame = self.fetcher.fetch(ticker, interval=INTERVAL, timeout=self.timeout, start=start, end=end)
+            if frame is not None and not frame.empty:
+                index = frame.index if frame.index.tz is not None else frame.index.tz_localize('UTC')
+                frame = frame[(index >= start) & (index < end)]
+            rows = frame_to_rows(ticker, frame)
+        except Exception as e:
+            with self.lock:
+                stats['errors'][f"{ticker} {start:%Y-%m-%d}"] = str(e)
+            log_event('backfill_error', ticker=ticker, start=start, end=end, error=str(e))
+            return
+        registry.observe('fetch_request_seconds', time.perf_counter() - started, tickers_per_request='1')
+        with self.lock:
+            stats['fetched'] += len(rows)
+            stats['chunks_fetched'] += 1
+        rows_queue.put((chunk, rows))
+
+    def _load_loop(self, rows_queue, stats, complete_before):
+        buffer = []
+        chunks = []
+
+        def flush():
+            if not buffer and not chunks:
+                return
+            started = time.perf_counter()
+            try:
+                inserted, skipped = self.loader(buffer, chunks)
+                stats['loaded'] += len(buffer)
+                stats['inserted'] += inserted
+                stats['skipped'] += skipped
+                stats['chunks_loaded'] += len(chunks)
+            except Exception as e:
+                with self.lock:
+                    for chunk in chunks:
+                        stats['errors'][f"{chunk['ticker']} {chunk['chunk_start']:%Y-%m-%d}"] = f"load failed: {e}"
+                log_event('backfill_load_error', rows=len(buffer), chunks=len(chunks), error=str(e))
+            elapsed = time.perf_counter() - started
+            stats['load_seconds'] += elapsed
+            registry.observe('db_write_seconds', elapsed)
+            log_event('backfill_load', rows=len(buffer), chunks=len(chunks), seconds=round(elapsed, 4))
+            buffer.clear()
+            chunks.clear()
+
+        while True:
+            item = rows_queue.get()
+            if item is _DONE:
+                flush()
+                return
+            (ticker, start, end), rows = item
+            buffer.extend(rows)
+            if end <= complete_before:
+                chunks.append({'ticker': ticker, 'chunk_start': _naive(start), 'chunk_end': _naive(end),
+                               'rows': len(rows), 'finished_at': datetime.utcnow()})
+            if len(buffer) >= self.batch_rows:
+                flush()
+
+    def run(self, tickers, start, end=None):
+        """
+        Backfill [start, end) for every ticker.
+
+        Returns:
+            dict: Chunk counts (planned, already done, fetched, loaded), rows
+                  fetched/loaded/inserted/skipped, errors, timings and rows/s loaded
+        """
+
+        end = _utc(end or datetime.now(timezone.utc))
+        start = _utc(start)
+        # only the last day stays open: the tail chunk is cut there so the rest is checkpointed
+        complete_before = datetime.now(timezone.utc) - timedelta(days=1)
+        chunks = plan_chunks(tickers, start, end, split_at=complete_before)
+        stats = {
+            'tickers': len(tickers), 'chunks': len(chunks), 'chunks_done': 0, 'chunks_fetched': 0,
+            'chunks_loaded': 0, 'fetched': 0, 'loaded': 0, 'inserted': 0, 'skipped': 0, 'errors': {},
+            'load_seconds': 0.0, 'wall_seconds': 0.0,
+        }
+
+        if self.checkpoints:
+            chunks = uncovered(chunks, load_backfill_checkpoints(tickers, _naive(start), _naive(end)))
+            stats['chunks_done'] = stats['chunks'] - len(chunks)
+        print(f"Backfill {start:%Y-%m-%d} to {end:%Y-%m-%d}: {stats['chunks']} chunks for {len(tickers)} tickers, "
+              f"{stats['chunks_done']} already loaded")
+
+        own_loader = self.loader is None
+        if own_loader:
+            self.loader = BackfillLoader()
+
+        rows_queue = queue.Queue(maxsize=self.workers * 4)
+        loader_thread = threading.Thread(target=self._load_loop, args=(rows_queue, stats, complete_before),
+                                         daemon=True)
+
+        started = time.perf_counter()
+        loader_thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._fetch_chunk, chunk, rows_queue, stats): chunk for chunk in chunks}
+            # anything _fetch_chunk didn't catch itself would otherwise vanish with the future
+            for future, (ticker, chunk_start, _) in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    with self.lock:
+                        stats['errors'].setdefault(f"{ticker} {chunk_start:%Y-%m-%d}", f"fetch failed: {e}")
+        finally:
+            rows_queue.put(_DONE)
+            loader_thread.join()
+            if own_loader:
+                self.loader.close()
+                self.loader = None
+
+        stats['wall_seconds'] = time.perf_counter() - started
+        stats['rows_per_second'] = stats['loaded'] / stats['wall_seconds'] if stats['wall_seconds'] else 0.0
+        return stats
+
+
+def backfill(start, end=None, tickers=None, fetcher=None, loader=None, workers=BACKFILL_WORKERS,
+             rate=BACKFILL_RATE, reset=False, checkpoints=True):
+    """
+    Load history for a ticker set and date range, then refresh partitions, rollups, the
+    columnar mirror, the resample cache and hot caches, none of which pick up bars this
+    far back on their own.
+
+    Parameters:
+        start, end (datetime | str): UTC range (end defaults to now)
+        tickers (list[str]): Symbols (default the configured universe)
+        fetcher (Fetcher): Default YFinanceFetcher; start is clamped to Yahoo's 1h lookback
+        loader (callable): Default BackfillLoader (COPY into stock_prices)
+        reset (bool): Forget the range's checkpoints first and fetch everything again
+
+    Returns:
+        dict: Backfill.run stats
+    """
+
+    tickers = tickers or get_sp500_tickers()
+    start, end = _utc(start), _utc(end or datetime.now(timezone.utc))
+    if fetcher is None:
+        fetcher = YFinanceFetcher()
+        # snapped to the chunk grid, so resumed runs plan the same first chunk
+        oldest = next_chunk_edge(datetime.now(timezone.utc) - timedelta(days=LOOKBACK_DAYS))
+        if start < oldest:
+            print(f"Yahoo keeps {LOOKBACK_DAYS} days of {INTERVAL} bars, starting at {oldest:%Y-%m-%d}")
+            start = oldest
+
+    database = loader is None
+    if database:
+        ensure_partitions(start=start)
+        if reset:
+            session = get_session()
+            try:
+                deleted = delete_backfill_checkpoints(session, tickers, _naive(start), _naive(end))
+                session.commit()
+            finally:
+                session.close()
+            print(f"Cleared {deleted} checkpoints")
+
+    stats = Backfill(fetcher, loader=loader, workers=workers, rate=rate,
+                     checkpoints=checkpoints and database).run(tickers, start, end)
+
+    for key, error in list(stats['errors'].items())[:20]:
+        print(f"Error: {key} - {error}")
+    log_event('backfill_summary', **{k: v for k, v in stats.items() if k != 'errors'}, errors=len(stats['errors']))
+    print(f"Backfill: {stats['chunks_fetched']} chunks fetched, {stats['fetched']} rows, {stats['loaded']} loaded, "
+          f"{stats['inserted']} inserted, {len(stats['errors'])} errors in {stats['wall_seconds']:.1f}s ({stats['rows_per_second']:,.0f} rows/s)")
+
+    if database and stats['inserted']:
+        update_rollups(tickers, since=_naive(start))
+        if COLUMNAR_MIRROR:
+            sync_columnar(tickers=tickers, since=_naive(start))
+        invalidate_resample_cache()
+        if NOTIFY_BARS:
+            # hot caches only append bars newer than their last one; holes filled behind it need a reload
+            with session_scope() as session:
+                notify_rebuild(session, tickers)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Backfill hourly bars over a date range (resumable)")
+    parser.add_argument('--start', required=True, type=datetime.fromisoformat, help="UTC date, e.g. 2024-01-01")
+    parser.add_argument('--end', type=datetime.fromisoformat, default=None, help="exclusive UTC date (default now)")
+    parser.add_argument('--tickers', nargs='+', default=None)
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    parser.add_argument('--rate', type=float, default=BACKFILL_RATE, help="requests per second (0 = unlimited)")
+    parser.add_argument('--reset', action='store_true', help="ignore earlier checkpoints for this range")
+    parser.add_argument('--fake', action='store_true', help="synthetic bars from FakeFetcher instead of Yahoo")
+    parser.add_argument('--latency', type=float, default=0.05, help="seconds per fake request")
+    parser.add_argument('--dry-run', action='store_true', help="fetch only, nothing is written")
+    args = parser.parse_args()
+
+    backfill(args.start, args.end, tickers=args.tickers,
+             fetcher=FakeFetcher(latency=args.latency, jitter=args.latency / 4) if args.fake else None,
+             loader=null_loader if args.dry_run else None,
+             workers=args.workers, rate=args.rate or None, reset=args.reset)
@@ -0,0 +1,264 @@
+import sys
+import os
+import time
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+from database.connection import get_session
+from database.write import frame_to_rows, write_price_rows, notify_bars
+from monitoring.metrics import registry
+from monitoring.events import log_event
+
+# tell hot-cache listeners which tickers got new bars when a write commits
+NOTIFY_BARS = os.getenv('HOT_CACHE_NOTIFY', 'true').lower() in ('1', 'true', 'yes')
+
+_DONE = object()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket limiting request rate.
+
+    Parameters:
+        rate (float): Tokens added per second (None disables limiting)
+        capacity (int): Maximum burst size
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(1, int(rate or 1))
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available"""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class DatabaseWriter:
+    """Writer stage that bulk inserts rows into stock_prices on one session"""
+
+    def __init__(self, method='auto', engine=None):
+        self.method = method
+        self.session = Session(engine) if engine is not None else get_session()
+
+    def __call__(self, rows):
+        try:
+            inserted, skipped = write_price_rows(self.session, rows, method=self.method)
+            if NOTIFY_BARS and inserted:
+                notify_bars(self.session, rows)
+            self.session.commit()
+        except Exception:
+            self.session.rollback()
+            raise
+        return inserted, skipped
+
+    def close(self):
+        self.session.close()
+
+
+def null_writer(rows):
+    """Writer that stores nothing, for offline runs and benchmarks"""
+    return 0, len(rows)
+
+
+class IngestionEngine:
+    """
+    Concurrent fetch -> queue -> single writer ingestion.
+
+    Fetch workers pull tickers (or chunks of tickers, for fetchers with chunk_size > 1)
+    through a bounded thread pool under a shared token bucket, convert each frame to
+    rows and hand them to one writer thread, so network latency and database writes
+    overlap.
+
+    Parameters:
+        fetcher (Fetcher): Source of history frames
+        writer (callable): rows -> (inserted, skipped), defaults to DatabaseWriter
+        workers (int): Fetch threads
+        rate (float): Max requests per second across all workers (None = unlimited)
+        timeout (float): Per-request timeout in seconds, passed to the fetcher
+        batch_rows (int): Rows buffered by the writer before each flush
+        period (str): Lookback for tickers fetched without a start
+    """
+
+    def __init__(self, fetcher, writer=None, workers=8, rate=None, timeout=10,
+                 batch_rows=2000, period='5d', interval='1h'):
+        self.fetcher = fetcher
+        self.writer = writer
+        self.workers = workers
+        self.bucket = TokenBucket(rate)
+        self.timeout = timeout
+        self.batch_rows = batch_rows
+        self.period = period
+        self.interval = interval
+        self.lock = threading.Lock()
+
+    def _plan(self, tickers, starts):
+        """
+        Split tickers into (chunk, start) requests.
+
+        Tickers without a start get the full period; the rest are sorted by start so
+        each chunk's window (its earliest start) is close to every member's own.
+        """
+        chunk_size = max(1, getattr(self.fetcher, 'chunk_size', 1))
+        fresh = [t for t in tickers if starts.get(t) is None]
+        known = sorted((t for t in tickers if starts.get(t) is not None), key=lambda t: starts[t])
+
+        jobs = []
+        for start in range(0, len(fresh), chunk_size):
+            jobs.append((fresh[start:start + chunk_size], None))
+        for start in range(0, len(known), chunk_size):
+            chunk = known[start:start + chunk_size]
+            jobs.append((chunk, min(starts[t] for t in chunk)))
+        return jobs
+
+    def _fetch_chunk(self, chunk, start, starts, rows_queue, stats):
+        # one token per request: a chunk download, and each per-symbol retry after it
+        started = time.perf_counter()
+        try:
+            frames, errors = self.fetcher.fetch_many(chunk, period=self.period, interval=self.interval,
+                                                     timeout=self.timeout, start=start, throttle=self.bucket.acquire)
+        except Exception as e:
+            frames, errors = {}, {ticker: str(e) for ticker in chunk}
+        elapsed = time.perf_counter() - started
+        registry.observe('fetch_request_seconds', elapsed, tickers_per_request=str(len(chunk)))
+
+        for ticker, data in frames.items():
+            try:
+                # a chunk shares its earliest start, trim back to this ticker's own window
+                own_start = starts.get(ticker)
+                if own_start is not None and own_start != start and not data.empty:
+                    data = data[data.index >= own_start]
+                rows = frame_to_rows(ticker, data)
+            except Exception as e:
+                errors[ticker] = str(e)
+                continue
+
+            # counters are shared by the fetch threads, rows go out through the queue
+            with self.lock:
+                if not rows:
+                    stats['empty'].append(ticker)
+                else:
+                    stats['fetched'] += len(rows)
+            registry.inc('rows_fetched_total', len(rows))
+            log_event('fetch', ticker=ticker, rows=len(rows), request_seconds=round(elapsed, 4),
+                      chunk=len(chunk), start=start)
+            if rows:
+                rows_queue.put((ticker, rows))
+
+        registry.inc('fetch_requests_total')
+        registry.inc('fetch_errors_total', len(errors))
+        for ticker, error in errors.items():
+            log_event('fetch_error', ticker=ticker, error=error, request_seconds=round(elapsed, 4))
+
+        with self.lock:
+            stats['fetch_seconds'] += elapsed
+            stats['requests'] += 1
+            stats['errors'].update(errors)
+
+    def _write_loop(self, rows_queue, stats):
+        buffer = []
+        tickers = []
+
+        def flush():
+            if not buffer:
+                return
+            started = time.perf_counter()
+            inserted = skipped = 0
+            try:
+                inserted, skipped = self.writer(buffer)
+                stats['inserted'] += inserted
+                stats['skipped'] += skipped
+            except Exception as e:
+                with self.lock:
+                    for ticker in tickers:
+                        stats['errors'][ticker] = f"write failed: {e}"
+                log_event('write_error', rows=len(buffer), tickers=len(tickers), error=str(e))
+            elapsed = time.perf_counter() - started
+            stats['write_seconds'] += elapsed
+            registry.observe('db_write_seconds', elapsed)
+            registry.inc('rows_inserted_total', inserted)
+            registry.inc('rows_skipped_total', skipped)
+            log_event('write', rows=len(buffer), tickers=len(tickers), inserted=inserted,
+                      skipped=skipped, seconds=round(elapsed, 4))
+            buffer.clear()
+            tickers.clear()
+
+        while True:
+            item = rows_queue.get()
+            if item is _DONE:
+                flush()
+                return
+            ticker, rows = item
+            buffer.extend(rows)
+            tickers.append(ticker)
+            if len(buffer) >= self.batch_rows:
+                flush()
+
+    def run(self, tickers, starts=None):
+        """
+        Ingest every ticker once.
+
+        Parameters:
+            tickers (list[str]): Symbols to fetch
+            starts (dict): ticker -> fetch window start (see watermarks.fetch_starts);
+                           tickers missing or None are fetched over the full period
+
+        Returns:
+            dict: Counts (fetched/inserted/skipped), per-ticker errors, empty tickers
+                  and stage timings
+        """
+
+        stats = {
+            'tickers': len(tickers), 'requests': 0,
+            'fetched': 0, 'inserted': 0, 'skipped': 0,
+            'errors': {}, 'empty': [],
+            'fetch_seconds': 0.0, 'write_seconds': 0.0, 'wall_seconds': 0.0,
+        }
+        own_writer = self.writer is None
+        if own_writer:
+            self.writer = DatabaseWriter()
+
+        # bounded so slow writes apply back-pressure to the fetchers
+        rows_queue = queue.Queue(maxsize=self.workers * 4)
+        writer_thread = threading.Thread(target=self._write_loop, args=(rows_queue, stats), daemon=True)
+
+        started = time.perf_counter()
+        writer_thread.start()
+        try:
+            starts = starts or {}
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(self._fetch_chunk, chunk, start, starts, rows_queue, stats): chunk
+                           for chunk, start in self._plan(tickers, starts)}
+            # anything _fetch_chunk didn't catch itself would otherwise vanish with the future
+            for future, chunk in futures.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    with self.lock:
+                        for ticker in chunk:
+                            stats['errors'].setdefault(ticker, f"fetch failed: {e}")
+        finally:
+            rows_queue.put(_DONE)
+            writer_thread.join()
+            if own_writer:
+                self.writer.close()
+                self.writer = None
+
+        stats['wall_seconds'] = time.perf_counter() - started
+        return stats
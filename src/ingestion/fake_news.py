@@ -0,0 +1,155 @@
+import time
+import zlib
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+WORDS = ('shares', 'rallied', 'fell', 'earnings', 'guidance', 'analysts', 'revenue', 'quarter', 'beat',
+         'missed', 'outlook', 'investors', 'strong', 'weak', 'growth', 'margin', 'demand', 'record')
+
+
+class FakeNewsServer:
+    """
+    Local stand-in for a per-ticker RSS news source, serving canned feeds and article
+    pages over HTTP with keep-alive, for offline runs of ingestion/news.py.
+
+        with FakeNewsServer(latency=0.05) as server:
+            ingest_news(['AAPL', 'MSFT'], feed_url=server.feed_url, known_urls=set(), writer=null_writer)
+
+    Feeds are /rss/<TICKER> and articles /article/<id>; both are deterministic for a
+    ticker and seed. A share of each feed links to "syndicated" articles that appear
+    in several tickers' feeds, so URL dedup has something to do.
+
+    Parameters:
+        items_per_feed (int): Items in each feed
+        syndicated_rate (float): Probability an item is one of a small shared pool
+        latency (float): Seconds added to every response
+        paragraphs (int): Paragraphs per article page
+        seed (int): Seed for the generated content
+        port (int): 0 picks a free port
+    """
+
+    def __init__(self, items_per_feed=20, syndicated_rate=0.2, latency=0.0, paragraphs=8, seed=0,
+                 host='127.0.0.1', port=0):
+        self.items_per_feed = items_per_feed
+        self.syndicated_rate = syndicated_rate
+        self.latency = latency
+        self.paragraphs = paragraphs
+        self.seed = seed
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def feed_url(self):
+        """Template for NewsIngester(feed_url=...)"""
+        return self.base_url + "/rss/{ticker}"
+
+    def feed_items(self, ticker):
+        """(article id, title, published_at) for a ticker's feed"""
+        rng = random.Random(zlib.crc32(ticker.encode()) + self.seed)
+        now = datetime(2024, 1, 2, 16, 0)
+        items = []
+        for i in range(self.items_per_feed):
+            if rng.random() < self.syndicated_rate:
+                article_id = f"wire-{rng.randrange(max(1, self.items_per_feed))}"
+            else:
+                article_id = f"{ticker.lower()}-{i}"
+            title = f"{ticker} {' '.join(rng.choice(WORDS) for _ in range(6))}"
+            items.append((article_id, title, now - timedelta(minutes=37 * i)))
+        return items
+
+    def feed(self, ticker):
+        entries = []
+        for article_id, title, published in self.feed_items(ticker):
+            entries.append(
+                "<item>"
+                f"<title>{escape(title)}</title>"
+                f"<link>{self.base_url}/article/{article_id}</link>"
+                f"<pubDate>{format_datetime(published.replace(tzinfo=timezone.utc))}</pubDate>"
+                f"<description>{escape(title)}.</description>"
+                "<source>Stand-in Wire</source>"
+                "</item>"
+            )
+        return ('<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+                f"<title>{escape(ticker)} headlines</title>{''.join(entries)}</channel></rss>").encode()
+
+    def article(self, article_id):
+        rng = random.Random(zlib.crc32(article_id.encode()) + self.seed)
+        body = ''.join(
+            f"<p>{' '.join(rng.choice(WORDS) for _ in range(40))}.</p>" for _ in range(self.paragraphs)
+        )
+        return (f"<html><head><title>{escape(article_id)}</title><script>var x = 1;</script></head>"
+                f"<body><nav>Home | Markets</nav><article><h1>{escape(article_id)}</h1>{body}</article>"
+                "<footer>Stand-in Wire</footer></body></html>").encode()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # keep-alive, so client connection pooling is exercised
+
+            def do_GET(self):
+                with server.lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                path = self.path.split('?')[0]
+                if path.startswith('/rss/'):
+                    body, content_type = server.feed(path[len('/rss/'):]), 'application/rss+xml'
+                elif path.startswith('/article/'):
+                    body, content_type = server.article(path[len('/article/'):]), 'text/html'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name='fake-news-http', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve canned news feeds and pages")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeNewsServer(latency=args.latency, port=args.port).start()
+    print(f"Serving feeds at {server.feed_url} (Ctrl+c to stop)")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
@@ -1,11 +1,14 @@
-import yfinance as yf
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from database.connection import get_session
-from database.models import StockPrice
 from ingestion.ticker_loader import get_sp500_tickers
+from datetime import datetime, timedelta
+from ingestion.fetchers import YFinanceFetcher, BatchYFinanceFetcher, period_to_days
+from ingestion.engine import IngestionEngine, DatabaseWriter
+from ingestion.watermarks import load_watermarks, fetch_starts
+from database.partitions import ensure_partitions
+from monitoring.events import log_event
 
 # to calculate metrics
 import logging
@@ -16,67 +19,70 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
-def fetch_stock_data():
-    #get and store stock data
-    session = get_session()
-    stocks = get_sp500_tickers()
-    #print(f"Fetching data for {len(stocks)} stocks...")
-
-    inserted = 0
-    total_errors = 0
-
-    for ticker in stocks:
-
-        try:
-            stock = yf.Ticker(ticker)
-            data = stock.history(period='5d', interval='1h') #get 5 day with hourly
+# fetch concurrency, overridable from .env
+INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', '8'))
+INGEST_RATE = float(os.getenv('INGEST_RATE', '10'))  # requests per second
+INGEST_TIMEOUT = float(os.getenv('INGEST_TIMEOUT', '10'))
+INGEST_MODE = os.getenv('INGEST_MODE', 'batch')  # 'batch' (yf.download chunks) or 'single'
+INGEST_CHUNK_SIZE = int(os.getenv('INGEST_CHUNK_SIZE', '50'))
+INGEST_INITIAL_PERIOD = os.getenv('INGEST_INITIAL_PERIOD', '60d')  # tickers with no stored bars
 
-            #inserted += 1
-            logging.info(f"Success: {ticker} - {inserted} records")
+def make_fetcher(mode=INGEST_MODE, chunk_size=INGEST_CHUNK_SIZE):
+    """Yahoo fetcher for the configured ingestion mode"""
+    if mode == 'batch':
+        return BatchYFinanceFetcher(chunk_size=chunk_size)
+    if mode == 'single':
+        return YFinanceFetcher()
+    raise ValueError(f"Unknown ingestion mode: {mode}")
 
-            if data.empty:
-                print(f"No data returned for {ticker}")
-                continue
-
-            print(f"Got {len(data)} records for {ticker}")
+def fetch_stock_data(write_method='auto', workers=INGEST_WORKERS, rate=INGEST_RATE,
+                     timeout=INGEST_TIMEOUT, fetcher=None, writer=None, incremental=True, tickers=None):
+    #get and store stock data
+    stocks = tickers or get_sp500_tickers()
+    print(f"Fetching data for {len(stocks)} stocks with {workers} workers...")
 
-            for timestamp, row in data.iterrows():
-                #check if already existed
-                existing = session.query(StockPrice).filter_by(
-                    ticker=ticker,
-                    timestamp=timestamp.to_pydatetime()
-                ).first()
-                #add if not there
-                if not existing:
-                    #create new stock record
-                    stock_price = StockPrice(
-                        ticker=ticker,
-                        timestamp=timestamp.to_pydatetime(),#converting pandas timestamp
-                        open=round(float(row['Open']),3),#convert numpy float to python 
-                        high=round(float(row['High']),3),
-                        low=round(float(row['Low']),3),
-                        close=round(float(row['Close']),3),
-                        volume=int(row['Volume'])
-                    )
+    #partitioned layout: make sure every month the new bars can land in exists
+    if writer is None:
+        ensure_partitions(start=datetime.utcnow() - timedelta(days=period_to_days(INGEST_INITIAL_PERIOD)))
 
-                    session.add(stock_price)
-                    inserted += 1
+    #only ask for bars after what's already stored (plus a small overlap)
+    starts = None
+    if incremental:
+        watermarks = load_watermarks(stocks)
+        starts = fetch_starts(stocks, watermarks)
+        print(f"{len(watermarks)} tickers have stored bars, {len(stocks) - len(watermarks)} get the initial {INGEST_INITIAL_PERIOD}")
 
-                    session.commit()
-                    #print("Data saved to database!")
-            print("Successfully inserted into database")
+    engine = IngestionEngine(
+        fetcher or make_fetcher(),
+        writer=writer or DatabaseWriter(method=write_method),
+        workers=workers,
+        rate=rate,
+        timeout=timeout,
+        period=INGEST_INITIAL_PERIOD if incremental else '5d', #get 5 day with hourly
+        interval='1h'
+    )
+    try:
+        stats = engine.run(stocks, starts=starts)
+    finally:
+        if writer is None:
+            engine.writer.close()
 
-        except Exception as e:
-            print(f"Error: {e}")
-            total_errors += 1
-            logging.error(f"Failed: {ticker} - {e}")
-            session.rollback()
+    for ticker in stats['empty']:
+        print(f"No data returned for {ticker}")
+    for ticker, error in stats['errors'].items():
+        print(f"Error: {ticker} - {error}")
+        logging.error(f"Failed: {ticker} - {error}")
 
-    total_inserted = len(stocks) - total_errors
+    total_errors = len(stats['errors'])
     success_rate = (len(stocks) - total_errors) / len(stocks) * 100
-    logging.info(f"Pipeline Completed - Total: {total_inserted}, Errors: {total_errors}, Success Rate: {success_rate}%")
-    print(f"Total inserted: {total_inserted}, \nErrors: {total_errors}, \nSuccess Rate: {success_rate:.1f}%")
-    session.close()
+    log_event('ingest_summary', tickers=len(stocks), requests=stats['requests'], fetched=stats['fetched'],
+              inserted=stats['inserted'], skipped=stats['skipped'], errors=total_errors,
+              empty=len(stats['empty']), fetch_seconds=round(stats['fetch_seconds'], 3),
+              write_seconds=round(stats['write_seconds'], 3), wall_seconds=round(stats['wall_seconds'], 3))
+    logging.info(f"Pipeline Completed - Fetched: {stats['fetched']}, Inserted: {stats['inserted']}, Skipped: {stats['skipped']}, Errors: {total_errors}, Success Rate: {success_rate}%, Wall: {stats['wall_seconds']:.1f}s")
+    print(f"Total inserted: {stats['inserted']}, \nSkipped: {stats['skipped']}, \nErrors: {total_errors}, \nSuccess Rate: {success_rate:.1f}%, \nTook: {stats['wall_seconds']:.1f}s")
+
+    return stats
     
 if __name__ == "__main__":
     fetch_stock_data()
\ No newline at end of file
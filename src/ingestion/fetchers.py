@@ -0,0 +1,321 @@
+import time
+import random
+import zlib
+import threading
+from abc import ABC, abstractmethod
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+PERIOD_DAYS = {'d': 1, 'wk': 7, 'mo': 30, 'y': 365}
+
+
+def period_to_days(period):
+    """Convert a yfinance period string ('5d', '1mo', '1y') to calendar days"""
+    for suffix, days in sorted(PERIOD_DAYS.items(), key=lambda kv: -len(kv[0])):
+        if period.endswith(suffix):
+            return int(period[:-len(suffix)]) * days
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def window_kwargs(period, start, end=None):
+    """yfinance keyword arguments for either a start (and optional end) time or a lookback period"""
+    if start is not None:
+        return {'start': start} if end is None else {'start': start, 'end': end}
+    return {'period': period}
+
+
+class Fetcher(ABC):
+    """
+    Source of OHLCV history for one ticker.
+
+    Implementations return a frame indexed by timestamp with Open/High/Low/Close/Volume
+    columns, the same shape as yf.Ticker(...).history(). When start is given it
+    takes precedence over period, as in yfinance.
+    """
+
+    chunk_size = 1
+
+    @abstractmethod
+    def fetch(self, ticker, period='5d', interval='1h', timeout=None, start=None, end=None):
+        """History frame for one ticker"""
+
+    def fetch_many(self, tickers, period='5d', interval='1h', timeout=None, start=None, end=None, throttle=None):
+        """
+        Fetch several tickers, one request each.
+
+        Parameters:
+            throttle (callable): Called before every request, e.g. a rate limiter's acquire
+
+        Returns:
+            (dict, dict): ticker -> frame for successes, ticker -> error message for failures
+        """
+        frames = {}
+        errors = {}
+        for ticker in tickers:
+            if throttle is not None:
+                throttle()
+            try:
+                frames[ticker] = self.fetch(ticker, period=period, interval=interval, timeout=timeout,
+                                            start=start, end=end)
+            except Exception as e:
+                errors[ticker] = str(e)
+        return frames, errors
+
+
+def split_download(wide, tickers):
+    """
+    Split a multi-symbol download into per-ticker frames.
+
+    Parameters:
+        wide (pd.DataFrame): yf.download(..., group_by='ticker') output, columns are
+                             (ticker, field) or plain fields for a single ticker
+        tickers (list[str]): Symbols that were requested
+
+    Returns:
+        dict: ticker -> frame with Open/High/Low/Close/Volume, only for tickers that
+              came back with at least one bar
+    """
+
+    frames = {}
+    if wide is None or wide.empty:
+        return frames
+
+    if not isinstance(wide.columns, pd.MultiIndex):
+        if len(tickers) == 1:
+            wide = pd.concat({tickers[0]: wide}, axis=1)
+        else:
+            return frames
+
+    returned = set(wide.columns.get_level_values(0))
+    for ticker in tickers:
+        if ticker not in returned:
+            continue
+        # other symbols' trading hours leave all-NaN rows in this block
+        block = wide[ticker].dropna(how='all')
+        if not block.empty:
+            frames[ticker] = block
+
+    return frames
+
+
+class ChunkedFetcher(Fetcher):
+    """
+    Fetcher that requests a whole chunk of tickers in one multi-symbol download.
+
+    Subclasses implement download(); symbols missing from the chunk response (or the
+    whole chunk if the download fails) are retried one by one through fetch(), each
+    retry passing through `throttle` like the download itself.
+    """
+
+    chunk_size = 50
+
+    @abstractmethod
+    def download(self, tickers, period='5d', interval='1h', timeout=None, start=None, end=None):
+        """Wide multi-symbol frame in yf.download(..., group_by='ticker') layout"""
+
+    def fetch_many(self, tickers, period='5d', interval='1h', timeout=None, start=None, end=None, throttle=None):
+        if throttle is not None:
+            throttle()
+        try:
+            wide = self.download(tickers, period=period, interval=interval, timeout=timeout, start=start, end=end)
+            frames = split_download(wide, tickers)
+        except Exception:
+            frames = {}
+
+        missing = [t for t in tickers if t not in frames]
+        retried, errors = Fetcher.fetch_many(self, missing, period=period, interval=interval,
+                                             timeout=timeout, start=start, end=end, throttle=throttle)
+        frames.update(retried)
+        return frames, errors
+
+
+class YFinanceFetcher(Fetcher):
+    """Fetch history from Yahoo through yfinance"""
+
+    # yf.Ticker unless replaced, e.g. by FakeTicker for offline runs
+    ticker_factory = None
+
+    def __init__(self, ticker_factory=None):
+        self.ticker_factory = ticker_factory
+
+    def fetch(self, ticker, period='5d', interval='1h', timeout=None, start=None, end=None):
+        stock = (self.ticker_factory or yf.Ticker)(ticker)
+        return stock.history(interval=interval, timeout=timeout or 10, **window_kwargs(period, start, end))
+
+
+class BatchYFinanceFetcher(ChunkedFetcher, YFinanceFetcher):
+    """
+    Fetch chunks of tickers with a single yf.download call.
+
+    yf.download keeps each call's results in yfinance module globals and resets them
+    on entry, so concurrent calls overwrite each other; downloads are serialized
+    across all instances (each one already fetches its symbols in parallel).
+    """
+
+    download_lock = threading.Lock()
+
+    def __init__(self, chunk_size=50):
+        self.chunk_size = chunk_size
+
+    def download(self, tickers, period='5d', interval='1h', timeout=None, start=None, end=None):
+        with self.download_lock:
+            return yf.download(
+                tickers,
+                interval=interval,
+                group_by='ticker',
+                auto_adjust=True,  # same prices as Ticker.history()
+                progress=False,
+                timeout=timeout or 10,
+                **window_kwargs(period, start, end)
+            )
+
+
+# synthetic walks start here so a bar's price doesn't depend on the requested window
+SYNTHETIC_EPOCH = pd.Timestamp('2020-01-01', tz='America/New_York')
+
+
+def synthetic_history(ticker, period='5d', interval='1h', start=None, end=None, seed=0):
+    """
+    Deterministic random-walk OHLCV bars for a ticker.
+
+    Bars follow the yfinance hourly layout: weekdays, 09:30 to 15:30 New York time.
+    The walk is anchored at SYNTHETIC_EPOCH, so overlapping windows agree on prices.
+
+    Parameters:
+        ticker (str): Symbol, also used to seed the walk
+        period (str): yfinance style period, ignored when start is given
+        interval (str): Only '1h' and '1d' are generated
+        start (datetime): First timestamp to return
+        end (pd.Timestamp): Last calendar day to generate (default today), in New York time
+        seed (int): Extra seed so different runs can differ
+
+    Returns:
+        pd.DataFrame: Frame shaped like yf.Ticker(...).history()
+    """
+
+    end = pd.Timestamp(end or pd.Timestamp.now(tz='America/New_York'))
+    end = end.tz_localize('America/New_York') if end.tzinfo is None else end.tz_convert('America/New_York')
+    end = end.normalize()
+    days = pd.bdate_range(start=SYNTHETIC_EPOCH, end=end)
+
+    if interval == '1h':
+        offsets = pd.to_timedelta([9.5 + h for h in range(7)], unit='h')
+        index = days.repeat(len(offsets)) + pd.TimedeltaIndex(np.tile(offsets.values, len(days)))
+    elif interval == '1d':
+        index = pd.DatetimeIndex(days)
+    else:
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    rng = np.random.default_rng(zlib.crc32(ticker.encode()) + seed)
+    n = len(index)
+    start_price = 20 + (zlib.crc32(ticker.encode()) % 480)
+
+    close = start_price * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    open_ = np.concatenate([[start_price], close[:-1]])
+    spread = np.abs(rng.normal(0, 0.002, n)) * close
+    high = np.maximum(open_, close) + spread
+    low = np.minimum(open_, close) - spread
+    volume = rng.lognormal(13, 0.5, n).astype('int64')
+
+    frame = pd.DataFrame({
+        'Open': open_,
+        'High': high,
+        'Low': low,
+        'Close': close,
+        'Volume': volume,
+    }, index=index.rename('Datetime'))
+
+    if start is None:
+        # 'Nd' periods count trading days, longer ones calendar time
+        lookback = period_to_days(period)
+        if not period.endswith('d'):
+            lookback = lookback * 5 // 7
+        start = days[-min(len(days), max(1, lookback))]
+    return frame[frame.index >= pd.Timestamp(start)]
+
+
+class FakeFetcher(Fetcher):
+    """
+    Offline stand-in for YFinanceFetcher with injected latency and failures.
+
+    Parameters:
+        latency (float): Mean seconds per request
+        jitter (float): Uniform +/- seconds added to latency
+        error_rate (float): Probability a request raises
+        seed (int): Seed for the synthetic bars and the failure draws
+    """
+
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.seed = seed
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def _delay(self, timeout):
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Request timed out after {timeout}s")
+        time.sleep(delay)
+
+    def fetch(self, ticker, period='5d', interval='1h', timeout=None, start=None, end=None):
+        self.calls += 1
+        self._delay(timeout)
+        if self._random.random() < self.error_rate:
+            raise ConnectionError(f"Injected failure for {ticker}")
+        return synthetic_history(ticker, period=period, interval=interval, start=start, end=end, seed=self.seed)
+
+
+class FakeBatchFetcher(ChunkedFetcher, FakeFetcher):
+    """
+    FakeFetcher that answers whole chunks with a wide (ticker, field) frame.
+
+    Parameters:
+        chunk_size (int): Tickers per download
+        missing_rate (float): Probability a symbol is left out of a chunk response
+        (other parameters as FakeFetcher)
+    """
+
+    def __init__(self, chunk_size=50, missing_rate=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.chunk_size = chunk_size
+        self.missing_rate = missing_rate
+
+    def download(self, tickers, period='5d', interval='1h', timeout=None, start=None, end=None):
+        self.calls += 1
+        self._delay(timeout)
+        if self._random.random() < self.error_rate:
+            raise ConnectionError(f"Injected failure for chunk of {len(tickers)}")
+        blocks = {
+            ticker: synthetic_history(ticker, period=period, interval=interval, start=start, end=end, seed=self.seed)
+            for ticker in tickers
+            if self._random.random() >= self.missing_rate
+        }
+        if not blocks:
+            return pd.DataFrame()
+        return pd.concat(blocks, axis=1)
+
+
+class FakeTicker:
+    """
+    Drop-in for yf.Ticker backed by synthetic_history, with FakeFetcher's latency and
+    failure injection.
+
+        YFinanceFetcher(ticker_factory=FakeTicker.factory(latency=0.1, error_rate=0.01))
+    """
+
+    def __init__(self, ticker, source=None):
+        self.ticker = ticker
+        self.source = source or FakeFetcher()
+
+    @classmethod
+    def factory(cls, **kwargs):
+        """Ticker constructor sharing one FakeFetcher (and its random state)"""
+        source = FakeFetcher(**kwargs)
+        return lambda ticker: cls(ticker, source)
+
+    def history(self, period='1mo', interval='1d', start=None, end=None, timeout=10, **kwargs):
+        return self.source.fetch(self.ticker, period=period, interval=interval, timeout=timeout, start=start, end=end)
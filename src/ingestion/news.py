@@ -0,0 +1,289 @@
+import sys
+import os
+import time
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+import multiprocessing
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from lxml import etree, html
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ingestion.engine import TokenBucket
+from ingestion.ticker_loader import get_sp500_tickers
+from database.connection import session_scope
+from database.read import load_news_urls
+from database.write import write_news_articles
+from monitoring.metrics import registry
+from monitoring.events import log_event
+
+# per-ticker RSS feed, overridable from .env (e.g. pointed at the stand-in server in fake_news.py)
+NEWS_FEED_URL = os.getenv('NEWS_FEED_URL', 'https://feeds.finance.yahoo.com/rss/2.0/headline?s={ticker}&region=US&lang=en-US')
+NEWS_WORKERS = int(os.getenv('NEWS_WORKERS', '16'))  # concurrent HTTP requests
+NEWS_PARSE_WORKERS = int(os.getenv('NEWS_PARSE_WORKERS', '0')) or None  # None = CPU count
+NEWS_RATE = float(os.getenv('NEWS_RATE', '20'))  # requests per second
+NEWS_TIMEOUT = float(os.getenv('NEWS_TIMEOUT', '10'))
+NEWS_FETCH_PAGES = os.getenv('NEWS_FETCH_PAGES', 'true').lower() in ('1', 'true', 'yes')
+
+USER_AGENT = 'Mozilla/5.0 (compatible; StockStream-Pipeline news ingester)'
+
+# news_article column sizes
+TITLE_LENGTH = 500
+SOURCE_LENGTH = 100
+
+
+def make_http_session(pool_size=NEWS_WORKERS, retries=2):
+    """
+    requests.Session with a keep-alive connection pool sized for `pool_size` threads.
+
+    Connections are reused across feeds and article pages on the same host; 429s and
+    5xx responses are retried with backoff.
+    """
+
+    session = requests.Session()
+    retry = Retry(total=retries, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=('GET',))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers['User-Agent'] = USER_AGENT
+    return session
+
+
+def _parse_date(value):
+    """RFC 822 pubDate (or ISO 8601) -> naive UTC datetime, None if unparseable"""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def parse_feed(content, ticker):
+    """
+    Items of an RSS 2.0 feed as news_article rows (without page content).
+
+    Returns:
+        list[dict]: ticker, title, source, published_at, url, content (the item description)
+    """
+
+    parser = etree.XMLParser(recover=True, resolve_entities=False, no_network=True)
+    root = etree.fromstring(content, parser)
+    if root is None:
+        return []
+
+    items = []
+    for item in root.iter('item'):
+        url = (item.findtext('link') or '').strip()
+        title = (item.findtext('title') or '').strip()
+        if not url or not title:
+            continue
+        source = (item.findtext('source') or '').strip() or urlparse(url).hostname or ''
+        items.append({
+            'ticker': ticker,
+            'title': title[:TITLE_LENGTH],
+            'source': source[:SOURCE_LENGTH],
+            'published_at': _parse_date(item.findtext('pubDate')),
+            'url': url,
+            'content': (item.findtext('description') or '').strip() or None,
+        })
+    return items
+
+
+def extract_text(page):
+    """
+    Article body text from an HTML page: the <article> paragraphs if there is one,
+    else every <p>. Runs in the parse process pool.
+    """
+
+    if not page:
+        return None
+    try:
+        doc = html.fromstring(page)
+    except (etree.ParserError, ValueError):
+        return None
+    for bad in doc.xpath('//script|//style|//nav|//footer|//aside'):
+        bad.drop_tree()
+    paragraphs = doc.xpath('//article//p') or doc.xpath('//p')
+    text = '\n\n'.join(' '.join(p.text_content().split()) for p in paragraphs)
+    return text.strip() or None
+
+
+def null_writer(rows):
+    """Writer that stores nothing, for offline runs and benchmarks"""
+    return 0, len(rows)
+
+
+def database_writer(rows):
+    with session_scope() as session:
+        return write_news_articles(session, rows)
+
+
+class NewsIngester:
+    """
+    Concurrent feed -> page -> parse -> insert news ingestion.
+
+    Stored URLs are loaded into a set before any request goes out, so feed items that
+    are already in news_article (or repeat within the run, like syndicated stories in
+    several tickers' feeds) never cost a page fetch or an insert. Feeds and pages go
+    through one pooled keep-alive session on a thread pool; page HTML is parsed with
+    lxml on a process pool so parsing doesn't hold the GIL against the fetch threads.
+
+    Parameters:
+        feed_url (str): Feed URL template with a {ticker} placeholder
+        writer (callable): rows -> (inserted, skipped), defaults to database_writer
+        known_urls (set): URLs to treat as stored; loaded from news_article when None
+        workers (int): HTTP threads (and connection pool size)
+        parse_workers (int): lxml processes (None = CPU count)
+        rate (float): Max requests per second across all threads (None = unlimited)
+        timeout (float): Per-request timeout in seconds
+        fetch_pages (bool): Fetch and parse article pages; False keeps feed descriptions
+        batch_rows (int): Articles per insert
+    """
+
+    def __init__(self, feed_url=NEWS_FEED_URL, writer=None, known_urls=None, workers=NEWS_WORKERS,
+                 parse_workers=NEWS_PARSE_WORKERS, rate=NEWS_RATE, timeout=NEWS_TIMEOUT,
+                 fetch_pages=NEWS_FETCH_PAGES, batch_rows=500):
+        self.feed_url = feed_url
+        self.writer = writer or database_writer
+        self.known_urls = known_urls
+        self.workers = workers
+        self.parse_workers = parse_workers
+        self.bucket = TokenBucket(rate)
+        self.timeout = timeout
+        self.fetch_pages = fetch_pages
+        self.batch_rows = batch_rows
+        self.lock = threading.Lock()
+
+    def _get(self, http, url):
+        self.bucket.acquire()
+        with registry.timer('news_request_seconds'):
+            response = http.get(url, timeout=self.timeout)
+        registry.inc('news_requests_total')
+        response.raise_for_status()
+        return response.content
+
+    def _fetch_feed(self, http, ticker, seen, stats):
+        items = parse_feed(self._get(http, self.feed_url.format(ticker=ticker)), ticker)
+        fresh = []
+        with self.lock:
+            stats['feed_items'] += len(items)
+            for item in items:
+                if item['url'] in seen:
+                    stats['duplicates'] += 1
+                    continue
+                seen.add(item['url'])
+                fresh.append(item)
+        return fresh
+
+    def _fetch_page(self, http, item):
+        try:
+            return item, self._get(http, item['url'])
+        except requests.RequestException as e:
+            return item, e
+
+    def run(self, tickers):
+        """
+        Ingest the current feed of every ticker once.
+
+        Returns:
+            dict: Counts (feed items, duplicates, pages, inserted/skipped), per-ticker
+                  feed errors and timings
+        """
+
+        stats = {
+            'tickers': len(tickers), 'feed_items': 0, 'duplicates': 0, 'pages': 0, 'page_errors': 0,
+            'inserted': 0, 'skipped': 0, 'errors': {}, 'wall_seconds': 0.0,
+        }
+        started = time.perf_counter()
+
+        # dedupe set first: no request or insert is spent on a stored URL
+        seen = set(self.known_urls) if self.known_urls is not None else load_news_urls()
+        stats['known_urls'] = len(seen)
+
+        http = make_http_session(self.workers)
+        items = []
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                feeds = {pool.submit(self._fetch_feed, http, ticker, seen, stats): ticker for ticker in tickers}
+                for future in as_completed(feeds):
+                    try:
+                        items.extend(future.result())
+                    except Exception as e:
+                        stats['errors'][feeds[future]] = str(e)
+                        log_event('news_feed_error', ticker=feeds[future], error=str(e))
+
+                if self.fetch_pages and items:
+                    # pages stream from the fetch threads straight into the parse processes;
+                    # spawned, since forking with requests in flight on other threads is unsafe
+                    context = multiprocessing.get_context('spawn')
+                    with ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=context) as parsers:
+                        parsed = {}
+                        for future in as_completed([pool.submit(self._fetch_page, http, item) for item in items]):
+                            item, page = future.result()
+                            if isinstance(page, Exception):
+                                stats['page_errors'] += 1
+                                continue
+                            stats['pages'] += 1
+                            parsed[parsers.submit(extract_text, page)] = item
+                        for future in as_completed(parsed):
+                            try:
+                                text = future.result()
+                            except Exception:
+                                text = None
+                            if text:
+                                parsed[future]['content'] = text
+        finally:
+            http.close()
+
+        now = datetime.utcnow()
+        for item in items:
+            item['published_at'] = item['published_at'] or now
+            item['created_at'] = now
+        for start in range(0, len(items), self.batch_rows):
+            inserted, skipped = self.writer(items[start:start + self.batch_rows])
+            stats['inserted'] += inserted
+            stats['skipped'] += skipped
+
+        stats['wall_seconds'] = time.perf_counter() - started
+        registry.inc('news_articles_inserted_total', stats['inserted'])
+        registry.inc('news_duplicates_total', stats['duplicates'])
+        return stats
+
+
+def ingest_news(tickers=None, **kwargs):
+    """Run NewsIngester over the ticker list (keyword arguments as NewsIngester)"""
+
+    tickers = tickers or get_sp500_tickers()
+    print(f"Fetching news feeds for {len(tickers)} tickers...")
+    stats = NewsIngester(**kwargs).run(tickers)
+
+    for ticker, error in stats['errors'].items():
+        print(f"News feed error: {ticker} - {error}")
+    log_event('news_summary', **{k: v for k, v in stats.items() if k != 'errors'}, feed_errors=len(stats['errors']))
+    print(f"News: {stats['feed_items']} feed items, {stats['duplicates']} already known, "
+          f"{stats['pages']} pages fetched, {stats['inserted']} inserted in {stats['wall_seconds']:.1f}s")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest news articles from per-ticker RSS feeds")
+    parser.add_argument('--tickers', nargs='+', default=None)
+    parser.add_argument('--feed-url', default=NEWS_FEED_URL, help="template with a {ticker} placeholder")
+    parser.add_argument('--no-pages', action='store_true', help="keep feed descriptions, skip article pages")
+    args = parser.parse_args()
+
+    ingest_news(args.tickers, feed_url=args.feed_url, fetch_pages=not args.no_pages)
@@ -0,0 +1,65 @@
+import sys
+import os
+from datetime import timedelta
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from database.connection import get_engine
+
+# re-fetch this much before the watermark to pick up late corrections
+OVERLAP = timedelta(hours=float(os.getenv('INGEST_OVERLAP_HOURS', '2')))
+
+
+def load_watermarks(tickers=None, engine=None):
+    """
+    Latest stored bar per ticker, in one query.
+
+    stock_prices.timestamp is a naive column written in the session time zone, so it is
+    converted back to an aware timestamp here.
+
+    Parameters:
+        tickers (list[str]): Limit to these symbols; each is then answered by a single
+                             backward probe of idx_ticker_timestamp instead of a scan
+        engine: SQLAlchemy engine (default get_engine())
+
+    Returns:
+        dict: ticker -> tz-aware datetime of the newest bar
+    """
+
+    engine = engine or get_engine()
+
+    if tickers is None:
+        query = text("""
+            SELECT ticker, max(timestamp) AT TIME ZONE current_setting('TimeZone')
+            FROM stock_prices
+            GROUP BY ticker
+        """)
+        params = {}
+    else:
+        query = text("""
+            SELECT t.ticker,
+                   (SELECT max(p.timestamp) FROM stock_prices p WHERE p.ticker = t.ticker)
+                       AT TIME ZONE current_setting('TimeZone')
+            FROM unnest(CAST(:tickers AS varchar[])) AS t(ticker)
+        """)
+        params = {'tickers': list(tickers)}
+
+    with engine.connect() as conn:
+        rows = conn.execute(query, params).fetchall()
+
+    return {ticker: watermark for ticker, watermark in rows if watermark is not None}
+
+
+def fetch_starts(tickers, watermarks, overlap=OVERLAP):
+    """
+    Start of the next fetch window for each ticker.
+
+    Returns:
+        dict: ticker -> watermark minus overlap, or None for tickers with no stored bars
+              (these get the engine's longer initial period)
+    """
+
+    return {
+        ticker: watermarks[ticker] - overlap if ticker in watermarks else None
+        for ticker in tickers
+    }
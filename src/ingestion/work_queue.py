@@ -0,0 +1,354 @@
+import sys
+import os
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+from ingestion.ticker_loader import get_sp500_tickers
+from ingestion.fetch_stock import make_fetcher, INGEST_WORKERS, INGEST_RATE, INGEST_TIMEOUT, INGEST_INITIAL_PERIOD
+from ingestion.fetchers import period_to_days
+from ingestion.engine import IngestionEngine, DatabaseWriter
+from ingestion.watermarks import load_watermarks, fetch_starts
+from database.connection import get_engine
+from database.models import IngestJob
+from database.partitions import ensure_partitions
+from monitoring.metrics import registry
+from monitoring.events import log_event
+
+# queue settings, overridable from .env
+QUEUE_BATCH = int(os.getenv('INGEST_QUEUE_BATCH', '25'))  # tickers per claim
+QUEUE_LEASE_SECONDS = float(os.getenv('INGEST_QUEUE_LEASE_SECONDS', '120'))
+QUEUE_MAX_ATTEMPTS = int(os.getenv('INGEST_QUEUE_MAX_ATTEMPTS', '3'))
+INGEST_PROCESSES = int(os.getenv('INGEST_PROCESSES', '0'))  # local queue workers per cycle (0 = single process)
+
+NOW = "(now() AT TIME ZONE 'utc')"
+
+
+def ensure_queue_table(engine=None):
+    IngestJob.__table__.create(engine or get_engine(), checkfirst=True)
+
+
+def enqueue(tickers=None, engine=None):
+    """
+    Start a new cycle: every ticker becomes a pending job with a fresh attempt count.
+
+    Jobs still leased from an earlier cycle are reset too; their lease_id changes on
+    the next claim, so the old holder's completion no longer matches.
+
+    Returns:
+        int: The new cycle number
+    """
+
+    engine = engine or get_engine()
+    tickers = list(tickers or get_sp500_tickers())
+    ensure_queue_table(engine)
+    with engine.begin() as conn:
+        cycle = conn.execute(text("SELECT coalesce(max(cycle), 0) + 1 FROM ingest_jobs")).scalar()
+        conn.execute(text(f"""
+            INSERT INTO ingest_jobs (ticker, cycle, status, attempts, updated_at)
+            SELECT t, :cycle, 'pending', 0, {NOW} FROM unnest(CAST(:tickers AS varchar[])) AS t
+            ON CONFLICT (ticker) DO UPDATE SET
+                cycle = excluded.cycle, status = 'pending', attempts = 0, lease_id = NULL,
+                leased_by = NULL, lease_expires_at = NULL, last_error = NULL,
+                updated_at = excluded.updated_at
+        """), {'cycle': cycle, 'tickers': tickers})
+    log_event('queue_enqueue', cycle=cycle, tickers=len(tickers))
+    return cycle
+
+
+def claim(worker, limit=QUEUE_BATCH, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS, engine=None):
+    """
+    Lease up to `limit` pending (or expired) jobs.
+
+    Only the latest cycle is claimable. FOR UPDATE SKIP LOCKED lets concurrent workers
+    each take a different batch without waiting on one another. An expired lease is claimable like a pending job, so a
+    crashed worker's tickers are picked up once its lease runs out; jobs that used up
+    max_attempts are marked failed instead.
+
+    Returns:
+        (str, list[str]): Lease id for the batch and its tickers (empty if nothing was claimable)
+    """
+
+    engine = engine or get_engine()
+    lease = str(uuid.uuid4())
+    with engine.begin() as conn:
+        conn.execute(text(f"""
+            UPDATE ingest_jobs SET status = 'failed', lease_id = NULL, updated_at = {NOW},
+                last_error = coalesce(last_error, 'lease expired')
+            WHERE status = 'leased' AND lease_expires_at < {NOW} AND attempts >= :max_attempts
+        """), {'max_attempts': max_attempts})
+        rows = conn.execute(text(f"""
+            WITH claimable AS (
+                SELECT ticker FROM ingest_jobs
+                WHERE (status = 'pending' OR (status = 'leased' AND lease_expires_at < {NOW}))
+                  AND attempts < :max_attempts
+                  AND cycle = (SELECT max(cycle) FROM ingest_jobs)
+                ORDER BY ticker
+                LIMIT :limit
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE ingest_jobs j SET
+                status = 'leased', lease_id = :lease, leased_by = :worker, attempts = j.attempts + 1,
+                lease_expires_at = {NOW} + make_interval(secs => :lease_seconds), updated_at = {NOW}
+            FROM claimable c
+            WHERE j.ticker = c.ticker
+            RETURNING j.ticker
+        """), {'limit': limit, 'lease': lease, 'worker': worker, 'lease_seconds': lease_seconds,
+               'max_attempts': max_attempts}).fetchall()
+    tickers = sorted(row[0] for row in rows)
+    registry.inc('queue_claims_total')
+    registry.inc('queue_jobs_claimed_total', len(tickers))
+    return lease, tickers
+
+
+def renew(lease, lease_seconds=QUEUE_LEASE_SECONDS, engine=None):
+    """Push the batch's lease expiry out again; returns how many jobs are still held"""
+
+    engine = engine or get_engine()
+    with engine.begin() as conn:
+        return conn.execute(text(f"""
+            UPDATE ingest_jobs SET lease_expires_at = {NOW} + make_interval(secs => :lease_seconds)
+            WHERE lease_id = :lease AND status = 'leased'
+        """), {'lease': lease, 'lease_seconds': lease_seconds}).rowcount
+
+
+def complete(lease, done, errors, max_attempts=QUEUE_MAX_ATTEMPTS, engine=None):
+    """
+    Record a batch's outcome, fenced on the lease id.
+
+    Rows were already written with ON CONFLICT DO NOTHING, so a batch that is fetched
+    twice (lease lost mid-run and re-claimed) stores each bar once; the fence only
+    keeps the stale worker from overwriting the new holder's job state.
+
+    Parameters:
+        lease (str): Lease id from claim()
+        done (list[str]): Tickers fetched and written
+        errors (dict): ticker -> error message; retried until max_attempts
+
+    Returns:
+        int: Jobs updated (less than the batch size if the lease was lost)
+    """
+
+    engine = engine or get_engine()
+    updated = 0
+    with engine.begin() as conn:
+        if done:
+            updated += conn.execute(text(f"""
+                UPDATE ingest_jobs SET status = 'done', lease_id = NULL, lease_expires_at = NULL,
+                    last_error = NULL, updated_at = {NOW}
+                WHERE ticker = ANY(CAST(:tickers AS varchar[])) AND lease_id = :lease
+            """), {'lease': lease, 'tickers': list(done)}).rowcount
+        if errors:
+            updated += conn.execute(text(f"""
+                UPDATE ingest_jobs j SET
+                    status = CASE WHEN j.attempts >= :max_attempts THEN 'failed' ELSE 'pending' END,
+                    lease_id = NULL, lease_expires_at = NULL, last_error = e.error, updated_at = {NOW}
+                FROM unnest(CAST(:tickers AS varchar[]), CAST(:errors AS text[])) AS e(ticker, error)
+                WHERE j.ticker = e.ticker AND j.lease_id = :lease
+            """), {'lease': lease, 'tickers': list(errors), 'errors': list(errors.values()),
+                   'max_attempts': max_attempts}).rowcount
+    return updated
+
+
+def queue_status(engine=None):
+    """Job counts by status for the latest cycle, e.g. {'cycle': 4, 'done': 490, 'leased': 10}"""
+
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT max(cycle), status, count(*) FROM ingest_jobs
+            WHERE cycle = (SELECT max(cycle) FROM ingest_jobs)
+            GROUP BY status
+        """)).fetchall()
+    status = {'cycle': rows[0][0] if rows else 0}
+    status.update({row[1]: row[2] for row in rows})
+    return status
+
+
+def failed_jobs(cycle, engine=None):
+    """
+    Tickers that exhausted their attempts in a cycle.
+
+    Returns:
+        dict: ticker -> last_error, the shape fetch_stock_data reports errors in
+    """
+
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT ticker, last_error FROM ingest_jobs
+            WHERE cycle = :cycle AND status = 'failed'
+            ORDER BY ticker
+        """), {'cycle': cycle}).fetchall()
+    return {ticker: error or 'failed after retries' for ticker, error in rows}
+
+
+class LeaseHeartbeat:
+    """Background renewal of one batch's lease while the worker is fetching it"""
+
+    def __init__(self, lease, lease_seconds, engine):
+        self.lease = lease
+        self.lease_seconds = lease_seconds
+        self.engine = engine
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+
+    def _loop(self):
+        while not self.stop_event.wait(self.lease_seconds / 3):
+            try:
+                renew(self.lease, self.lease_seconds, self.engine)
+            except Exception as e:
+                log_event('queue_renew_error', lease=self.lease, error=str(e))
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join()
+
+
+def run_worker(worker=None, batch_size=QUEUE_BATCH, lease_seconds=QUEUE_LEASE_SECONDS,
+               max_attempts=QUEUE_MAX_ATTEMPTS, fetcher=None, workers=INGEST_WORKERS, rate=INGEST_RATE,
+               timeout=INGEST_TIMEOUT, follow=False, idle_seconds=1.0, engine=None):
+    """
+    Claim, fetch and complete batches until the queue is drained.
+
+    Each batch goes through the usual IngestionEngine (threads, token bucket, single
+    writer) with incremental starts from the stored watermarks. When nothing is
+    claimable but other workers still hold leases, the worker waits and retries, so
+    it takes over a crashed peer's tickers once their lease expires.
+
+    Parameters:
+        worker (str): Name recorded in leased_by (default host:pid)
+        rate (float): Requests per second for this worker; the total is workers x rate
+        follow (bool): Keep polling for new cycles instead of exiting when drained
+        engine: SQLAlchemy engine (default get_engine())
+
+    Returns:
+        dict: Worker name, batches, tickers, fetched/inserted rows, errors, lost
+              completions and first-claim/finish times
+    """
+
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    engine = engine or get_engine()
+    writer = DatabaseWriter(engine=engine)
+    stats = {'worker': worker, 'batches': 0, 'tickers': 0, 'fetched': 0, 'inserted': 0, 'errors': 0,
+             'lost': 0, 'started_at': None, 'finished_at': None}
+    try:
+        while True:
+            lease, tickers = claim(worker, batch_size, lease_seconds, max_attempts, engine)
+            if not tickers:
+                status = queue_status(engine)
+                if not follow and not status.get('pending') and not status.get('leased'):
+                    break
+                time.sleep(idle_seconds)
+                continue
+
+            stats['started_at'] = stats['started_at'] or time.time()
+            starts = fetch_starts(tickers, load_watermarks(tickers, engine))
+            ingester = IngestionEngine(fetcher or make_fetcher(), writer=writer, workers=workers, rate=rate,
+                                       timeout=timeout, period=INGEST_INITIAL_PERIOD, interval='1h')
+            with LeaseHeartbeat(lease, lease_seconds, engine):
+                result = ingester.run(tickers, starts=starts)
+
+            done = [t for t in tickers if t not in result['errors']]
+            updated = complete(lease, done, result['errors'], max_attempts, engine)
+
+            stats['batches'] += 1
+            stats['tickers'] += len(tickers)
+            stats['fetched'] += result['fetched']
+            stats['inserted'] += result['inserted']
+            stats['errors'] += len(result['errors'])
+            stats['lost'] += len(tickers) - updated
+            stats['finished_at'] = time.time()
+            log_event('queue_batch', worker=worker, lease=lease, tickers=len(tickers), fetched=result['fetched'],
+                      inserted=result['inserted'], errors=len(result['errors']), lost=len(tickers) - updated,
+                      seconds=round(result['wall_seconds'], 3))
+    finally:
+        writer.close()
+    return stats
+
+
+def _process_worker(index, kwargs):
+    # each spawned process builds its own pooled engine on first use
+    return run_worker(worker=f"{socket.gethostname()}:{os.getpid()}:{index}", **kwargs)
+
+
+def run_cycle(tickers=None, processes=INGEST_PROCESSES, **kwargs):
+    """
+    Enqueue a cycle and drain it with `processes` local worker processes.
+
+    Workers on other hosts running `work_queue.py work --follow` against the same
+    database share the cycle automatically.
+
+    Returns:
+        dict: fetched/inserted/errors totals in the shape fetch_stock_data returns,
+              plus per-worker stats
+    """
+
+    ensure_partitions(start=datetime.utcnow() - timedelta(days=period_to_days(INGEST_INITIAL_PERIOD)))
+    cycle = enqueue(tickers)
+    print(f"Ingestion cycle {cycle} queued, draining with {processes} worker processes...")
+
+    started = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        results = list(pool.map(_process_worker, range(processes), [kwargs] * processes))
+    wall = time.perf_counter() - started
+
+    errors = failed_jobs(cycle)
+    failed = len(errors)
+    stats = {
+        'cycle': cycle,
+        'fetched': sum(r['fetched'] for r in results),
+        'inserted': sum(r['inserted'] for r in results),
+        'errors': errors,
+        'wall_seconds': wall,
+        'workers': results,
+    }
+    log_event('ingest_summary', cycle=cycle, processes=processes, fetched=stats['fetched'],
+              inserted=stats['inserted'], failed=failed, wall_seconds=round(wall, 3))
+    print(f"Cycle {cycle}: {stats['inserted']} rows inserted by {processes} workers in {wall:.1f}s, {failed} tickers failed")
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sharded ingestion through the ingest_jobs work queue")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('enqueue', help="start a new cycle")
+    p.add_argument('--tickers', nargs='+', default=None)
+    p = sub.add_parser('work', help="drain the queue")
+    p.add_argument('--processes', type=int, default=1)
+    p.add_argument('--batch-size', type=int, default=QUEUE_BATCH)
+    p.add_argument('--lease-seconds', type=float, default=QUEUE_LEASE_SECONDS)
+    p.add_argument('--follow', action='store_true', help="keep polling for new cycles")
+    p = sub.add_parser('cycle', help="enqueue and drain with local processes")
+    p.add_argument('--processes', type=int, default=max(1, INGEST_PROCESSES))
+    sub.add_parser('status')
+    args = parser.parse_args()
+
+    if args.command == 'enqueue':
+        print(f"Cycle {enqueue(args.tickers)} queued")
+    elif args.command == 'work':
+        kwargs = {'batch_size': args.batch_size, 'lease_seconds': args.lease_seconds, 'follow': args.follow}
+        if args.processes == 1:
+            print(run_worker(**kwargs))
+        else:
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=args.processes, mp_context=context) as pool:
+                for result in pool.map(_process_worker, range(args.processes), [kwargs] * args.processes):
+                    print(result)
+    elif args.command == 'cycle':
+        run_cycle(processes=args.processes)
+    else:
+        print(queue_status())
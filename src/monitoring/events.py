@@ -0,0 +1,68 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from monitoring.metrics import registry
+
+EVENT_LOG = os.getenv('EVENT_LOG', os.path.join('logs', 'pipeline.jsonl'))
+
+_logger = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        event = {'ts': datetime.utcfromtimestamp(record.created).isoformat(timespec='milliseconds') + 'Z',
+                 'event': record.getMessage()}
+        event.update(getattr(record, 'fields', {}))
+        return json.dumps(event, default=str)
+
+
+def get_event_logger():
+    """Logger writing one JSON object per line to EVENT_LOG"""
+    global _logger
+    with _lock:
+        if _logger is None:
+            os.makedirs(os.path.dirname(EVENT_LOG) or '.', exist_ok=True)
+            handler = logging.FileHandler(EVENT_LOG)
+            handler.setFormatter(JsonFormatter())
+            _logger = logging.getLogger('stockstream.events')
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            _logger.addHandler(handler)
+    return _logger
+
+
+def log_event(event, **fields):
+    """Append a structured event, e.g. log_event('fetch', ticker='AAPL', seconds=0.4, rows=7)"""
+    get_event_logger().info(event, extra={'fields': fields})
+
+
+@contextmanager
+def stage(name, **fields):
+    """
+    Time a pipeline stage into the stage_seconds histogram and the event log.
+
+    The yielded dict can be filled with counts to log alongside the duration; its
+    'stage', 'status' and 'seconds' keys are overridden by the stage's own.
+    """
+
+    info = dict(fields)
+    started = time.perf_counter()
+    status = 'success'
+    try:
+        yield info
+    except Exception as e:
+        status = 'error'
+        info['error'] = str(e)
+        raise
+    finally:
+        seconds = time.perf_counter() - started
+        registry.observe('stage_seconds', seconds, stage=name)
+        registry.inc('stage_runs_total', stage=name, status=status)
+        # reserved keys last, so caller fields can't collide with them and mask the stage's own error
+        log_event('stage', **{**info, 'stage': name, 'status': status, 'seconds': round(seconds, 4)})
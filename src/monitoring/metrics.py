@@ -0,0 +1,189 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# local Prometheus endpoint (0 = off)
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# seconds; covers a fast DB write up to a slow ARIMA fit or a full ingestion cycle
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with sum and count, Prometheus style"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """
+    Thread-safe counters, gauges and histograms keyed by name and labels.
+
+    Collectors registered with add_collector() are called at render time for values
+    that live elsewhere (e.g. connection pool statistics).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.help = {}
+        self.collectors = []
+
+    def inc(self, name, value=1, **labels):
+        with self.lock:
+            series = self.counters.setdefault(name, {})
+            series[_key(labels)] = series.get(_key(labels), 0) + value
+
+    def set(self, name, value, **labels):
+        with self.lock:
+            self.gauges.setdefault(name, {})[_key(labels)] = value
+
+    def observe(self, name, value, **labels):
+        with self.lock:
+            series = self.histograms.setdefault(name, {})
+            histogram = series.get(_key(labels))
+            if histogram is None:
+                histogram = series[_key(labels)] = Histogram()
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the block's wall time into histogram `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def add_collector(self, collector):
+        """collector() -> iterable of (name, labels dict, value) gauges"""
+        self.collectors.append(collector)
+
+    def snapshot(self):
+        """Plain dict of every metric, for JSON dumps"""
+        with self.lock:
+            out = {
+                'counters': {n: {_fmt_labels(k): v for k, v in s.items()} for n, s in self.counters.items()},
+                'gauges': {n: {_fmt_labels(k): v for k, v in s.items()} for n, s in self.gauges.items()},
+                'histograms': {n: {_fmt_labels(k): {'count': h.count, 'sum': h.sum} for k, h in s.items()}
+                               for n, s in self.histograms.items()},
+            }
+        for name, labels, value in self._collected():
+            out['gauges'].setdefault(name, {})[_fmt_labels(_key(labels))] = value
+        return out
+
+    def _collected(self):
+        samples = []
+        for collector in self.collectors:
+            try:
+                samples.extend(collector())
+            except Exception:
+                pass
+        return samples
+
+    def render(self):
+        """Prometheus text exposition format"""
+        lines = []
+
+        def header(name, kind):
+            if name in self.help:
+                lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            for name, series in sorted(self.counters.items()):
+                header(name, 'counter')
+                lines.extend(f"{name}{_fmt_labels(k)} {v}" for k, v in series.items())
+            for name, series in sorted(self.gauges.items()):
+                header(name, 'gauge')
+                lines.extend(f"{name}{_fmt_labels(k)} {v}" for k, v in series.items())
+            for name, series in sorted(self.histograms.items()):
+                header(name, 'histogram')
+                for key, h in series.items():
+                    cumulative = 0
+                    for bound, count in zip(list(h.buckets) + ['+Inf'], h.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_fmt_labels(key + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_fmt_labels(key)} {h.sum}")
+                    lines.append(f"{name}_count{_fmt_labels(key)} {h.count}")
+
+        collected = {}
+        for name, labels, value in self._collected():
+            collected.setdefault(name, []).append((_key(labels), value))
+        for name, series in sorted(collected.items()):
+            header(name, 'gauge')
+            lines.extend(f"{name}{_fmt_labels(k)} {v}" for k, v in series)
+        return "\n".join(lines) + "\n"
+
+
+def _fmt_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in key) + '}'
+
+
+registry = Registry()
+inc = registry.inc
+observe = registry.observe
+timer = registry.timer
+
+
+def pool_metrics():
+    """Connection pool gauges from database.connection, if the engine exists"""
+    from database.connection import get_pool_stats
+    stats = get_pool_stats()
+    return [(f"db_pool_{name}", {}, value) for name, value in stats.items() if isinstance(value, (int, float))]
+
+
+registry.add_collector(pool_metrics)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/'):
+            self.send_error(404)
+            return
+        body = registry.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server = None
+
+
+def start_metrics_server(port=METRICS_PORT, host='127.0.0.1'):
+    """Serve /metrics from a daemon thread; no-op when port is 0 or already started"""
+    global _server
+    if not port or _server is not None:
+        return _server
+    _server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=_server.serve_forever, name='metrics-http', daemon=True).start()
+    print(f"Metrics at http://{host}:{port}/metrics")
+    return _server
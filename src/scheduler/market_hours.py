@@ -0,0 +1,106 @@
+import os
+from datetime import datetime, time as clock_time
+import pandas as pd
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, Holiday, GoodFriday, USMartinLutherKingJr, USPresidentsDay,
+    USMemorialDay, USLaborDay, USThanksgivingDay, nearest_workday,
+)
+
+EXCHANGE_TZ = 'America/New_York'
+MARKET_OPEN = clock_time(9, 30)
+MARKET_CLOSE = clock_time(16, 0)
+EARLY_CLOSE = clock_time(13, 0)  # July 3, the day after Thanksgiving and Christmas Eve
+
+# keep polling this long after the close so the last hourly bar gets picked up
+CLOSE_GRACE_MINUTES = int(os.getenv('SCHEDULE_CLOSE_GRACE_MINUTES', '30'))
+
+
+class NYSEHolidayCalendar(AbstractHolidayCalendar):
+    """Full-day NYSE closures (early closes are MarketCalendar.is_early_close)"""
+    rules = [
+        Holiday('New Years Day', month=1, day=1, observance=nearest_workday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('Independence Day', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+
+class MarketCalendar:
+    """
+    Regular NYSE sessions: weekdays 09:30-16:00 New York time, minus exchange holidays,
+    closing at 13:00 on the early-close days.
+
+    Parameters:
+        grace_minutes (int): Minutes after the close still counted as open, so a run
+                             can collect the session's final bar
+    """
+
+    def __init__(self, grace_minutes=CLOSE_GRACE_MINUTES):
+        self.grace = pd.Timedelta(minutes=grace_minutes)
+        self._holidays = {}
+        self._early_closes = {}
+
+    def _holiday_set(self, year):
+        if year not in self._holidays:
+            days = NYSEHolidayCalendar().holidays(start=f"{year}-01-01", end=f"{year}-12-31")
+            # New Year's on a Saturday isn't observed on the prior Friday, Dec 31
+            self._holidays[year] = {d.date() for d in days if not (d.month == 12 and d.day == 31)}
+        return self._holidays[year]
+
+    def _early_close_set(self, year):
+        if year not in self._early_closes:
+            thanksgiving = USThanksgivingDay.dates(f"{year}-01-01", f"{year}-12-31")[0]
+            candidates = [pd.Timestamp(year, 7, 3), thanksgiving + pd.Timedelta(days=1), pd.Timestamp(year, 12, 24)]
+            # only when the day trades at all, e.g. not a July 3 observing Independence Day
+            self._early_closes[year] = {d.date() for d in candidates if self.is_trading_day(d)}
+        return self._early_closes[year]
+
+    def is_trading_day(self, day):
+        day = pd.Timestamp(day)
+        return day.weekday() < 5 and day.date() not in self._holiday_set(day.year)
+
+    def is_early_close(self, day):
+        day = pd.Timestamp(day)
+        return day.date() in self._early_close_set(day.year)
+
+    def session(self, day):
+        """(open, close) as aware timestamps for a trading day"""
+        day = pd.Timestamp(day)
+        if day.tzinfo is not None:
+            day = day.tz_convert(EXCHANGE_TZ).tz_localize(None)
+        close = EARLY_CLOSE if self.is_early_close(day) else MARKET_CLOSE
+        return (pd.Timestamp(datetime.combine(day.date(), MARKET_OPEN)).tz_localize(EXCHANGE_TZ),
+                pd.Timestamp(datetime.combine(day.date(), close)).tz_localize(EXCHANGE_TZ))
+
+    def is_open(self, when=None):
+        """True during a session (plus the grace period after the close)"""
+        when = _exchange_time(when)
+        if not self.is_trading_day(when.tz_localize(None)):
+            return False
+        open_, close = self.session(when.tz_localize(None))
+        return open_ <= when < close + self.grace
+
+    def next_open(self, when=None):
+        """Start of the next session at or after `when`"""
+        when = _exchange_time(when)
+        day = when.tz_localize(None).normalize()
+        for _ in range(15):
+            if self.is_trading_day(day):
+                open_, close = self.session(day)
+                if when < close + self.grace:
+                    return max(open_, when)
+            day += pd.Timedelta(days=1)
+        raise RuntimeError(f"No trading session found within 15 days of {when}")
+
+
+def _exchange_time(when):
+    when = pd.Timestamp.now(tz=EXCHANGE_TZ) if when is None else pd.Timestamp(when)
+    if when.tzinfo is None:
+        when = when.tz_localize('UTC')
+    return when.tz_convert(EXCHANGE_TZ)
@@ -0,0 +1,202 @@
+import sys
+import os
+import json
+import time
+import signal
+import logging
+import threading
+from datetime import datetime
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import session_scope
+from database.write import write_pipeline_run
+from scheduler.market_hours import MarketCalendar
+from monitoring.events import stage
+
+SHUTDOWN_TIMEOUT = float(os.getenv('SCHEDULE_SHUTDOWN_TIMEOUT', '300'))  # seconds to let running stages finish
+
+
+class Job:
+    """
+    One pipeline stage.
+
+    Parameters:
+        name (str): Stage name, also the run-history key
+        func (callable): Work to do; its return value is passed to `changed`
+        interval (float): Seconds between runs; scheduled jobs run on wall-clock
+                          multiples of it, downstream jobs no more often than it
+        after (str): Upstream job; when set, the job runs as soon as the upstream
+                     finishes with new output instead of on its own clock
+        market_hours (bool): Only run while the market is open
+        changed (callable): result -> bool, whether the run produced new input for
+                            downstream jobs (default: always)
+    """
+
+    def __init__(self, name, func, interval, after=None, market_hours=True, changed=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.after = after
+        self.market_hours = market_hours
+        self.changed = changed or (lambda result: True)
+        self.next_due = None
+        self.last_started = None
+        self.pending = False
+        self.thread = None
+
+
+class Scheduler:
+    """
+    Wall-clock aligned, market-hours aware runner for pipeline stages.
+
+    Scheduled jobs fire on multiples of their interval (a 300s job at :00, :05, ...)
+    so run time never shifts the schedule, and are skipped while the market is
+    closed. Each job runs in its own thread, so ingestion for the next slot can
+    overlap analytics for the previous one, but a job never overlaps itself: a slot
+    that arrives while it's still running is skipped. Downstream jobs start when
+    their upstream lands new data. Every run is recorded in pipeline_runs.
+
+    Parameters:
+        jobs (list[Job]): Stages; upstreams must be listed before their downstreams
+        calendar (MarketCalendar): Exchange sessions
+        record (bool): Write run history to the database
+    """
+
+    def __init__(self, jobs, calendar=None, record=True):
+        self.jobs = {job.name: job for job in jobs}
+        self.calendar = calendar or MarketCalendar()
+        self.record = record
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+
+    # ---------- timing ----------
+
+    def next_slot(self, job, now):
+        """Next wall-clock multiple of the job's interval after `now`, moved to the next
+        session when the market is closed"""
+        slot = (now // job.interval + 1) * job.interval
+        if job.market_hours:
+            open_at = self.calendar.next_open(pd.Timestamp(slot, unit='s', tz='UTC')).timestamp()
+            if open_at > slot:
+                # first aligned slot of the next session
+                slot = -(-open_at // job.interval) * job.interval
+        return slot
+
+    # ---------- running ----------
+
+    def _start(self, job, trigger, scheduled_for):
+        with self.lock:
+            busy = job.thread is not None and job.thread.is_alive()
+            if busy:
+                job.pending = job.pending or trigger == 'upstream'
+            else:
+                job.pending = False
+                job.last_started = time.time()
+                job.thread = threading.Thread(target=self._run, args=(job, trigger, scheduled_for),
+                                              name=f"stage-{job.name}", daemon=True)
+                job.thread.start()
+
+        if busy and trigger == 'schedule':
+            print(f"[{job.name}] skipped slot {_fmt(scheduled_for)}: previous run still in progress")
+            self._record(job, trigger, scheduled_for, None, None, 'skipped',
+                         {'reason': 'previous run still in progress'})
+
+    def _run(self, job, trigger, scheduled_for):
+        started = time.time()
+        print(f"[{job.name}] started ({trigger}) at {_fmt(started)}")
+        status, detail, result = 'success', None, None
+        try:
+            with stage(job.name, trigger=trigger):
+                result = job.func()
+            detail = _summarize(result)
+        except Exception as e:
+            status, detail = 'error', {'error': str(e)}
+            logging.exception(f"Stage {job.name} failed")
+        finished = time.time()
+        print(f"[{job.name}] {status} in {finished - started:.1f}s")
+        self._record(job, trigger, scheduled_for, started, finished, status, detail)
+
+        if status == 'success' and not self.stop_event.is_set() and job.changed(result):
+            for downstream in self.jobs.values():
+                if downstream.after == job.name:
+                    with self.lock:
+                        downstream.pending = True
+
+    def _record(self, job, trigger, scheduled_for, started, finished, status, detail):
+        if not self.record:
+            return
+        row = {
+            'job': job.name,
+            'trigger': trigger,
+            'scheduled_for': _utc(scheduled_for),
+            'started_at': _utc(started),
+            'finished_at': _utc(finished),
+            'duration_seconds': finished - started if started is not None and finished is not None else None,
+            'status': status,
+            'detail': json.dumps(detail, default=str) if detail else None,
+        }
+        try:
+            with session_scope() as session:
+                write_pipeline_run(session, row)
+        except Exception as e:
+            # history is best effort; a database outage shouldn't stop the schedule
+            logging.error(f"Could not record {job.name} run: {e}")
+
+    def _tick(self, now):
+        for job in self.jobs.values():
+            if job.after is None:
+                if job.next_due is None:
+                    job.next_due = self.next_slot(job, now)
+                    print(f"[{job.name}] next run at {_fmt(job.next_due)}")
+                if now >= job.next_due:
+                    due = job.next_due
+                    job.next_due = self.next_slot(job, now)
+                    self._start(job, 'schedule', due)
+            elif job.pending and (job.last_started is None or now - job.last_started >= job.interval):
+                running = job.thread is not None and job.thread.is_alive()
+                if not running:
+                    self._start(job, 'upstream', now)
+
+    def run_forever(self, poll_seconds=1.0):
+        """Run until SIGINT/SIGTERM, then let in-flight stages finish"""
+        self.install_signal_handlers()
+        print(f"Scheduler started with stages: {', '.join(self.jobs)}")
+        while not self.stop_event.is_set():
+            self._tick(time.time())
+            self.stop_event.wait(poll_seconds)
+        self.shutdown()
+
+    def install_signal_handlers(self):
+        def handle(signum, frame):
+            print(f"\nReceived {signal.Signals(signum).name}, finishing running stages...")
+            self.stop_event.set()
+
+        signal.signal(signal.SIGINT, handle)
+        signal.signal(signal.SIGTERM, handle)
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Stop scheduling and wait for running stages (no new ones start)"""
+        self.stop_event.set()
+        deadline = time.time() + timeout
+        for job in self.jobs.values():
+            if job.thread is not None and job.thread.is_alive():
+                job.thread.join(max(0.0, deadline - time.time()))
+                if job.thread.is_alive():
+                    print(f"[{job.name}] still running after {timeout:.0f}s, exiting anyway")
+        print("Scheduler stopped")
+
+
+def _utc(epoch):
+    return datetime.utcfromtimestamp(epoch) if epoch is not None else None
+
+
+def _fmt(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _summarize(result):
+    """Scalar fields of a stage's stats dict, for the run history"""
+    if not isinstance(result, dict):
+        return None
+    return {key: value for key, value in result.items() if isinstance(value, (int, float, str, bool))}
@@ -0,0 +1,334 @@
+import os
+import uuid
+import threading
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.feather as feather
+
+COLUMNAR_ROOT = os.getenv('COLUMNAR_ROOT', os.path.join('data', 'columnar', 'stock_prices'))
+
+SCHEMA = pa.schema([
+    ('timestamp', pa.timestamp('us')),
+    ('open', pa.float64()),
+    ('high', pa.float64()),
+    ('low', pa.float64()),
+    ('close', pa.float64()),
+    ('volume', pa.int64()),
+])
+COLUMNS = SCHEMA.names
+COMPACTED_FILE = 'data.arrow'
+READ_ATTEMPTS = 5  # re-lists of a partition whose files are swapped mid-read
+
+
+class ColumnarStore:
+    """
+    Arrow IPC mirror of stock_prices, partitioned as ticker=<T>/month=<YYYY-MM>/.
+
+    Appends write small part-*.arrow files; compact() merges a partition's parts into
+    one sorted, de-duplicated data.arrow. Files are uncompressed so reads can
+    memory-map them and hand out NumPy views without copying.
+
+    Parameters:
+        root (str): Directory holding the ticker=... partitions
+    """
+
+    def __init__(self, root=COLUMNAR_ROOT):
+        self.root = root
+        self.lock = threading.Lock()
+
+    # ---------- layout ----------
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, f"ticker={ticker}")
+
+    def _partition_dir(self, ticker, month):
+        return os.path.join(self._ticker_dir(ticker), f"month={month}")
+
+    def tickers(self):
+        """Tickers with at least one partition"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(e.name.split('=', 1)[1] for e in os.scandir(self.root)
+                      if e.is_dir() and e.name.startswith('ticker='))
+
+    def months(self, ticker):
+        """Partition months for a ticker, oldest first"""
+        path = self._ticker_dir(ticker)
+        if not os.path.isdir(path):
+            return []
+        return sorted(e.name.split('=', 1)[1] for e in os.scandir(path)
+                      if e.is_dir() and e.name.startswith('month='))
+
+    def _files(self, ticker, month):
+        path = self._partition_dir(ticker, month)
+        try:
+            names = os.listdir(path)
+        except FileNotFoundError:  # partition cleared by replace()
+            return []
+        return sorted(os.path.join(path, name) for name in names if name.endswith('.arrow'))
+
+    # ---------- write ----------
+
+    def _partitions(self, arrays):
+        """Split column arrays into one Arrow table per (ticker, month)"""
+        tickers = np.asarray(arrays['ticker'])
+        if len(tickers) == 0:
+            return
+
+        timestamps = np.asarray(arrays['timestamp'], dtype='datetime64[us]')
+        months = timestamps.astype('datetime64[M]')
+        keys = np.char.add(np.char.add(tickers.astype(str), '|'), months.astype(str))
+        order = np.argsort(keys, kind='stable')
+        unique, starts = np.unique(keys[order], return_index=True)
+        ends = np.r_[starts[1:], len(order)]
+
+        for key, s, e in zip(unique, starts, ends):
+            ticker, month = key.split('|')
+            rows = order[s:e]
+            yield ticker, month, pa.table({name: np.asarray(arrays[name])[rows] for name in COLUMNS}, schema=SCHEMA)
+
+    def append(self, arrays):
+        """
+        Append bars as one new part file per (ticker, month).
+
+        Parameters:
+            arrays (dict): ticker/timestamp/open/high/low/close/volume column arrays,
+                           as returned by database.read.load_bar_arrays
+
+        Returns:
+            int: Rows written
+        """
+
+        written = 0
+        for ticker, month, table in self._partitions(arrays):
+            path = self._partition_dir(ticker, month)
+            os.makedirs(path, exist_ok=True)
+            feather.write_feather(table, os.path.join(path, f"part-{uuid.uuid4().hex}.arrow"),
+                                  compression='uncompressed')
+            written += table.num_rows
+        return written
+
+    def replace(self, arrays, partitions=()):
+        """
+        Overwrite whole (ticker, month) partitions with the given bars, so rows the
+        source no longer has disappear too.
+
+        Parameters:
+            arrays (dict): Column arrays covering the partitions in full
+            partitions (iterable): Extra (ticker, month) pairs to clear when arrays has no bars for them
+
+        Returns:
+            int: Rows written
+        """
+
+        written = 0
+        cleared = set(partitions)
+        for ticker, month, table in self._partitions(arrays):
+            cleared.discard((ticker, month))
+            path = self._partition_dir(ticker, month)
+            os.makedirs(path, exist_ok=True)
+            files = self._files(ticker, month)
+            target = os.path.join(path, COMPACTED_FILE)
+            tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+            feather.write_feather(_dedupe(table), tmp, compression='uncompressed')
+            with self.lock:
+                os.replace(tmp, target)
+                for f in files:
+                    if f != target:
+                        os.remove(f)
+            written += table.num_rows
+
+        for ticker, month in cleared:
+            path = self._partition_dir(ticker, month)
+            if not os.path.isdir(path):
+                continue
+            with self.lock:
+                for f in self._files(ticker, month):
+                    os.remove(f)
+                os.rmdir(path)
+        return written
+
+    def compact(self, tickers=None, min_files=2):
+        """
+        Merge each partition's files into one sorted, de-duplicated data.arrow.
+
+        Returns:
+            int: Partitions compacted
+        """
+
+        compacted = 0
+        for ticker in tickers or self.tickers():
+            for month in self.months(ticker):
+                files = self._files(ticker, month)
+                if len(files) < min_files:
+                    continue
+                table = pa.concat_tables([self._read_file(f) for f in files])
+                table = _dedupe(table)
+                target = os.path.join(self._partition_dir(ticker, month), COMPACTED_FILE)
+                tmp = f"{target}.{uuid.uuid4().hex}.tmp"
+                feather.write_feather(table, tmp, compression='uncompressed')
+                with self.lock:
+                    # the new file replaces data.arrow atomically, then the parts go
+                    os.replace(tmp, target)
+                    for f in files:
+                        if f != target:
+                            os.remove(f)
+                compacted += 1
+        return compacted
+
+    # ---------- read ----------
+
+    def _read_file(self, path):
+        with pa.memory_map(path, 'r') as source:
+            return pa.ipc.open_file(source).read_all()
+
+    def _read_partition(self, ticker, month, attempts=READ_ATTEMPTS):
+        """
+        Every file of a partition as Arrow tables.
+
+        compact() and replace() in other threads or processes (maintenance, the
+        dashboard reading alongside ingestion) only take their own instance's lock, so
+        a listed part file can be gone by the time it is opened. Its rows are then
+        already in the new data.arrow: list the partition again and start over.
+        """
+        for attempt in range(attempts):
+            try:
+                return [self._read_file(f) for f in self._files(ticker, month)]
+            except FileNotFoundError:
+                if attempt == attempts - 1:
+                    raise
+        return []
+
+    def read_table(self, ticker, start=None, end=None, last_n=None, columns=COLUMNS):
+        """
+        Memory-mapped bars for one ticker as an Arrow table, in timestamp order.
+
+        Parameters:
+            start, end (datetime): Inclusive start / exclusive end
+            last_n (int): Newest N bars only; months are read newest first until enough
+        """
+
+        months = self.months(ticker)
+        if start is not None:
+            months = [m for m in months if m >= str(np.datetime64(start, 'M'))]
+        if end is not None:
+            months = [m for m in months if m <= str(np.datetime64(end, 'M'))]
+
+        tables = []
+        rows = 0
+        for month in reversed(months):
+            for table in self._read_partition(ticker, month):
+                tables.append(table)
+                rows += table.num_rows
+            if last_n is not None and rows >= last_n:
+                break
+        if not tables:
+            return SCHEMA.empty_table().select(list(columns))
+
+        # one compacted file is already sorted and unique; anything else may overlap
+        table = tables[0] if len(tables) == 1 else _dedupe(pa.concat_tables(tables))
+
+        ts = table.column('timestamp')
+        mask = None
+        if start is not None:
+            mask = pc.greater_equal(ts, pa.scalar(np.datetime64(start, 'us').item(), pa.timestamp('us')))
+        if end is not None:
+            upper = pc.less(ts, pa.scalar(np.datetime64(end, 'us').item(), pa.timestamp('us')))
+            mask = upper if mask is None else pc.and_(mask, upper)
+        if mask is not None:
+            table = table.filter(mask)
+        if last_n is not None and table.num_rows > last_n:
+            table = table.slice(table.num_rows - last_n)
+        return table.select(list(columns))
+
+    def read_arrays(self, tickers, start=None, end=None, last_n=None, columns=COLUMNS):
+        """
+        Bars for one or more tickers as column arrays, ordered by (ticker, timestamp),
+        the same shape as database.read.load_bar_arrays.
+
+        A single ticker whose range sits in one compacted file comes back as NumPy views
+        over the memory map; multi-file reads are concatenated.
+        """
+
+        if isinstance(tickers, str):
+            tickers = [tickers]
+        tickers = sorted(tickers) if tickers is not None else self.tickers()
+        columns = [c for c in columns if c != 'ticker']
+
+        parts = {name: [] for name in columns}
+        labels = []
+        for ticker in tickers:
+            table = self.read_table(ticker, start, end, last_n, columns)
+            if table.num_rows == 0:
+                continue
+            labels.append(np.full(table.num_rows, ticker, dtype=object))
+            for name in columns:
+                parts[name].append(_to_numpy(table.column(name)))
+
+        arrays = {'ticker': np.concatenate(labels) if labels else np.array([], dtype=object)}
+        for name in columns:
+            if len(parts[name]) == 1:
+                arrays[name] = parts[name][0]
+            elif parts[name]:
+                arrays[name] = np.concatenate(parts[name])
+            else:
+                arrays[name] = np.array([], dtype=SCHEMA.field(name).type.to_pandas_dtype())
+        return arrays
+
+    def month_counts(self, tickers=None):
+        """
+        Distinct bars per partition.
+
+        Returns:
+            dict: (ticker, 'YYYY-MM') -> rows
+        """
+
+        counts = {}
+        for ticker in tickers or self.tickers():
+            for month in self.months(ticker):
+                tables = self._read_partition(ticker, month)
+                if not tables:
+                    continue
+                # uncompacted parts may repeat bars
+                table = tables[0] if len(tables) == 1 else _dedupe(pa.concat_tables(tables))
+                counts[(ticker, month)] = table.num_rows
+        return counts
+
+    def watermarks(self):
+        """
+        Newest mirrored bar per ticker (only the last month's files are read).
+
+        Returns:
+            dict: ticker -> naive datetime
+        """
+
+        marks = {}
+        for ticker in self.tickers():
+            months = self.months(ticker)
+            if not months:
+                continue
+            tables = self._read_partition(ticker, months[-1])
+            if not tables:
+                continue
+            ts = pa.concat_tables(tables).column('timestamp')
+            if len(ts):
+                marks[ticker] = pc.max(ts).as_py()
+        return marks
+
+
+def _dedupe(table):
+    """Sort by timestamp and keep the last copy of each timestamp"""
+    table = table.sort_by('timestamp')
+    ts = table.column('timestamp').to_numpy()
+    if len(ts) < 2:
+        return table
+    keep = np.r_[ts[1:] != ts[:-1], True]
+    return table.filter(pa.array(keep)) if not keep.all() else table
+
+
+def _to_numpy(column):
+    """Zero-copy view for single-chunk columns, a copy otherwise"""
+    if column.num_chunks == 1:
+        return column.chunk(0).to_numpy(zero_copy_only=column.null_count == 0)
+    return column.to_numpy()
@@ -0,0 +1,362 @@
+import sys
+import os
+import json
+import time
+import select
+import threading
+import numpy as np
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_engine, get_db_url
+from database.read import BAR_COLUMNS, load_bar_arrays, load_bar_arrays_since, load_tickers, partition_by_ticker
+from database.write import BARS_CHANNEL
+from monitoring.metrics import registry
+from monitoring.events import log_event
+
+HOT_CACHE = os.getenv('HOT_CACHE', 'false').lower() in ('1', 'true', 'yes')
+HOT_CACHE_BARS = int(os.getenv('HOT_CACHE_BARS', '1000'))  # longest view per ticker
+HOT_CACHE_TICKERS = int(os.getenv('HOT_CACHE_TICKERS', '512'))  # initial slots, doubled when full
+
+DTYPES = {
+    'timestamp': 'datetime64[us]',
+    'open': np.float64,
+    'high': np.float64,
+    'low': np.float64,
+    'close': np.float64,
+    'volume': np.int64,
+}
+
+WARM_CHUNK = 100  # tickers per warm-up query
+
+
+class HotBarCache:
+    """
+    Newest bars for every ticker in preallocated NumPy ring buffers.
+
+    Each column is one 2-D array (ticker slot x position), so there are no per-row
+    Python objects. Every bar is written twice, at p and p + ring, which keeps the
+    newest n bars contiguous at [head - n) mod ring: views are plain slices, no copy
+    and no wrap-around handling. A view stays valid for `ring - n` further appends to
+    its ticker (ring = capacity + headroom), since only bars older than that get
+    overwritten; slot growth allocates new arrays and leaves old views untouched.
+
+    Writers fill the buffers first and then publish the new heads for a whole batch
+    under one lock, and readers take heads under the same lock, so a snapshot is a
+    consistent cut across tickers.
+
+    Parameters:
+        capacity (int): Longest view per ticker
+        headroom (int): Extra bars per ticker before a live view can be overwritten
+                        (default capacity // 4)
+        tickers (int): Initial ticker slots
+    """
+
+    def __init__(self, capacity=HOT_CACHE_BARS, headroom=None, tickers=HOT_CACHE_TICKERS):
+        self.capacity = capacity
+        self.ring = capacity + (capacity // 4 if headroom is None else headroom)
+        self.slots = {}  # published ticker -> slot, what readers see
+        self._assigned = {}  # writer's ticker -> slot, including slots not yet published
+        self.heads = np.zeros(tickers, dtype=np.int64)  # bars ever appended per slot
+        self.columns = {name: np.zeros((tickers, 2 * self.ring), dtype=dtype) for name, dtype in DTYPES.items()}
+        self.version = 0
+        self.updated_at = None
+        self.lock = threading.Lock()  # publishes heads/columns to readers
+        self.write_lock = threading.Lock()  # one writer at a time
+
+    def _slot(self, ticker):
+        slot = self._assigned.get(ticker)
+        if slot is not None:
+            return slot
+        slot = len(self._assigned)
+        if slot == len(self.heads):
+            rows = 2 * len(self.heads)
+            columns = {}
+            for name, values in self.columns.items():
+                columns[name] = np.zeros((rows, values.shape[1]), dtype=values.dtype)
+                columns[name][:len(values)] = values
+            heads = np.zeros(rows, dtype=np.int64)
+            heads[:len(self.heads)] = self.heads
+            with self.lock:
+                self.columns, self.heads = columns, heads
+        self._assigned[ticker] = slot
+        return slot
+
+    def extend(self, batch, replace=False):
+        """
+        Append new bars for several tickers and publish them together.
+
+        Parameters:
+            batch (dict): ticker -> {column: array} in timestamp order; bars not newer
+                          than the ticker's last cached bar are ignored
+            replace (bool): Take every bar, the batch becomes each ticker's newest
+                            history (for reloads after bars were filled in behind it)
+
+        Returns:
+            int: Bars appended
+        """
+
+        appended = 0
+        with self.write_lock:
+            heads = {}
+            for ticker, arrays in batch.items():
+                timestamps = np.asarray(arrays['timestamp'], dtype=DTYPES['timestamp'])
+                if len(timestamps) == 0:
+                    continue
+                slot = self._slot(ticker)
+                head = int(self.heads[slot])
+                keep = np.ones(len(timestamps), dtype=bool)
+                if head and not replace:
+                    keep = timestamps > self.columns['timestamp'][slot, (head - 1) % self.ring]
+                n = int(keep.sum())
+                if n == 0:
+                    continue
+                skip = max(0, n - self.ring)  # more than a ring's worth: only the newest fit
+                positions = (head + skip + np.arange(n - skip)) % self.ring
+                for name, values in self.columns.items():
+                    column = np.asarray(arrays[name])[keep][skip:]
+                    values[slot, positions] = column
+                    values[slot, positions + self.ring] = column
+                heads[slot] = head + n
+                appended += n
+
+            with self.lock:
+                for slot, head in heads.items():
+                    self.heads[slot] = head
+                if len(self.slots) != len(self._assigned):
+                    self.slots = dict(self._assigned)
+                self.version += 1
+                self.updated_at = time.time()
+        return appended
+
+    def view(self, ticker, n=None):
+        """
+        Zero-copy, read-only column views of a ticker's newest n bars (oldest first).
+
+        Returns:
+            dict | None: column -> np.ndarray view, None if the ticker isn't cached
+        """
+
+        with self.lock:
+            slot = self.slots.get(ticker)
+            if slot is None:
+                return None
+            head = int(self.heads[slot])
+            columns = self.columns
+        return self._view(columns, slot, head, n)
+
+    def _view(self, columns, slot, head, n):
+        n = min(n or self.capacity, self.capacity, head)
+        start = (head - n) % self.ring
+        views = {}
+        for name, values in columns.items():
+            view = values[slot, start:start + n]
+            view.flags.writeable = False
+            views[name] = view
+        return views
+
+    def snapshot(self, tickers=None, n=None):
+        """Views for several tickers (default all) from one consistent cut of the heads"""
+        with self.lock:
+            wanted = self.slots if tickers is None else [t for t in tickers if t in self.slots]
+            heads = {ticker: (self.slots[ticker], int(self.heads[self.slots[ticker]])) for ticker in wanted}
+            columns = self.columns
+        return {ticker: self._view(columns, slot, head, n) for ticker, (slot, head) in heads.items()}
+
+    def frame(self, ticker, n=None):
+        """DataFrame of the newest n bars, None if the cache can't answer (not cached or n > capacity)"""
+        if n is not None and n > self.capacity:
+            return None
+        views = self.view(ticker, n)
+        if views is None:
+            return None
+        return pd.DataFrame({name: views[name] for name in BAR_COLUMNS})
+
+    def last_timestamps(self, tickers=None):
+        """ticker -> newest cached bar as a naive datetime (None if empty)"""
+        snapshot = self.snapshot(tickers, 1)
+        return {t: (v['timestamp'][-1].item() if len(v['timestamp']) else None) for t, v in snapshot.items()}
+
+    def memory(self):
+        """Bytes allocated for the buffers vs. bytes holding bars (each bar is stored twice)"""
+        with self.lock:
+            bar_bytes = sum(values.itemsize for values in self.columns.values())
+            allocated = sum(values.nbytes for values in self.columns.values()) + self.heads.nbytes
+            bars = int(np.minimum(self.heads[:len(self.slots)], self.ring).sum())
+            return {
+                'tickers': len(self.slots),
+                'slots': len(self.heads),
+                'capacity': self.capacity,
+                'ring': self.ring,
+                'bytes_per_bar': 2 * bar_bytes,
+                'bars': bars,
+                'bytes_allocated': allocated,
+                'bytes_used': 2 * bar_bytes * bars,
+            }
+
+
+class HotCacheListener:
+    """
+    Keeps a HotBarCache current from Postgres LISTEN/NOTIFY.
+
+    Ingestion's DatabaseWriter sends pg_notify(BARS_CHANNEL, [tickers]) in the same
+    transaction as the rows, so a notification arrives only once the rows have
+    committed; the listener then reads just the bars after each ticker's cached
+    watermark in one query. LISTEN is issued before the warm-up read so nothing
+    committed in between is missed, and after a reconnect every cached ticker is
+    caught up the same way.
+
+    Parameters:
+        cache (HotBarCache): Cache to fill
+        engine: SQLAlchemy engine for bar reads (default get_engine())
+        dsn (str): libpq connection string for the LISTEN connection (default get_db_url())
+        channel (str): Notification channel
+        poll_seconds (float): select() timeout, bounds shutdown latency
+    """
+
+    def __init__(self, cache, engine=None, dsn=None, channel=BARS_CHANNEL, poll_seconds=1.0):
+        self.cache = cache
+        self.engine = engine or get_engine()
+        self.dsn = dsn or get_db_url()
+        self.channel = channel
+        self.poll_seconds = poll_seconds
+        self.stop_event = threading.Event()
+        self.ready = threading.Event()
+        self.thread = None
+        self.notifications = 0
+
+    def warm(self, tickers=None):
+        """Load the newest `capacity` bars of every ticker"""
+        tickers = tickers or load_tickers(self.engine)
+        started = time.perf_counter()
+        for i in range(0, len(tickers), WARM_CHUNK):
+            arrays = load_bar_arrays(tickers[i:i + WARM_CHUNK], last_n=self.cache.capacity, engine=self.engine)
+            self.cache.extend(partition_by_ticker(arrays))
+        log_event('hot_cache_warm', tickers=len(tickers), seconds=round(time.perf_counter() - started, 3),
+                  **self.cache.memory())
+
+    def refresh(self, tickers):
+        """Append bars committed after each ticker's cached watermark"""
+        known = self.cache.last_timestamps(tickers)
+        new = [t for t in tickers if t not in known]
+        with registry.timer('hot_cache_refresh_seconds'):
+            batch = {}
+            if known:
+                batch.update(partition_by_ticker(load_bar_arrays_since(known, columns=BAR_COLUMNS, engine=self.engine)))
+            if new:
+                batch.update(partition_by_ticker(load_bar_arrays(new, last_n=self.cache.capacity, engine=self.engine)))
+            appended = self.cache.extend(batch)
+        registry.inc('hot_cache_bars_appended_total', appended)
+        return appended
+
+    def rebuild(self, tickers):
+        """Reload the newest `capacity` bars of cached tickers, e.g. after a backfill filled holes"""
+        tickers = [t for t in tickers if t in self.cache.slots]
+        if not tickers:
+            return 0
+        with registry.timer('hot_cache_refresh_seconds'):
+            arrays = load_bar_arrays(tickers, last_n=self.cache.capacity, engine=self.engine)
+            appended = self.cache.extend(partition_by_ticker(arrays), replace=True)
+        log_event('hot_cache_rebuild', tickers=len(tickers), bars=appended)
+        return appended
+
+    def _listen(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute(f"LISTEN {self.channel}")
+        return conn
+
+    def _loop(self):
+        conn = None
+        while not self.stop_event.is_set():
+            try:
+                if conn is None:
+                    conn = self._listen()
+                    if self.ready.is_set():
+                        self.refresh(list(self.cache.slots))  # catch up on what was missed while down
+                    else:
+                        self.warm()
+                        self.ready.set()
+
+                if select.select([conn], [], [], self.poll_seconds) == ([], [], []):
+                    continue
+                conn.poll()
+                tickers, rebuild = set(), set()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    payload = json.loads(notify.payload)
+                    if isinstance(payload, dict):
+                        rebuild.update(payload.get('rebuild', []))
+                    else:
+                        tickers.update(payload)
+                    self.notifications += 1
+                if rebuild:
+                    self.rebuild(sorted(rebuild))
+                if tickers - rebuild:
+                    self.refresh(sorted(tickers - rebuild))
+            except Exception as e:
+                log_event('hot_cache_error', error=str(e))
+                if conn is not None:
+                    try:
+                        conn.close()
+                    except Exception:
+                        pass
+                conn = None
+                self.stop_event.wait(5)
+        if conn is not None:
+            conn.close()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._loop, name='hot-cache-listener', daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+_cache = None
+_listener = None
+_lock = threading.Lock()
+
+
+def cache_metrics():
+    if _cache is None:
+        return []
+    return [(f"hot_cache_{name}", {}, value) for name, value in _cache.memory().items()]
+
+
+registry.add_collector(cache_metrics)
+
+
+def refresh_hot_cache(tickers):
+    """
+    Catch the process-wide cache up on `tickers` now rather than at the next NOTIFY.
+
+    Returns:
+        int: Bars appended (0 when no cache has been started)
+    """
+    if _listener is None or not _listener.ready.is_set():
+        return 0
+    return _listener.refresh(list(tickers))
+
+
+def get_hot_cache(engine=None, timeout=60):
+    """
+    Process-wide HotBarCache with its listener thread, started on first use.
+
+    Waits up to `timeout` seconds for the warm-up; an unwarmed cache answers None
+    from frame(), so callers fall back to the database.
+    """
+    global _cache, _listener
+    with _lock:
+        if _cache is None:
+            _cache = HotBarCache()
+            _listener = HotCacheListener(_cache, engine=engine).start()
+    _listener.ready.wait(timeout)
+    return _cache
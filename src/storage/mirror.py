@@ -0,0 +1,135 @@
+import sys
+import os
+import time
+import numpy as np
+from sqlalchemy import text
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.connection import get_engine
+from database.read import load_bar_arrays, load_bar_arrays_since, load_tickers, BAR_COLUMNS
+from storage.columnar import ColumnarStore
+
+COLUMNAR_MIRROR = os.getenv('COLUMNAR_MIRROR', 'true').lower() in ('1', 'true', 'yes')
+COLUMNAR_COMPACT_FILES = int(os.getenv('COLUMNAR_COMPACT_FILES', '8'))
+SYNC_CHUNK_TICKERS = 50
+
+
+def _month_bounds(month):
+    """[start, end) naive datetimes of a 'YYYY-MM' partition"""
+    start = np.datetime64(month, 'M')
+    return start.astype('datetime64[us]').item(), (start + 1).astype('datetime64[us]').item()
+
+
+def sync_columnar(store=None, tickers=None, since=None, compact_files=COLUMNAR_COMPACT_FILES, engine=None):
+    """
+    Append bars newer than the mirror's per-ticker watermark to the columnar store.
+
+    Run after each ingestion; only new bars are read from PostgreSQL, and partitions
+    that have collected compact_files part files are compacted afterwards. Bars at or
+    behind the watermark (backfills, corrections) are only picked up with since=, which
+    re-copies every month from since's month onwards.
+
+    Returns:
+        dict: rows appended, tickers touched, partitions compacted, seconds
+    """
+
+    store = store or ColumnarStore()
+    tickers = tickers or load_tickers(engine)
+    started = time.perf_counter()
+
+    marks = store.watermarks() if since is None else None
+    start = _month_bounds(str(np.datetime64(since, 'M')))[0] if since is not None else None
+    appended = 0
+    touched = set()
+    for i in range(0, len(tickers), SYNC_CHUNK_TICKERS):
+        chunk = tickers[i:i + SYNC_CHUNK_TICKERS]
+        if since is None:
+            arrays = load_bar_arrays_since({t: marks.get(t) for t in chunk}, columns=BAR_COLUMNS, engine=engine)
+            appended += store.append(arrays)
+        else:
+            arrays = load_bar_arrays(chunk, start=start, columns=BAR_COLUMNS, engine=engine)
+            stale = [(t, m) for t in chunk for m in store.months(t) if m >= str(np.datetime64(start, 'M'))]
+            appended += store.replace(arrays, stale)
+        touched.update(arrays['ticker'])
+
+    compacted = store.compact(sorted(touched), min_files=compact_files) if touched else 0
+
+    elapsed = time.perf_counter() - started
+    print(f"Columnar mirror: {appended} bars {'appended' if since is None else 're-copied'} for "
+          f"{len(touched)} tickers, {compacted} partitions compacted in {elapsed:.1f}s")
+    return {'rows': appended, 'tickers': len(touched), 'compacted': compacted, 'seconds': elapsed}
+
+
+def check_consistency(store=None, engine=None):
+    """
+    Compare the mirror's row count per ticker and month with stock_prices.
+
+    A newest-bar check misses backfilled or deleted bars in older months; counting every
+    partition catches them.
+
+    Returns:
+        dict: 'missing' (tickers not mirrored), 'mismatched' ((ticker, month) ->
+              (mirror, database) row counts) and 'ok' (partitions in sync)
+    """
+
+    store = store or ColumnarStore()
+    engine = engine or get_engine()
+
+    # naive timestamps, the same values the mirror copied
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT ticker, to_char(timestamp, 'YYYY-MM'), count(*)
+            FROM stock_prices GROUP BY 1, 2
+        """)).fetchall()
+    database = {(ticker, month): count for ticker, month, count in rows}
+    mirror = store.month_counts()
+
+    report = {
+        'missing': sorted({t for t, _ in database} - {t for t, _ in mirror}),
+        'mismatched': {},
+        'ok': 0,
+    }
+    for key in sorted(set(database) | set(mirror)):
+        counts = (mirror.get(key, 0), database.get(key, 0))
+        if counts[0] == counts[1]:
+            report['ok'] += 1
+        else:
+            report['mismatched'][key] = counts
+    return report
+
+
+def repair_mirror(store=None, report=None, engine=None):
+    """
+    Re-copy every partition check_consistency flagged from stock_prices.
+
+    Returns:
+        int: Partitions re-copied
+    """
+
+    store = store or ColumnarStore()
+    report = report or check_consistency(store, engine)
+    for ticker, month in report['mismatched']:
+        start, end = _month_bounds(month)
+        arrays = load_bar_arrays([ticker], start=start, end=end, columns=BAR_COLUMNS, engine=engine)
+        store.replace(arrays, [(ticker, month)])
+    return len(report['mismatched'])
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain the columnar mirror of stock_prices")
+    parser.add_argument('command', choices=['sync', 'compact', 'check', 'repair'])
+    parser.add_argument('--since', help="Re-copy all months from this date (YYYY-MM-DD) on sync")
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        sync_columnar(since=np.datetime64(args.since).astype('datetime64[us]').item() if args.since else None)
+    elif args.command == 'compact':
+        print(f"Compacted {ColumnarStore().compact()} partitions")
+    elif args.command == 'repair':
+        print(f"Re-copied {repair_mirror()} partitions")
+    else:
+        report = check_consistency()
+        print(f"{report['ok']} partitions in sync, {len(report['mismatched'])} mismatched, "
+              f"{len(report['missing'])} tickers missing")
@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import read as database_read
+from database.read import BAR_COLUMNS
+
+# where analysis and the dashboard read bars from: 'postgres' or 'columnar'
+DATA_SOURCE = os.getenv('DATA_SOURCE', 'postgres').lower()
+
+_store = None
+
+
+def get_store():
+    """Process-wide ColumnarStore (pyarrow is only imported when it's used)"""
+    global _store
+    if _store is None:
+        from storage.columnar import ColumnarStore
+        _store = ColumnarStore()
+    return _store
+
+
+def load_bar_arrays(tickers=None, start=None, end=None, last_n=None, columns=BAR_COLUMNS, engine=None, source=None):
+    """
+    database.read.load_bar_arrays from the configured data source.
+
+    Parameters:
+        source (str): 'postgres' or 'columnar' (default DATA_SOURCE)
+
+    Returns:
+        dict: column name -> np.ndarray, rows ordered by (ticker, timestamp)
+    """
+
+    source = source or DATA_SOURCE
+    if source == 'columnar':
+        return get_store().read_arrays(tickers, start, end, last_n, columns)
+    if source != 'postgres':
+        raise ValueError(f"Unknown data source: {source}")
+    return database_read.load_bar_arrays(tickers, start, end, last_n, columns, engine)